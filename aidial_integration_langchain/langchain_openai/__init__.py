@@ -1,5 +1,81 @@
 from aidial_integration_langchain.langchain_openai.chat_models import (
+    AdaptiveConcurrency,
+    AIMDLimiter,
     AzureChatOpenAI,
+    CallbackDispatch,
+    Circuit,
+    CircuitBreaker,
+    CircuitOpenError,
+    ClientRegistry,
+    ConnectTimeoutError,
+    Conversation,
+    DeadlineExceededError,
+    DiskResponseCache,
+    FairQueue,
+    FirstTokenTimeoutError,
+    InMemoryResponseCache,
+    InMemoryStreamMetrics,
+    InterTokenTimeoutError,
+    LoadBalancer,
+    MessageDictCache,
+    PooledAzureChatOpenAI,
+    ReadAhead,
+    RequestCoalescer,
+    RequestHedger,
+    RequestPriority,
+    RequestScheduler,
+    ResponseCache,
+    StreamAccumulator,
+    StreamController,
+    StreamMetricsSink,
+    StreamTimeoutError,
+    StreamTimeouts,
+    TokenBucket,
+    TokenBudget,
+    TotalTimeoutError,
+    default_client_registry,
+    stop_on_finish_reason,
+    stop_on_text,
+    stop_on_tool_call,
 )
 
-__all__ = ["AzureChatOpenAI"]
+__all__ = [
+    "AIMDLimiter",
+    "AdaptiveConcurrency",
+    "AzureChatOpenAI",
+    "CallbackDispatch",
+    "Circuit",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "ClientRegistry",
+    "ConnectTimeoutError",
+    "Conversation",
+    "DeadlineExceededError",
+    "DiskResponseCache",
+    "FairQueue",
+    "FirstTokenTimeoutError",
+    "InMemoryResponseCache",
+    "InMemoryStreamMetrics",
+    "InterTokenTimeoutError",
+    "LoadBalancer",
+    "MessageDictCache",
+    "PooledAzureChatOpenAI",
+    "ReadAhead",
+    "RequestCoalescer",
+    "RequestHedger",
+    "RequestPriority",
+    "RequestScheduler",
+    "ResponseCache",
+    "StreamAccumulator",
+    "StreamController",
+    "StreamMetricsSink",
+    "StreamTimeoutError",
+    "StreamTimeouts",
+    "TokenBucket",
+    "TokenBudget",
+    "TotalTimeoutError",
+    "default_client_registry",
+    "stop_on_finish_reason",
+    "stop_on_text",
+    "stop_on_tool_call",
+]
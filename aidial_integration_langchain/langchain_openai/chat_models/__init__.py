@@ -1,5 +1,117 @@
+from aidial_integration_langchain.langchain_openai.chat_models.accumulator import (
+    StreamAccumulator,
+)
 from aidial_integration_langchain.langchain_openai.chat_models.azure import (
     AzureChatOpenAI,
 )
+from aidial_integration_langchain.langchain_openai.chat_models.balancing import (
+    LoadBalancer,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.callback_dispatch import (
+    CallbackDispatch,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.circuit_breaker import (
+    Circuit,
+    CircuitBreaker,
+    CircuitOpenError,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.clients import (
+    ClientRegistry,
+    default_client_registry,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.coalescing import (
+    RequestCoalescer,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.concurrency import (
+    AdaptiveConcurrency,
+    AIMDLimiter,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.conversation import (
+    Conversation,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.hedging import (
+    RequestHedger,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.message_cache import (
+    MessageDictCache,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.pooled import (
+    PooledAzureChatOpenAI,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.read_ahead import (
+    ReadAhead,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.response_cache import (
+    DiskResponseCache,
+    InMemoryResponseCache,
+    ResponseCache,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.scheduling import (
+    DeadlineExceededError,
+    FairQueue,
+    RequestPriority,
+    RequestScheduler,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.stream_control import (
+    StreamController,
+    stop_on_finish_reason,
+    stop_on_text,
+    stop_on_tool_call,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.stream_metrics import (
+    InMemoryStreamMetrics,
+    StreamMetricsSink,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.stream_timeouts import (
+    ConnectTimeoutError,
+    FirstTokenTimeoutError,
+    InterTokenTimeoutError,
+    StreamTimeoutError,
+    StreamTimeouts,
+    TotalTimeoutError,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.token_budget import (
+    TokenBucket,
+    TokenBudget,
+)
 
-__all__ = ["AzureChatOpenAI"]
+__all__ = [
+    "AIMDLimiter",
+    "AdaptiveConcurrency",
+    "AzureChatOpenAI",
+    "CallbackDispatch",
+    "Circuit",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "ClientRegistry",
+    "ConnectTimeoutError",
+    "Conversation",
+    "DeadlineExceededError",
+    "DiskResponseCache",
+    "FairQueue",
+    "FirstTokenTimeoutError",
+    "InMemoryResponseCache",
+    "InMemoryStreamMetrics",
+    "InterTokenTimeoutError",
+    "LoadBalancer",
+    "MessageDictCache",
+    "PooledAzureChatOpenAI",
+    "ReadAhead",
+    "RequestCoalescer",
+    "RequestHedger",
+    "RequestPriority",
+    "RequestScheduler",
+    "ResponseCache",
+    "StreamAccumulator",
+    "StreamController",
+    "StreamMetricsSink",
+    "StreamTimeoutError",
+    "StreamTimeouts",
+    "TokenBucket",
+    "TokenBudget",
+    "TotalTimeoutError",
+    "default_client_registry",
+    "stop_on_finish_reason",
+    "stop_on_text",
+    "stop_on_tool_call",
+]
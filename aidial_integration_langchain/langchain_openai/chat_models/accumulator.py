@@ -0,0 +1,237 @@
+"""Linear-time accumulation of streamed message chunks."""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Union
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.messages.ai import UsageMetadata
+from langchain_core.messages.base import merge_content
+from langchain_core.messages.tool import tool_call_chunk
+from langchain_core.messages.utils import message_chunk_to_message
+from langchain_core.outputs import ChatGenerationChunk
+
+
+class _Str:
+    """A string being accumulated from parts."""
+
+    __slots__ = ("parts",)
+
+    def __init__(self, value: str):
+        self.parts = [value]
+
+
+class _Dict(dict):
+    """A dictionary being accumulated from dictionary deltas."""
+
+
+class _List(list):
+    """A list being accumulated from list deltas.
+
+    The elements with an integer `index` are additionally
+    looked up by the index, so that merging a delta costs O(delta size).
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.by_index: Dict[int, _Dict] = {}
+
+
+def _kind(value: Any) -> type:
+    if isinstance(value, _Str):
+        return str
+    if isinstance(value, _Dict):
+        return dict
+    if isinstance(value, _List):
+        return list
+    return type(value)
+
+
+def _build(value: Any) -> Any:
+    if isinstance(value, str):
+        return _Str(value)
+    if isinstance(value, dict):
+        return _merge_dict(_Dict(), value)
+    if isinstance(value, list):
+        return _merge_list(_List(), value)
+    return value
+
+
+def _merge_dict(target: _Dict, source: Mapping[str, Any]) -> _Dict:
+    """Merge the delta into the target.
+
+    Follows the semantics of `langchain_core.utils._merge.merge_dicts`.
+    """
+    for key, value in source.items():
+        current = target.get(key)
+        if key not in target or (value is not None and current is None):
+            target[key] = _build(value)
+        elif value is None:
+            continue
+        elif _kind(current) is not type(value):
+            raise TypeError(
+                f'additional_kwargs["{key}"] already exists in this message,'
+                " but with a different type."
+            )
+        elif isinstance(current, _Str):
+            current.parts.append(value)
+        elif isinstance(current, _Dict):
+            _merge_dict(current, value)
+        elif isinstance(current, _List):
+            _merge_list(current, value)
+        elif current != value:
+            raise TypeError(
+                f"Additional kwargs key {key} already exists in left dict and "
+                f"value has unsupported type {type(current)}."
+            )
+    return target
+
+
+def _merge_list(target: _List, source: List[Any]) -> _List:
+    """Merge the delta into the target.
+
+    Follows the semantics of `langchain_core.utils._merge.merge_lists`:
+    the dictionaries with the same integer `index` are merged together,
+    e.g. DIAL attachments and stages, or tool call chunks.
+    """
+    for element in source:
+        if isinstance(element, dict) and isinstance(
+            index := element.get("index"), int
+        ):
+            if (existing := target.by_index.get(index)) is not None:
+                if "type" in element:
+                    element = {k: v for k, v in element.items() if k != "type"}
+                _merge_dict(existing, element)
+                continue
+            built = _merge_dict(_Dict(), element)
+            target.by_index[index] = built
+            target.append(built)
+        else:
+            target.append(_build(element))
+    return target
+
+
+def _finalize(value: Any) -> Any:
+    if isinstance(value, _Str):
+        return "".join(value.parts)
+    if isinstance(value, _Dict):
+        return {k: _finalize(v) for k, v in value.items()}
+    if isinstance(value, _List):
+        return [_finalize(v) for v in value]
+    return value
+
+
+class StreamAccumulator:
+    """Accumulates streamed AI message chunks into the final message.
+
+    Adding chunks with `AIMessageChunk.__add__` copies the accumulated content,
+    `additional_kwargs` (including DIAL `custom_content`) and `response_metadata`
+    on every addition, which takes quadratic time for long streams.
+
+    The accumulator collects the deltas instead and merges the dictionaries
+    in place (attachments and stages are merged by their index),
+    so the final message is built once in O(total size).
+
+    Example:
+        .. code-block:: python
+
+            accumulator = StreamAccumulator()
+            async for chunk in llm.astream(messages):
+                accumulator.add(chunk)
+            message = accumulator.to_message()
+    """
+
+    def __init__(self) -> None:
+        self._content_parts: List[str] = []
+        self._content: Optional[Union[str, List[Union[str, Dict]]]] = None
+        self._additional_kwargs = _Dict()
+        self._response_metadata = _Dict()
+        self._tool_call_chunks = _List()
+        self._usage_metadata: Optional[UsageMetadata] = None
+        self._id: Optional[str] = None
+        self._count = 0
+
+    def __len__(self) -> int:
+        """The number of the accumulated chunks."""
+        return self._count
+
+    def add(self, chunk: Union[AIMessageChunk, ChatGenerationChunk]) -> None:
+        """Add the next chunk of the stream."""
+        message = (
+            chunk.message if isinstance(chunk, ChatGenerationChunk) else chunk
+        )
+        if not isinstance(message, AIMessageChunk):
+            raise TypeError(
+                f"Expected AIMessageChunk, got {type(message).__name__}"
+            )
+
+        self._count += 1
+        self._add_content(message.content)
+        if message.additional_kwargs:
+            _merge_dict(self._additional_kwargs, message.additional_kwargs)
+        if message.response_metadata:
+            _merge_dict(self._response_metadata, message.response_metadata)
+        if message.tool_call_chunks:
+            _merge_list(self._tool_call_chunks, message.tool_call_chunks)  # type: ignore
+        if message.usage_metadata is not None:
+            self._add_usage(message.usage_metadata)
+        if self._id is None:
+            self._id = message.id
+
+    def extend(
+        self, chunks: Iterable[Union[AIMessageChunk, ChatGenerationChunk]]
+    ) -> None:
+        """Add the chunks one by one."""
+        for chunk in chunks:
+            self.add(chunk)
+
+    def _add_content(self, content: Union[str, List[Union[str, Dict]]]) -> None:
+        if self._content is None:
+            if isinstance(content, str):
+                self._content_parts.append(content)
+                return
+            self._content = "".join(self._content_parts)
+
+        # Multimodal content is rare in streams:
+        # it's merged the same way AIMessageChunk.__add__ does.
+        self._content = merge_content(self._content, content)  # type: ignore
+
+    def _add_usage(self, usage: UsageMetadata) -> None:
+        if self._usage_metadata is None:
+            self._usage_metadata = UsageMetadata(
+                input_tokens=0, output_tokens=0, total_tokens=0
+            )
+        self._usage_metadata["input_tokens"] += usage["input_tokens"]
+        self._usage_metadata["output_tokens"] += usage["output_tokens"]
+        self._usage_metadata["total_tokens"] += usage["total_tokens"]
+
+    def to_chunk(self) -> AIMessageChunk:
+        """Build the chunk equal to the sum of the accumulated chunks."""
+        return AIMessageChunk(
+            content=(
+                "".join(self._content_parts)
+                if self._content is None
+                else self._content
+            ),
+            additional_kwargs=_finalize(self._additional_kwargs),
+            response_metadata=_finalize(self._response_metadata),
+            tool_call_chunks=[
+                tool_call_chunk(
+                    name=tc.get("name"),
+                    args=tc.get("args"),
+                    id=tc.get("id"),
+                    index=tc.get("index"),
+                )
+                for tc in _finalize(self._tool_call_chunks)
+            ],
+            usage_metadata=(
+                None
+                if self._usage_metadata is None
+                else UsageMetadata(**self._usage_metadata)
+            ),
+            id=self._id,
+        )
+
+    def to_message(self) -> AIMessage:
+        """Build the final message of the stream."""
+        return message_chunk_to_message(self.to_chunk())  # type: ignore
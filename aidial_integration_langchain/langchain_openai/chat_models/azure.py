@@ -1,25 +1,39 @@
 """Azure OpenAI chat wrapper."""
 
 # Copied from langchain_openai==0.2.0
-# The only modification: the new `BaseChatOpenAI` class is used instead of the original
+# The modifications wrt. original:
+# 1. the new `BaseChatOpenAI` class is used instead of the original,
+# 2. the response is converted to a dictionary only once,
+# 3. the openai clients are taken from the shared client registry,
+# 4. the openai clients are created lazily on first use,
+# 5. the openai clients accept the messages encoded to JSON in advance,
+# 6. the cached responses are keyed by the deployment and the API version.
 
 from __future__ import annotations
 
 import logging
 import os
+import threading
+import weakref
+from functools import partial
 from operator import itemgetter
 from typing import (
     Any,
     Callable,
+    ClassVar,
     Dict,
+    FrozenSet,
+    Hashable,
     List,
     Literal,
     Optional,
     Sequence,
+    Tuple,
     Type,
     TypedDict,
     TypeVar,
     Union,
+    cast,
     overload,
 )
 
@@ -39,16 +53,39 @@ from langchain_core.tools import BaseTool
 from langchain_core.utils import from_env, secret_from_env
 from langchain_core.utils.function_calling import convert_to_openai_tool
 from langchain_core.utils.pydantic import is_basemodel_subclass
-from pydantic import BaseModel, Field, SecretStr, model_validator
+from pydantic import BaseModel, Field, PrivateAttr, SecretStr, model_validator
 from typing_extensions import Self
 
-# The only fix to the original module
 from aidial_integration_langchain.langchain_openai.chat_models.base import (
     BaseChatOpenAI,
+    _normalize_response,
+)
+from aidial_integration_langchain.langchain_openai.chat_models import (
+    encoded,
+    observers,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.clients import (
+    ClientRegistry,
+    create_pool,
+    default_client_registry,
+    get_caller_key,
+    get_client_key,
+    get_pool_key,
+    get_running_loop,
+    get_pool_limits,
 )
 
 logger = logging.getLogger(__name__)
 
+# The lazily created clients mapped to the methods creating them.
+_LAZY_CLIENTS = {
+    "client": "_init_sync_client",
+    "root_client": "_init_sync_client",
+    "async_client": "_init_async_client",
+    "root_async_client": "_init_async_client",
+}
+_lazy_clients_lock = threading.RLock()
+
 
 _BM = TypeVar("_BM", bound=BaseModel)
 _DictOrPydanticClass = Union[Dict[str, Any], Type[_BM]]
@@ -558,6 +595,44 @@ class AzureChatOpenAI(BaseChatOpenAI):
     Used for tracing and token counting. Does NOT affect completion.
     """
 
+    share_connection_pool: bool = Field(default=True, exclude=True)
+    """Whether to take the openai clients from the client registry.
+
+    Instances with the same endpoint, credentials and timeouts share the clients,
+    and all clients of the same endpoint share the HTTP connection pool.
+    Not used for the clients built from the custom `http_client`/`http_async_client`.
+    """
+    client_registry: Optional[ClientRegistry] = Field(
+        default=None, exclude=True
+    )
+    """The registry of the shared clients.
+
+    The process-wide `default_client_registry` is used if not provided.
+    """
+    max_connections: Optional[int] = Field(default=None, exclude=True)
+    """Maximum number of connections in the shared connection pool."""
+    max_keepalive_connections: Optional[int] = Field(default=None, exclude=True)
+    """Maximum number of idle keep-alive connections in the shared connection pool."""
+    keepalive_expiry: Optional[float] = Field(default=None, exclude=True)
+    """Time in seconds after which an idle keep-alive connection is closed."""
+
+    _client_fields: ClassVar[FrozenSet[str]] = BaseChatOpenAI._client_fields | {
+        "azure_endpoint",
+        "deployment_name",
+        "openai_api_version",
+        "azure_ad_token",
+        "azure_ad_token_provider",
+        "validate_base_url",
+        "share_connection_pool",
+        "client_registry",
+        "max_connections",
+        "max_keepalive_connections",
+        "keepalive_expiry",
+    }
+
+    _client_params: Dict[str, Any] = PrivateAttr(default_factory=dict)
+    _lazy_clients: Dict[str, Any] = PrivateAttr(default_factory=dict)
+
     @classmethod
     def get_lc_namespace(cls) -> List[str]:
         """Get the namespace of the langchain object."""
@@ -633,18 +708,109 @@ class AzureChatOpenAI(BaseChatOpenAI):
             "default_headers": self.default_headers,
             "default_query": self.default_query,
         }
+        # The clients are created on first use, see `__getattr__`.
+        self._client_params = client_params
+        instance_dict = vars(self)
         if not self.client:
-            sync_specific = {"http_client": self.http_client}
-            self.root_client = openai.AzureOpenAI(**client_params, **sync_specific)  # type: ignore[arg-type]
-            self.client = self.root_client.chat.completions
+            del instance_dict["client"]
+            instance_dict.pop("root_client", None)
         if not self.async_client:
-            async_specific = {"http_client": self.http_async_client}
-            self.root_async_client = openai.AsyncAzureOpenAI(
+            del instance_dict["async_client"]
+            instance_dict.pop("root_async_client", None)
+        return self
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for the attributes missing in the instance dictionary,
+        # i.e. for the clients which aren't created yet.
+        init_client = _LAZY_CLIENTS.get(name)
+        if init_client is None:
+            return super().__getattr__(name)  # type: ignore[misc]
+        # The created clients are shared with the derived instances.
+        clients = self._lazy_clients
+        with _lazy_clients_lock:
+            if name not in clients:
+                getattr(self, init_client)(clients)
+            vars(self).update(clients)
+        return clients[name]
+
+    def _init_sync_client(self, clients: Dict[str, Any]) -> None:
+        client_params = self._client_params
+        http_client = self.http_client
+        if http_client is None and self.share_connection_pool:
+            root_client, http_client = self._acquire_shared_client(
+                False, client_params
+            )
+        else:
+            sync_specific = {"http_client": http_client}
+            root_client = observers.AzureOpenAI(**client_params, **sync_specific)  # type: ignore[arg-type]
+        clients["root_client"] = root_client
+        # The client of the conversations shares the connection pool,
+        # except for the default one of the openai client.
+        clients["client"] = encoded.Completions(
+            root_client,
+            partial(
+                encoded.AzureOpenAI, **client_params, http_client=http_client
+            ),
+        )
+
+    def _init_async_client(self, clients: Dict[str, Any]) -> None:
+        client_params = self._client_params
+        http_client = self.http_async_client
+        if http_client is None and self.share_connection_pool:
+            root_async_client, http_client = self._acquire_shared_client(
+                True, client_params
+            )
+        else:
+            async_specific = {"http_client": http_client}
+            root_async_client = observers.AsyncAzureOpenAI(
                 **client_params,  # type: ignore
                 **async_specific,  # type: ignore[arg-type]
             )
-            self.async_client = self.root_async_client.chat.completions
-        return self
+        clients["root_async_client"] = root_async_client
+        clients["async_client"] = encoded.AsyncCompletions(
+            root_async_client,
+            partial(
+                encoded.AsyncAzureOpenAI,
+                **client_params,
+                http_client=http_client,
+            ),
+        )
+
+    def _acquire_shared_client(
+        self, is_async: bool, client_params: dict
+    ) -> Tuple[Any, Any]:
+        """Take the openai client and its connection pool
+        from the client registry.
+
+        The client is released once the instance is garbage collected.
+        """
+        registry = self.client_registry
+        if registry is None:
+            registry = default_client_registry
+        limits = get_pool_limits(
+            self.max_connections,
+            self.max_keepalive_connections,
+            self.keepalive_expiry,
+        )
+        pool_key = get_pool_key(
+            is_async, self.azure_endpoint or self.openai_api_base, limits
+        )
+        client_key = get_client_key(is_async, pool_key, client_params)
+        loop = get_running_loop(is_async)
+
+        http_client = registry.acquire(
+            pool_key, lambda: create_pool(is_async, limits), loop
+        )
+        client_cls = (
+            observers.AsyncAzureOpenAI if is_async else observers.AzureOpenAI
+        )
+        client = registry.acquire(
+            client_key,
+            lambda: client_cls(**client_params, http_client=http_client),
+            loop,
+        )
+        weakref.finalize(self, registry.release, pool_key, client_key)
+        return client, http_client
 
     def bind_tools(
         self,
@@ -957,10 +1123,44 @@ class AzureChatOpenAI(BaseChatOpenAI):
     @property
     def _identifying_params(self) -> Dict[str, Any]:
         """Get the identifying parameters."""
-        return {
-            **{"azure_deployment": self.deployment_name},
-            **super()._identifying_params,
-        }
+        return dict(
+            self._get_compiled(
+                "azure_identifying_params",
+                lambda: {
+                    **{"azure_deployment": self.deployment_name},
+                    **super(AzureChatOpenAI, self)._identifying_params,
+                },
+            )
+        )
+
+    def _get_upstream_identity(self) -> List[Any]:
+        """The parameters of the upstream which the requests are sent to."""
+        return self._get_compiled(
+            "upstream_identity",
+            lambda: [
+                self.azure_endpoint or self.openai_api_base,
+                self.deployment_name,
+                self.openai_api_version,
+            ],
+        )
+
+    def _get_caller_identity(self) -> Hashable:
+        return self._get_compiled(
+            "caller_identity",
+            lambda: get_caller_key(
+                {
+                    k: self._client_params.get(k)
+                    for k in (
+                        "api_key",
+                        "azure_ad_token",
+                        "azure_ad_token_provider",
+                        "organization",
+                        "default_headers",
+                        "default_query",
+                    )
+                }
+            ),
+        )
 
     @property
     def _llm_type(self) -> str:
@@ -977,8 +1177,21 @@ class AzureChatOpenAI(BaseChatOpenAI):
         self, stop: Optional[List[str]] = None, **kwargs: Any
     ) -> LangSmithParams:
         """Get the parameters used to invoke the model."""
-        params = super()._get_ls_params(stop=stop, **kwargs)
-        params["ls_provider"] = "azure"
+        params = self._get_invocation_params(stop=stop, **kwargs)
+        ls_params = LangSmithParams(
+            **self._get_compiled("ls_params", self._compile_ls_params)
+        )
+        ls_params["ls_temperature"] = params.get(
+            "temperature", self.temperature
+        )
+        if ls_max_tokens := params.get("max_tokens", self.max_tokens):
+            ls_params["ls_max_tokens"] = ls_max_tokens
+        if ls_stop := stop or params.get("stop", None):
+            ls_params["ls_stop"] = ls_stop
+        return ls_params
+
+    def _compile_ls_params(self) -> LangSmithParams:
+        params = LangSmithParams(ls_provider="azure", ls_model_type="chat")
         if self.model_name:
             if self.model_version and self.model_version not in self.model_name:
                 params["ls_model_name"] = (
@@ -988,6 +1201,9 @@ class AzureChatOpenAI(BaseChatOpenAI):
                 params["ls_model_name"] = self.model_name
         elif self.deployment_name:
             params["ls_model_name"] = self.deployment_name
+        else:
+            # Traced as is, like the original class does
+            params["ls_model_name"] = cast(str, self.model_name)
         return params
 
     def _create_chat_result(
@@ -995,8 +1211,7 @@ class AzureChatOpenAI(BaseChatOpenAI):
         response: Union[dict, openai.BaseModel],
         generation_info: Optional[Dict] = None,
     ) -> ChatResult:
-        if not isinstance(response, dict):
-            response = response.model_dump()
+        response = _normalize_response(response)
         for res in response["choices"]:
             if res.get("finish_reason", None) == "content_filter":
                 raise ValueError(
@@ -0,0 +1,306 @@
+"""Load balancing of the requests between several deployments."""
+
+import bisect
+import hashlib
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from aidial_integration_langchain.langchain_openai.chat_models.circuit_breaker import (
+    CircuitOpenError,
+    is_circuit_failure,
+)
+
+logger = logging.getLogger(__name__)
+
+BalancingStrategy = Literal["least_outstanding", "ewma"]
+
+
+def is_target_failure(error: BaseException) -> bool:
+    """Whether the error signals that the deployment is unhealthy,
+    including its circuit being open."""
+    return is_circuit_failure(error) or isinstance(error, CircuitOpenError)
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big"
+    )
+
+
+class _TargetState:
+    """The load and the health of a deployment."""
+
+    __slots__ = (
+        "outstanding",
+        "latency",
+        "failures",
+        "ejections",
+        "ejected_until",
+        "probing",
+    )
+
+    def __init__(self) -> None:
+        self.outstanding = 0
+        self.latency: Optional[float] = None
+        self.failures = 0
+        self.ejections = 0
+        self.ejected_until: Optional[float] = None
+        self.probing = False
+
+    def is_available(self, now: float) -> bool:
+        if self.ejected_until is None:
+            return True
+        # Only one request probes the ejected deployment at a time.
+        return now >= self.ejected_until and not self.probing
+
+
+class _Pick:
+    """The deployment picked for a request, measuring its latency."""
+
+    __slots__ = ("index", "target", "probe", "started", "responded")
+
+    def __init__(self, index: int, target: Hashable, probe: bool) -> None:
+        self.index = index
+        self.target = target
+        # Whether the request probes the ejected deployment
+        self.probe = probe
+        self.started = time.monotonic()
+        self.responded: Optional[float] = None
+
+    def respond(self) -> None:
+        """Mark the response as received, e.g. when the first chunk arrives."""
+        if self.responded is None:
+            self.responded = time.monotonic()
+
+
+class _Ring:
+    """The consistent hash ring of the deployments."""
+
+    def __init__(self, targets: Sequence[Hashable], virtual_nodes: int):
+        nodes = sorted(
+            (_hash(f"{target!r}#{i}"), index)
+            for index, target in enumerate(targets)
+            for i in range(virtual_nodes)
+        )
+        self.hashes = [node[0] for node in nodes]
+        self.indices = [node[1] for node in nodes]
+
+    def walk(self, key: str) -> Iterator[int]:
+        """The deployments in the order of the preference for the key."""
+        start = bisect.bisect(self.hashes, _hash(key))
+        seen = set()
+        for i in range(len(self.indices)):
+            index = self.indices[(start + i) % len(self.indices)]
+            if index not in seen:
+                seen.add(index)
+                yield index
+
+
+class LoadBalancer:
+    """Picks the deployment for every request and tracks their health.
+
+    The deployment is picked by the strategy:
+
+    * `least_outstanding` - the fewest requests in flight,
+    * `ewma` - the lowest exponentially weighted moving average latency
+      (up to the first chunk for streams) multiplied by the requests
+      in flight plus one; the deployments without the latency
+      measured yet are tried first.
+
+    The ties are broken randomly. The requests with an affinity key
+    (e.g. of a conversation) are routed by consistent hashing instead,
+    so that the same conversation keeps going to the same deployment
+    and its prompt cache stays warm.
+
+    A deployment failing `failure_threshold` times in a row
+    (connection errors, 5xx, 429) is ejected for `ejection_time` seconds,
+    doubled on every consecutive ejection up to `max_ejection_time`.
+    Once the time passes, a single request probes the deployment:
+    its success brings the deployment back, its failure ejects it again.
+    The requests sent before the ejection don't change its health.
+    If all the deployments are ejected, the one to come back first is used.
+    The pools sharing the balancer share the health and the requests
+    in flight of the deployments they have in common.
+    """
+
+    def __init__(
+        self,
+        strategy: BalancingStrategy = "least_outstanding",
+        ewma_alpha: float = 0.3,
+        failure_threshold: int = 3,
+        ejection_time: float = 10.0,
+        max_ejection_time: float = 300.0,
+        virtual_nodes: int = 64,
+    ):
+        if strategy not in ("least_outstanding", "ewma"):
+            raise ValueError(f"Unknown balancing strategy: {strategy!r}.")
+        if not 0 < ewma_alpha <= 1:
+            raise ValueError("ewma_alpha must be between 0 and 1.")
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be positive.")
+        self.strategy = strategy
+        self.ewma_alpha = ewma_alpha
+        self.failure_threshold = failure_threshold
+        self.ejection_time = ejection_time
+        self.max_ejection_time = max_ejection_time
+        self.virtual_nodes = virtual_nodes
+        self._states: Dict[Hashable, _TargetState] = {}
+        self._rings: Dict[Tuple[Hashable, ...], _Ring] = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Dict[Hashable, Dict[str, Any]]:
+        """The requests in flight, the latency and the health
+        of every deployment."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                target: {
+                    "outstanding": state.outstanding,
+                    "latency": state.latency,
+                    "failures": state.failures,
+                    "ejected": state.ejected_until is not None
+                    and (now < state.ejected_until or state.probing),
+                }
+                for target, state in self._states.items()
+            }
+
+    @contextmanager
+    def pick(
+        self, targets: Sequence[Hashable], affinity_key: Optional[str] = None
+    ) -> Iterator[_Pick]:
+        """Pick the deployment for the request and track the request.
+
+        Yields:
+            The pick with the index of the deployment in `targets`.
+        """
+        index, probe = self._select(targets, affinity_key)
+        pick = _Pick(index, targets[index], probe)
+        try:
+            yield pick
+        except BaseException as e:
+            self._release(pick, e)
+            raise
+        else:
+            self._release(pick, None)
+
+    def _select(
+        self, targets: Sequence[Hashable], affinity_key: Optional[str]
+    ) -> Tuple[int, bool]:
+        now = time.monotonic()
+        with self._lock:
+            states = [self._get_state(target) for target in targets]
+            if affinity_key is not None:
+                index = self._select_by_affinity(
+                    targets, states, affinity_key, now
+                )
+            else:
+                index = self._select_by_load(states, now)
+            if index is None:
+                # All ejected: the one to come back first
+                index = min(
+                    range(len(states)),
+                    key=lambda i: states[i].ejected_until or 0.0,
+                )
+            state = states[index]
+            probe = state.ejected_until is not None and not state.probing
+            if probe:
+                state.probing = True
+            state.outstanding += 1
+            return index, probe
+
+    def _get_state(self, target: Hashable) -> _TargetState:
+        if (state := self._states.get(target)) is None:
+            state = self._states[target] = _TargetState()
+        return state
+
+    def _select_by_load(
+        self, states: List[_TargetState], now: float
+    ) -> Optional[int]:
+        best: List[int] = []
+        best_cost = float("inf")
+        for index, state in enumerate(states):
+            if not state.is_available(now):
+                continue
+            if self.strategy == "ewma":
+                cost = (state.latency or 0.0) * (state.outstanding + 1)
+            else:
+                cost = state.outstanding
+            if cost < best_cost:
+                best, best_cost = [index], cost
+            elif cost == best_cost:
+                best.append(index)
+        return random.choice(best) if best else None
+
+    def _select_by_affinity(
+        self,
+        targets: Sequence[Hashable],
+        states: List[_TargetState],
+        affinity_key: str,
+        now: float,
+    ) -> Optional[int]:
+        key = tuple(targets)
+        if (ring := self._rings.get(key)) is None:
+            ring = self._rings[key] = _Ring(targets, self.virtual_nodes)
+        for index in ring.walk(affinity_key):
+            if states[index].is_available(now):
+                return index
+        return None
+
+    def _release(self, pick: _Pick, error: Optional[BaseException]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            state = self._states[pick.target]
+            state.outstanding -= 1
+            if pick.probe:
+                state.probing = False
+            elif state.ejected_until is not None:
+                # Sent before the ejection or while all the deployments
+                # are ejected: only the probe decides the health.
+                return
+            if error is not None and is_target_failure(error):
+                state.failures += 1
+                if pick.probe or state.failures >= self.failure_threshold:
+                    self._eject(pick.target, state, now)
+                return
+            if error is not None and not isinstance(error, Exception):
+                # Cancelled: the health isn't known.
+                return
+            state.failures = 0
+            if state.ejected_until is not None:
+                logger.info("Deployment %r is back", pick.target)
+                state.ejections = 0
+                state.ejected_until = None
+            if error is None:
+                latency = (pick.responded or now) - pick.started
+                state.latency = (
+                    latency
+                    if state.latency is None
+                    else state.latency
+                    + (latency - state.latency) * self.ewma_alpha
+                )
+
+    def _eject(self, target: Hashable, state: _TargetState, now: float) -> None:
+        state.ejections += 1
+        ejection_time = min(
+            self.max_ejection_time,
+            self.ejection_time * 2 ** (state.ejections - 1),
+        )
+        state.ejected_until = now + ejection_time
+        state.failures = 0
+        logger.warning(
+            "Deployment %r is ejected for %.1f seconds", target, ejection_time
+        )
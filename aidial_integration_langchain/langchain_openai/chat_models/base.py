@@ -3,22 +3,61 @@
 # Copied and modified from langchain_openai==0.2.0
 # The only modifications wrt. original:
 # 1. removed redundant code because BaseChatOpenAI inherits from the original class,
-# 2. patch decorators are applied to corresponding methods.
+# 2. patch decorators are applied to corresponding methods,
+# 3. the response is converted to a dictionary only once,
+# 4. the response and the stream may be decoded from the raw HTTP body
+#    bypassing openai models,
+# 5. content-only deltas are converted to message chunks via a fast path,
+# 6. derived instances are created via `with_options` without full validation,
+# 7. the invariant parts of the request and tracing parameters are compiled once,
+# 8. the converted request messages may be cached,
+# 9. the messages of `Conversation` are encoded to JSON incrementally,
+# 10. the responses may be cached by the request payload,
+# 11. concurrent identical async requests may share one upstream request,
+# 12. the concurrency of async requests adapts to the feedback of the deployment,
+# 13. the tokens per minute of the requests may be budgeted per deployment,
+# 14. the async requests may be scheduled by priority, deadline and tenant,
+# 15. the slow async requests may be hedged by duplicate requests,
+# 16. the requests to a failing deployment may fail fast or fall back
+#     to another model by a circuit breaker,
+# 17. the token callbacks of the async streams may be dispatched in the background,
+# 18. the async streams may be read ahead into a bounded buffer,
+# 19. the streams may be stopped early by the cancellation and the stop predicates,
+# 20. the streams may have the connect, first token, inter-token and total timeouts,
+# 21. the latencies of the streams may be measured.
 
 from __future__ import annotations
 
+import copy
 import json
 import logging
+import time
 import warnings
+from contextlib import (
+    AsyncExitStack,
+    ExitStack,
+    asynccontextmanager,
+    contextmanager,
+)
+from functools import partial
+from operator import itemgetter
 from typing import (
     Any,
     AsyncIterator,
+    Awaitable,
+    Callable,
+    ClassVar,
     Dict,
+    FrozenSet,
+    Hashable,
+    Iterable,
     Iterator,
     List,
     Mapping,
     Optional,
+    Tuple,
     Type,
+    TypeVar,
     Union,
     cast,
 )
@@ -29,6 +68,11 @@ from langchain_core.callbacks import (
     CallbackManagerForLLMRun,
 )
 from langchain_core.language_models import LanguageModelInput
+from langchain_core.language_models.chat_models import (
+    BaseChatModel,
+    agenerate_from_stream,
+    generate_from_stream,
+)
 from langchain_core.messages import (
     AIMessage,
     AIMessageChunk,
@@ -58,10 +102,86 @@ from langchain_core.outputs import (
     ChatGenerationChunk,
     ChatResult,
 )
+from langchain_core.runnables.config import run_in_executor
 from langchain_core.utils.pydantic import (
     is_basemodel_subclass,
 )
+from langchain_core.utils.utils import (
+    build_extra_kwargs,
+    get_pydantic_field_names,
+)
+from typing_extensions import Self
 
+from aidial_integration_langchain.langchain_openai.chat_models.callback_dispatch import (
+    CallbackDispatch,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.circuit_breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    astream_with_fallback,
+    stream_with_fallback,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.clients import (
+    get_caller_key,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.coalescing import (
+    RequestCoalescer,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.concurrency import (
+    AdaptiveConcurrency,
+    AIMDLimiter,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.conversation import (
+    ConversationMessages,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.encoded import (
+    json_dumps,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.hedging import (
+    RequestHedger,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.message_cache import (
+    MessageDictCache,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.options import (
+    get_option_names,
+    get_validated_fields,
+    validate_option,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.raw import (
+    aiter_sse_json,
+    iter_sse_json,
+    json_loads,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.read_ahead import (
+    ReadAhead,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.response_cache import (
+    CACHE_HIT_KEY,
+    ResponseCache,
+    get_cache_key,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.scheduling import (
+    QUEUE_WAIT_KEY,
+    DeadlineExceededError,
+    RequestPriority,
+    RequestScheduler,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.stream_control import (
+    StreamController,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.stream_metrics import (
+    STREAM_METRICS_KEY,
+    StreamMetricsSink,
+    StreamTimer,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.stream_timeouts import (
+    StreamTimeouts,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.token_budget import (
+    Reservation,
+    TokenBudget,
+)
 from aidial_integration_langchain.patch.decorators import (
     patch_convert_chunk_to_generation_chunk,
     patch_convert_delta_to_message_chunk,
@@ -72,9 +192,153 @@ from aidial_integration_langchain.patch.decorators import (
 from langchain_openai.chat_models.base import (
     BaseChatOpenAI as OriginalBaseChatOpenAI,
 )
+from pydantic import Field, PrivateAttr
 
 logger = logging.getLogger(__name__)
 
+_T = TypeVar("_T")
+
+# The container fields which are commonly changed in place,
+# so the compiled parameters are checked against the copies of them.
+_get_compiled_containers = itemgetter(
+    "model_kwargs",
+    "extra_body",
+    "logit_bias",
+    "stop",
+    "default_headers",
+    "default_query",
+)
+
+
+class _ResponseDict(dict):
+    """A response converted to a dictionary, which keeps the original model."""
+
+    __slots__ = ("source",)
+
+    source: openai.BaseModel
+
+
+def _normalize_response(response: Union[dict, openai.BaseModel]) -> dict:
+    """Convert the response to a dictionary.
+
+    The conversion is done once per response:
+    the result is passed as is through the whole response pipeline.
+    """
+    if isinstance(response, dict):
+        return response
+    response_dict = _ResponseDict(response.model_dump())
+    response_dict.source = response
+    return response_dict
+
+
+def _dump_chunks(response: Iterable[Any]) -> Iterator[dict]:
+    for chunk in response:
+        yield chunk if isinstance(chunk, dict) else chunk.model_dump()
+
+
+async def _adump_chunks(response: AsyncIterator[Any]) -> AsyncIterator[dict]:
+    async for chunk in response:
+        yield chunk if isinstance(chunk, dict) else chunk.model_dump()
+
+
+def _dump_cached_response(
+    response: Any, generation_info: Optional[Dict]
+) -> bytes:
+    if generation_info and QUEUE_WAIT_KEY in generation_info:
+        # The replayed responses aren't queued.
+        generation_info = {
+            key: value
+            for key, value in generation_info.items()
+            if key != QUEUE_WAIT_KEY
+        }
+    return json_dumps(
+        {"response": response, "generation_info": generation_info}
+    )
+
+
+def _load_cached_response(cached: bytes) -> Tuple[Any, Dict]:
+    """Decode the cached response and the generation info marking the hit."""
+    record = json_loads(cached)
+    generation_info = record["generation_info"] or {}
+    generation_info[CACHE_HIT_KEY] = True
+    return record["response"], generation_info
+
+
+def _record_chunks(
+    chunks: Iterator[dict],
+    generation_info: Dict,
+    store: Callable[[bytes], None],
+) -> Iterator[dict]:
+    """Pass the chunks through storing them once the stream is complete."""
+    recorded = []
+    for chunk in chunks:
+        recorded.append(chunk)
+        yield chunk
+    store(_dump_cached_response(recorded, generation_info))
+
+
+async def _arecord_chunks(
+    chunks: AsyncIterator[dict],
+    generation_info: Dict,
+    store: Callable[[bytes], Awaitable[None]],
+) -> AsyncIterator[dict]:
+    """Pass the chunks through storing them once the stream is complete."""
+    recorded = []
+    async for chunk in chunks:
+        recorded.append(chunk)
+        yield chunk
+    await store(_dump_cached_response(recorded, generation_info))
+
+
+def _get_usage(response: Union[dict, openai.BaseModel]) -> Any:
+    if isinstance(response, dict):
+        return response.get("usage")
+    return getattr(response, "usage", None)
+
+
+class _Admission:
+    """The permissions of a request to be sent to the deployment."""
+
+    __slots__ = (
+        "call",
+        "queue_wait",
+        "deadline",
+        "reservation",
+        "limiter",
+        "slot",
+    )
+
+    def __init__(self) -> None:
+        self.call: Any = None
+        self.queue_wait: Optional[float] = None
+        self.deadline: Optional[float] = None
+        self.reservation: Optional[Reservation] = None
+        self.limiter: Optional[AIMDLimiter] = None
+        self.slot: Any = None
+
+    @contextmanager
+    def observe(self) -> Iterator[None]:
+        """Observe the responses of the deployment within the block."""
+        with ExitStack() as stack:
+            if self.call is not None:
+                stack.enter_context(self.call.observe_retries())
+            if self.reservation is not None:
+                stack.enter_context(self.reservation.observe_responses())
+            if self.limiter is not None:
+                stack.enter_context(self.limiter.observe_retries(self.slot))
+            yield
+
+    def get_generation_info(self, generation_info: Optional[Dict]) -> Any:
+        """Add the queue wait to the generation info."""
+        if self.queue_wait is None:
+            return generation_info
+        return {**(generation_info or {}), QUEUE_WAIT_KEY: self.queue_wait}
+
+
+async def _aiter_list(items: List[_T]) -> AsyncIterator[_T]:
+    for item in items:
+        yield item
+
 
 @patch_convert_dict_to_message
 def _convert_dict_to_message(_dict: Mapping[str, Any]) -> BaseMessage:
@@ -234,9 +498,45 @@ def _convert_message_to_dict(message: BaseMessage) -> dict:
     return message_dict
 
 
+# Validated once and then copied for every content-only delta
+_AI_MESSAGE_CHUNK_PROTOTYPE = AIMessageChunk(content="")
+
+
+def _convert_content_delta_to_message_chunk(
+    _dict: Mapping[str, Any]
+) -> AIMessageChunk:
+    return _AI_MESSAGE_CHUNK_PROTOTYPE.model_copy(
+        update={
+            "content": cast(str, _dict.get("content") or ""),
+            "id": _dict.get("id"),
+            "additional_kwargs": {},
+            "response_metadata": {},
+            "tool_calls": [],
+            "invalid_tool_calls": [],
+            "tool_call_chunks": [],
+        }
+    )
+
+
 @patch_convert_delta_to_message_chunk
 def _convert_delta_to_message_chunk(
     _dict: Mapping[str, Any], default_class: Type[BaseMessageChunk]
+) -> BaseMessageChunk:
+    role = _dict.get("role")
+    if (
+        not _dict.get("function_call")
+        and not _dict.get("tool_calls")
+        and role != "user"
+        and default_class is not HumanMessageChunk
+        and (role == "assistant" or default_class is AIMessageChunk)
+    ):
+        # The vast majority of streamed deltas carry nothing but content
+        return _convert_content_delta_to_message_chunk(_dict)
+    return _convert_any_delta_to_message_chunk(_dict, default_class)
+
+
+def _convert_any_delta_to_message_chunk(
+    _dict: Mapping[str, Any], default_class: Type[BaseMessageChunk]
 ) -> BaseMessageChunk:
     id_ = _dict.get("id")
     role = cast(str, _dict.get("role"))
@@ -341,6 +641,294 @@ def _convert_chunk_to_generation_chunk(
 
 
 class BaseChatOpenAI(OriginalBaseChatOpenAI):
+    raw_json_responses: bool = False
+    """Whether to decode responses straight from the raw HTTP body.
+
+    The openai models aren't built for such responses,
+    which saves the validation and the consequent conversion to a dictionary.
+    The same goes for streaming: the server-sent events are decoded
+    from the raw byte stream instead of building openai chunk models.
+    Requests with Pydantic `response_format` are still parsed by openai SDK.
+    """
+    message_cache: Optional[MessageDictCache] = Field(
+        default=None, exclude=True
+    )
+    """The cache of the request messages converted to the OpenAI dictionaries.
+
+    Saves the repeated conversion of the conversation history
+    in multi-turn applications. May be shared by several instances.
+    """
+    response_cache: Optional[ResponseCache] = Field(default=None, exclude=True)
+    """The cache of the responses looked up by the exact request.
+
+    The key is the hash of the canonical request payload
+    (including the DIAL extra fields and the `custom_content` of the messages)
+    along with the upstream the request is sent to.
+    The cached responses are replayed the same way as the received ones,
+    both blocking and streaming, and are marked by `cache_hit`
+    in the response metadata. Requests with `response_format`
+    aren't cached unless streamed.
+    May be shared by several instances.
+    """
+    request_coalescer: Optional[RequestCoalescer] = Field(
+        default=None, exclude=True
+    )
+    """Shares one upstream request between concurrent identical async calls.
+
+    The requests are identified by the same key as in the response cache.
+    """
+    adaptive_concurrency: Optional[AdaptiveConcurrency] = Field(
+        default=None, exclude=True
+    )
+    """Limits the concurrency of the async requests per deployment.
+
+    The limit adapts to the feedback of the deployment (AIMD):
+    it grows with the successful responses and is cut on 429/503 responses.
+    The requests above the limit wait in the queue, so `abatch`
+    may be called without a fixed `max_concurrency`.
+    """
+    request_scheduler: Optional[RequestScheduler] = Field(
+        default=None, exclude=True
+    )
+    """Schedules the async requests per deployment by their priority,
+    deadline and tenant.
+
+    The time the request has waited for its turn is reported
+    as `queue_wait` in the response metadata.
+    """
+    request_priority: int = Field(default=RequestPriority.NORMAL, exclude=True)
+    """The priority class of the requests in the `request_scheduler`:
+    the lower, the sooner sent."""
+    request_tenant: Optional[str] = Field(default=None, exclude=True)
+    """The tenant the requests are sent on behalf of
+    for the fair queuing in the `request_scheduler`."""
+    request_deadline: Optional[float] = Field(default=None, exclude=True)
+    """The time in seconds from the call within which an async request
+    must be sent, otherwise it's dropped with `DeadlineExceededError`."""
+    token_budget: Optional[TokenBudget] = Field(default=None, exclude=True)
+    """The client-side token-per-minute budget of the requests per deployment.
+
+    The estimated tokens of a request are reserved before it's sent,
+    waiting locally instead of getting 429 responses. The reservation
+    is reconciled with the `usage` of the response and the budget follows
+    the `x-ratelimit-remaining-*` headers of the deployment.
+    """
+    request_hedger: Optional[RequestHedger] = Field(default=None, exclude=True)
+    """Hedges the slow async requests by duplicate requests.
+
+    If the response (or the first chunk of a stream) is late,
+    a duplicate request is sent to `hedge_llm` and the first one to respond
+    wins, the other is cancelled.
+    """
+    hedge_llm: Optional[BaseChatOpenAI] = Field(
+        default=None, exclude=True, repr=False
+    )
+    """The instance the hedges are sent to, e.g. of another deployment
+    of the same model. The hedges are sent to this instance if not set."""
+    circuit_breaker: Optional[CircuitBreaker] = Field(
+        default=None, exclude=True
+    )
+    """Stops sending the requests to a failing deployment.
+
+    The circuit of the deployment opens on a high rate of the failed
+    or the slow requests: the requests fail fast with `CircuitOpenError`
+    (or fall back to `fallback_llm`) and the retries of the openai SDK stop.
+    """
+    fallback_llm: Optional[BaseChatModel] = Field(
+        default=None, exclude=True, repr=False
+    )
+    """The model the requests fall back to while the circuit
+    of the deployment is open, e.g. of another deployment or a smaller model."""
+    callback_dispatch: Optional[CallbackDispatch] = Field(
+        default=None, exclude=True
+    )
+    """Dispatches the token callbacks of the async streams
+    by a background task, so that a slow callback handler
+    doesn't hold up reading the stream.
+
+    The events are delivered in order and all of them before the stream ends;
+    under load the queued events are coalesced.
+    """
+    read_ahead: Optional[ReadAhead] = Field(default=None, exclude=True)
+    """Reads the async streams ahead into a bounded buffer,
+    so that the upstream keeps being read while the consumer is busy.
+
+    Its metrics show whether the consumer or the upstream is the bottleneck.
+    """
+    stream_controller: Optional[StreamController] = Field(
+        default=None, exclude=True
+    )
+    """Stops the streams early: once cancelled or once a stop predicate
+    matches, closing the upstream response at once.
+
+    Usually set per stream or per agent run via `with_options`.
+    """
+    stream_timeouts: Optional[StreamTimeouts] = Field(
+        default=None, exclude=True
+    )
+    """The connect, first token, inter-token and total timeouts
+    of the streams, each raising a distinct `StreamTimeoutError`."""
+    stream_metrics: Optional[StreamMetricsSink] = Field(
+        default=None, exclude=True
+    )
+    """Records the latencies of the streams: the request build, the first byte,
+    the first token, the gaps between the chunks and the total duration.
+
+    The metrics are attached to the response metadata of the final chunk
+    as well. The streams aren't measured if not set.
+    """
+
+    # The client objects which are rebuilt when the client parameters change.
+    _client_objects: ClassVar[FrozenSet[str]] = frozenset(
+        {"client", "async_client", "root_client", "root_async_client"}
+    )
+    # The fields the clients are built from.
+    _client_fields: ClassVar[FrozenSet[str]] = _client_objects | {
+        "openai_api_key",
+        "openai_api_base",
+        "openai_organization",
+        "openai_proxy",
+        "request_timeout",
+        "max_retries",
+        "default_headers",
+        "default_query",
+        "http_client",
+        "http_async_client",
+    }
+
+    _compiled: Dict[str, Any] = PrivateAttr(default_factory=dict)
+    """The parts of the request and tracing parameters which don't change
+    between the calls. Reset whenever a field is assigned
+    or one of the fields in `_get_compiled_containers` is changed in place.
+    """
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name in type(self).model_fields:
+            self._reset_compiled()
+
+    def _reset_compiled(self) -> None:
+        private = self.__pydantic_private__
+        if private is not None:
+            private["_compiled"] = {}
+
+    def _get_compiled(self, name: str, compile: Callable[[], _T]) -> _T:
+        # Bypasses the private attribute lookup of pydantic,
+        # which costs more than the compiled parameters save.
+        compiled = self.__pydantic_private__["_compiled"]  # type: ignore
+        containers = _get_compiled_containers(vars(self))
+        if compiled and compiled["containers"] != containers:
+            compiled.clear()
+        if (value := compiled.get(name)) is None:
+            if not compiled:
+                compiled["containers"] = copy.deepcopy(containers)
+            value = compiled[name] = compile()
+        return value
+
+    def model_copy(
+        self, *, update: Optional[Mapping[str, Any]] = None, deep: bool = False
+    ) -> Self:
+        copied = super().model_copy(update=update, deep=deep)
+        if update:
+            copied._reset_compiled()
+        return copied
+
+    def with_options(self, **overrides: Any) -> Self:
+        """Derive an instance with the given fields overridden.
+
+        Only the overridden fields are validated and the derived instance
+        shares the clients of this instance, so deriving takes microseconds
+        instead of milliseconds of the full construction.
+        Overriding the fields the clients are built from
+        (e.g. the endpoint or the credentials) falls back to the full construction.
+
+        Example:
+            .. code-block:: python
+
+                creative_llm = llm.with_options(temperature=1.0)
+        """
+        cls = type(self)
+        names = get_option_names(cls)
+        updates: Dict[str, Any] = {}
+        for key, value in overrides.items():
+            if (name := names.get(key)) is None:
+                raise ValueError(f"{cls.__name__} has no field {key!r}")
+            updates[name] = value
+
+        if not updates.keys().isdisjoint(
+            self._client_fields | get_validated_fields(cls)
+        ):
+            return self._reconstruct(updates)
+
+        for name, value in updates.items():
+            updates[name] = validate_option(cls, name, value)
+        if "model_kwargs" in updates:
+            updates["model_kwargs"] = build_extra_kwargs(
+                updates["model_kwargs"], {}, get_pydantic_field_names(cls)
+            )
+        n = updates.get("n", self.n)
+        if n < 1:
+            raise ValueError("n must be at least 1.")
+        if n > 1 and updates.get("streaming", self.streaming):
+            raise ValueError("n must be 1 when streaming.")
+        return self.model_copy(update=updates)
+
+    @property
+    def _default_params(self) -> Dict[str, Any]:
+        """Get the default parameters for calling OpenAI API."""
+        return dict(self._get_default_params())
+
+    def _get_default_params(self) -> Dict[str, Any]:
+        """The compiled default parameters. Must not be modified."""
+        return self._get_compiled(
+            "default_params",
+            lambda: OriginalBaseChatOpenAI._default_params.fget(self),  # type: ignore
+        )
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        """Get the identifying parameters."""
+        return dict(
+            self._get_compiled(
+                "identifying_params",
+                lambda: {
+                    "model_name": self.model_name,
+                    **self._get_default_params(),
+                },
+            )
+        )
+
+    def _get_invocation_params(
+        self, stop: Optional[List[str]] = None, **kwargs: Any
+    ) -> Dict[str, Any]:
+        """Get the parameters used to invoke the model."""
+        params = dict(
+            self._get_compiled(
+                "invocation_params",
+                lambda: {
+                    "model": self.model_name,
+                    **self.dict(),
+                    "stop": None,
+                    **self._get_default_params(),
+                },
+            )
+        )
+        # The stop of the model takes precedence over the given one.
+        if "stop" not in self._get_default_params():
+            params["stop"] = stop
+        params.update(kwargs)
+        return params
+
+    def _reconstruct(self, updates: Dict[str, Any]) -> Self:
+        """Construct a new instance from the fields set on this one."""
+        fields_set = self.model_fields_set
+        params = {
+            name: value
+            for name, value in self.__dict__.items()
+            if name in fields_set and name not in self._client_objects
+        }
+        return type(self)(**{**params, **updates})
+
     def _stream(
         self,
         messages: List[BaseMessage],
@@ -348,10 +936,33 @@ class BaseChatOpenAI(OriginalBaseChatOpenAI):
         run_manager: Optional[CallbackManagerForLLMRun] = None,
         **kwargs: Any,
     ) -> Iterator[ChatGenerationChunk]:
+        chunks = self._stream_chunks(
+            messages, stop=stop, run_manager=run_manager, **kwargs
+        )
+        if (fallback := self.fallback_llm) is None:
+            return chunks
+        return stream_with_fallback(
+            chunks,
+            partial(
+                fallback._stream,
+                messages,
+                stop=stop,
+                run_manager=run_manager,
+                **kwargs,
+            ),
+        )
+
+    def _stream_chunks(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        timer = None if self.stream_metrics is None else StreamTimer()
         kwargs["stream"] = True
         payload = self._get_request_payload(messages, stop=stop, **kwargs)
         default_chunk_class: Type[BaseMessageChunk] = AIMessageChunk
-        base_generation_info = {}
 
         if "response_format" in payload and is_basemodel_subclass(
             payload["response_format"]
@@ -373,18 +984,17 @@ class BaseChatOpenAI(OriginalBaseChatOpenAI):
                 generation_info=chat_result.generations[0].generation_info,
             )
             return
-        if self.include_response_headers:
-            raw_response = self.client.with_raw_response.create(**payload)
-            response = raw_response.parse()
-            base_generation_info = {"headers": dict(raw_response.headers)}
-        else:
-            response = self.client.create(**payload)
-        with response:
+        watch = None
+        if (controller := self.stream_controller) is not None:
+            watch = controller.watch()
+        last_chunk = None
+        if timer is not None:
+            timer.built()
+        with self._open_stream(payload) as (chunks, base_generation_info):
+            if timer is not None:
+                timer.opened()
             is_first_chunk = True
-            for chunk in response:
-                if not isinstance(chunk, dict):
-                    chunk = chunk.model_dump()
-
+            for chunk in chunks:
                 generation_chunk = _convert_chunk_to_generation_chunk(
                     chunk,
                     default_chunk_class,
@@ -392,6 +1002,8 @@ class BaseChatOpenAI(OriginalBaseChatOpenAI):
                 )
                 if generation_chunk is None:
                     continue
+                if timer is not None:
+                    timer.on_chunk(generation_chunk)
                 default_chunk_class = generation_chunk.message.__class__
                 logprobs = (generation_chunk.generation_info or {}).get(
                     "logprobs"
@@ -403,7 +1015,357 @@ class BaseChatOpenAI(OriginalBaseChatOpenAI):
                         logprobs=logprobs,
                     )
                 is_first_chunk = False
+                if watch is not None and watch.stops_after(generation_chunk):
+                    # Passed once the response is closed.
+                    last_chunk = generation_chunk
+                    break
                 yield generation_chunk
+                if watch is not None and watch.stops():
+                    break
+            if watch is not None:
+                watch.finish(0)
+        if last_chunk is not None:
+            yield last_chunk
+        if timer is not None:
+            yield self._finish_stream_timer(timer)
+
+    def _finish_stream_timer(self, timer: StreamTimer) -> ChatGenerationChunk:
+        """Record the metrics of the ended stream.
+
+        Returns:
+            The empty final chunk holding the metrics. It's an `AIMessageChunk`
+            whatever the class of the stream chunks, since some classes
+            (e.g. `ToolMessageChunk`) can't be built without more fields.
+        """
+        metrics = timer.finish()
+        if (sink := self.stream_metrics) is not None:
+            sink.record(metrics)
+        return ChatGenerationChunk(
+            message=AIMessageChunk(content=""),
+            generation_info={STREAM_METRICS_KEY: metrics},
+        )
+
+    def _get_upstream_identity(self) -> List[Any]:
+        """The parameters of the upstream which the requests are sent to."""
+        return self._get_compiled(
+            "upstream_identity",
+            lambda: [self.openai_api_base, self.openai_organization],
+        )
+
+    def _get_caller_identity(self) -> Hashable:
+        """The credentials, default headers and query of the requests.
+
+        Separates the responses shared between the identical requests
+        of the callers who are allowed to see different responses.
+        """
+        return self._get_compiled(
+            "caller_identity",
+            lambda: get_caller_key(
+                {
+                    "api_key": self.openai_api_key,
+                    "default_headers": self.default_headers,
+                    "default_query": self.default_query,
+                }
+            ),
+        )
+
+    def _get_concurrency_limiter(self) -> Optional[AIMDLimiter]:
+        """The concurrency limiter of the deployment, if any."""
+        if (concurrency := self.adaptive_concurrency) is None:
+            return None
+        return concurrency.get_limiter(tuple(self._get_upstream_identity()))
+
+    def _get_hedge_llm(self) -> BaseChatOpenAI:
+        """The instance the hedges of the requests are sent to."""
+        return self if self.hedge_llm is None else self.hedge_llm
+
+    def _admit(self, stack: ExitStack, payload: dict) -> _Admission:
+        """Get the permissions to send the request: the closed circuit
+        and its tokens in the budget.
+
+        The permissions are held until the stack is closed.
+
+        Raises:
+            CircuitOpenError: The circuit of the deployment is open.
+        """
+        admission = _Admission()
+        deployment = tuple(self._get_upstream_identity())
+        if (breaker := self.circuit_breaker) is not None:
+            admission.call = stack.enter_context(
+                breaker.get_circuit(deployment).call()
+            )
+        if (budget := self.token_budget) is not None:
+            admission.reservation = stack.enter_context(
+                budget.reserve(deployment, payload)
+            )
+        return admission
+
+    def _needs_admission(self) -> bool:
+        """Whether the async requests wait for a permission to be sent."""
+        return (
+            self.circuit_breaker is not None
+            or self.request_scheduler is not None
+            or self.request_deadline is not None
+            or self.token_budget is not None
+            or self.adaptive_concurrency is not None
+        )
+
+    async def _aadmit(self, stack: AsyncExitStack, payload: dict) -> _Admission:
+        """Wait for the permissions to send the request: the closed circuit,
+        its turn in the scheduler, its tokens in the budget
+        and the concurrency slot.
+
+        The permissions are held until the stack is closed.
+
+        Raises:
+            CircuitOpenError: The circuit of the deployment is open.
+            DeadlineExceededError: The deadline of the request passed
+                before it could be sent.
+        """
+        admission = _Admission()
+        deployment = tuple(self._get_upstream_identity())
+        if (breaker := self.circuit_breaker) is not None:
+            admission.call = stack.enter_context(
+                breaker.get_circuit(deployment).call()
+            )
+        if self.request_deadline is not None:
+            admission.deadline = time.monotonic() + self.request_deadline
+        if (scheduler := self.request_scheduler) is not None:
+            admission.queue_wait = await stack.enter_async_context(
+                scheduler.get_queue(deployment).schedule(
+                    self.request_priority,
+                    self.request_tenant,
+                    admission.deadline,
+                )
+            )
+        if (budget := self.token_budget) is not None:
+            admission.reservation = await stack.enter_async_context(
+                budget.areserve(deployment, payload)
+            )
+        if (limiter := self._get_concurrency_limiter()) is not None:
+            admission.limiter = limiter
+            admission.slot = await stack.enter_async_context(limiter.slot())
+        if (
+            admission.deadline is not None
+            and admission.deadline <= time.monotonic()
+        ):
+            raise DeadlineExceededError("The request deadline has passed.")
+        return admission
+
+    def _get_request_key(self, payload: dict) -> Optional[str]:
+        """The key shared by the identical requests.
+
+        None if the response to the request can't be shared.
+        """
+        if "response_format" in payload and not payload.get("stream"):
+            return None
+        return get_cache_key(
+            [self._get_upstream_identity(), self._get_caller_identity()],
+            payload,
+        )
+
+    @contextmanager
+    def _open_stream(
+        self, payload: dict
+    ) -> Iterator[Tuple[Iterator[dict], Dict]]:
+        """Send the streaming chat completion request
+        or replay the cached response.
+
+        Yields:
+            The iterator over the chunk dictionaries and the base generation info.
+        """
+        cache = self.response_cache
+        if cache is None or (key := self._get_request_key(payload)) is None:
+            with self._send_stream(payload) as stream:
+                yield stream
+            return
+        if (cached := cache.lookup(key)) is not None:
+            chunks, base_generation_info = _load_cached_response(cached)
+            yield iter(chunks), base_generation_info
+            return
+        with self._send_stream(payload) as (chunks, base_generation_info):
+            yield _record_chunks(
+                chunks, base_generation_info, partial(cache.set, key)
+            ), base_generation_info
+
+    @contextmanager
+    def _send_stream(
+        self, payload: dict
+    ) -> Iterator[Tuple[Iterator[dict], Dict]]:
+        """Send the streaming chat completion request
+        through the circuit breaker and within the token budget
+        of the deployment.
+
+        Yields:
+            The iterator over the chunk dictionaries and the base generation info.
+        """
+        if self.circuit_breaker is None and self.token_budget is None:
+            with self._send_stream_request(payload) as stream:
+                yield stream
+            return
+        with ExitStack() as stack:
+            admission = self._admit(stack, payload)
+            with admission.observe():
+                chunks, base_generation_info = stack.enter_context(
+                    self._send_stream_request(payload)
+                )
+            if admission.call is not None:
+                # The latency is measured up to the start of the stream.
+                admission.call.respond()
+            if admission.reservation is not None:
+                chunks = admission.reservation.watch_usage(chunks)
+            yield chunks, base_generation_info
+
+    @contextmanager
+    def _send_stream_request(
+        self, payload: dict
+    ) -> Iterator[Tuple[Iterator[dict], Dict]]:
+        """Send the streaming chat completion request
+        within the stream timeouts, if any.
+
+        Yields:
+            The iterator over the chunk dictionaries and the base generation info.
+        """
+        if (timeouts := self.stream_timeouts) is None:
+            with self._send_stream_http_request(payload) as stream:
+                yield stream
+            return
+        payload = {
+            **payload,
+            "timeout": timeouts.get_http_timeout(
+                self.client._client.timeout, sync=True
+            ),
+        }
+        with timeouts.watch(
+            partial(self._send_stream_http_request, payload)
+        ) as stream:
+            yield stream
+
+    @contextmanager
+    def _send_stream_http_request(
+        self, payload: dict
+    ) -> Iterator[Tuple[Iterator[dict], Dict]]:
+        """Send the streaming chat completion request.
+
+        Yields:
+            The iterator over the chunk dictionaries and the base generation info.
+        """
+        if self.raw_json_responses:
+            with self.client.with_streaming_response.create(
+                **payload
+            ) as raw_response:
+                yield iter_sse_json(
+                    raw_response.http_response.request,
+                    raw_response.iter_bytes(),
+                ), self._get_base_generation_info(raw_response)
+        else:
+            if self.include_response_headers:
+                raw_response = self.client.with_raw_response.create(**payload)
+                response = raw_response.parse()
+                base_generation_info = self._get_base_generation_info(
+                    raw_response
+                )
+            else:
+                response = self.client.create(**payload)
+                base_generation_info = {}
+            with response:
+                yield _dump_chunks(response), base_generation_info
+
+    def _get_base_generation_info(self, raw_response: Any) -> Dict:
+        if self.include_response_headers:
+            return {"headers": dict(raw_response.headers)}
+        return {}
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.streaming:
+            stream_iter = self._stream(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            )
+            return generate_from_stream(stream_iter)
+        payload = self._get_request_payload(messages, stop=stop, **kwargs)
+        try:
+            response, generation_info = self._create(payload)
+        except CircuitOpenError:
+            if self.fallback_llm is None:
+                raise
+            return self.fallback_llm._generate(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            )
+        return self._create_chat_result(response, generation_info)
+
+    def _create(
+        self, payload: dict
+    ) -> Tuple[Union[dict, openai.BaseModel], Optional[Dict]]:
+        """Send the chat completion request or take the response from the cache.
+
+        Returns:
+            The response and the generation info.
+        """
+        cache = self.response_cache
+        if cache is None or (key := self._get_request_key(payload)) is None:
+            return self._send(payload)
+        if (cached := cache.lookup(key)) is not None:
+            return _load_cached_response(cached)
+        response, generation_info = self._send(payload)
+        response = _normalize_response(response)
+        cache.set(key, _dump_cached_response(response, generation_info))
+        return response, generation_info
+
+    def _send(
+        self, payload: dict
+    ) -> Tuple[Union[dict, openai.BaseModel], Optional[Dict]]:
+        """Send the chat completion request
+        through the circuit breaker and within the token budget
+        of the deployment.
+
+        Returns:
+            The response and the generation info.
+        """
+        if self.circuit_breaker is None and self.token_budget is None:
+            return self._send_request(payload)
+        with ExitStack() as stack:
+            admission = self._admit(stack, payload)
+            with admission.observe():
+                response, generation_info = self._send_request(payload)
+            if admission.reservation is not None:
+                admission.reservation.reconcile(_get_usage(response))
+            return response, generation_info
+
+    def _send_request(
+        self, payload: dict
+    ) -> Tuple[Union[dict, openai.BaseModel], Optional[Dict]]:
+        """Send the chat completion request.
+
+        Returns:
+            The response and the generation info.
+        """
+        generation_info = None
+        if "response_format" in payload:
+            if self.include_response_headers:
+                warnings.warn(
+                    "Cannot currently include response headers when response_format is "
+                    "specified."
+                )
+            payload.pop("stream")
+            response = self.root_client.beta.chat.completions.parse(**payload)
+        elif self.include_response_headers or self.raw_json_responses:
+            raw_response = self.client.with_raw_response.create(**payload)
+            response = (
+                json_loads(raw_response.content)
+                if self.raw_json_responses
+                else raw_response.parse()
+            )
+            if self.include_response_headers:
+                generation_info = {"headers": dict(raw_response.headers)}
+        else:
+            response = self.client.create(**payload)
+        return response, generation_info
 
     def _get_request_payload(
         self,
@@ -412,15 +1374,28 @@ class BaseChatOpenAI(OriginalBaseChatOpenAI):
         stop: Optional[List[str]] = None,
         **kwargs: Any,
     ) -> dict:
-        messages = self._convert_input(input_).to_messages()
         if stop is not None:
             kwargs["stop"] = stop
         return {
-            "messages": [_convert_message_to_dict(m) for m in messages],
-            **self._default_params,
+            "messages": self._convert_request_messages(input_),
+            **self._get_default_params(),
             **kwargs,
         }
 
+    def _convert_request_messages(
+        self, input_: LanguageModelInput
+    ) -> List[dict]:
+        if isinstance(input_, ConversationMessages):
+            return input_.conversation.encode(input_, _convert_message_to_dict)
+        messages = self._convert_input(input_).to_messages()
+        if isinstance(messages, ConversationMessages):
+            return messages.conversation.encode(
+                messages, _convert_message_to_dict
+            )
+        if (message_cache := self.message_cache) is not None:
+            return message_cache.convert(messages, _convert_message_to_dict)
+        return [_convert_message_to_dict(m) for m in messages]
+
     @patch_create_chat_result
     def _create_chat_result(
         self,
@@ -429,9 +1404,7 @@ class BaseChatOpenAI(OriginalBaseChatOpenAI):
     ) -> ChatResult:
         generations = []
 
-        response_dict = (
-            response if isinstance(response, dict) else response.model_dump()
-        )
+        response_dict = _normalize_response(response)
         # Sometimes the AI Model calling will get error, we should raise it.
         # Otherwise, the next code 'choices.extend(response["choices"])'
         # will throw a "TypeError: 'NoneType' object is not iterable" error
@@ -466,10 +1439,10 @@ class BaseChatOpenAI(OriginalBaseChatOpenAI):
             "system_fingerprint": response_dict.get("system_fingerprint", ""),
         }
 
-        if isinstance(response, openai.BaseModel) and getattr(
-            response, "choices", None
+        if isinstance(response_dict, _ResponseDict) and getattr(
+            response_dict.source, "choices", None
         ):
-            message = response.choices[0].message  # type: ignore[attr-defined]
+            message = response_dict.source.choices[0].message  # type: ignore[attr-defined]
             if hasattr(message, "parsed"):
                 generations[0].message.additional_kwargs[
                     "parsed"
@@ -478,20 +1451,50 @@ class BaseChatOpenAI(OriginalBaseChatOpenAI):
                 generations[0].message.additional_kwargs[
                     "refusal"
                 ] = message.refusal
+        elif response_dict["choices"]:
+            # The response decoded from the raw body: no openai model is built
+            message_dict = response_dict["choices"][0]["message"]
+            if "refusal" in message_dict:
+                generations[0].message.additional_kwargs["refusal"] = (
+                    message_dict["refusal"]
+                )
 
         return ChatResult(generations=generations, llm_output=llm_output)
 
-    async def _astream(
+    def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        chunks = self._astream_chunks(
+            messages, stop=stop, run_manager=run_manager, **kwargs
+        )
+        if (fallback := self.fallback_llm) is None:
+            return chunks
+        return astream_with_fallback(
+            chunks,
+            partial(
+                fallback._astream,
+                messages,
+                stop=stop,
+                run_manager=run_manager,
+                **kwargs,
+            ),
+        )
+
+    async def _astream_chunks(
         self,
         messages: List[BaseMessage],
         stop: Optional[List[str]] = None,
         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
         **kwargs: Any,
     ) -> AsyncIterator[ChatGenerationChunk]:
+        timer = None if self.stream_metrics is None else StreamTimer()
         kwargs["stream"] = True
         payload = self._get_request_payload(messages, stop=stop, **kwargs)
         default_chunk_class: Type[BaseMessageChunk] = AIMessageChunk
-        base_generation_info = {}
         if "response_format" in payload and is_basemodel_subclass(
             payload["response_format"]
         ):
@@ -512,20 +1515,31 @@ class BaseChatOpenAI(OriginalBaseChatOpenAI):
                 generation_info=chat_result.generations[0].generation_info,
             )
             return
-        if self.include_response_headers:
-            raw_response = await self.async_client.with_raw_response.create(
-                **payload
+        if timer is not None:
+            timer.built()
+        watch = None
+        if (controller := self.stream_controller) is not None:
+            watch = controller.watch()
+        last_chunk = None
+        async with AsyncExitStack() as stack:
+            dispatcher = None
+            if run_manager and (dispatch := self.callback_dispatch) is not None:
+                # Flushed once the stream is closed.
+                dispatcher = await stack.enter_async_context(
+                    dispatch.dispatching(run_manager)
+                )
+            chunks, base_generation_info = await stack.enter_async_context(
+                self._aopen_stream(payload)
             )
-            response = raw_response.parse()
-            base_generation_info = {"headers": dict(raw_response.headers)}
-        else:
-            response = await self.async_client.create(**payload)
-        async with response:
+            if timer is not None:
+                timer.opened()
+            buffer = None
+            if (read_ahead := self.read_ahead) is not None:
+                chunks = buffer = await stack.enter_async_context(
+                    read_ahead.buffer(chunks)
+                )
             is_first_chunk = True
-            async for chunk in response:
-                if not isinstance(chunk, dict):
-                    chunk = chunk.model_dump()
-
+            async for chunk in chunks:
                 generation_chunk = _convert_chunk_to_generation_chunk(
                     chunk,
                     default_chunk_class,
@@ -533,18 +1547,326 @@ class BaseChatOpenAI(OriginalBaseChatOpenAI):
                 )
                 if generation_chunk is None:
                     continue
+                if timer is not None:
+                    timer.on_chunk(generation_chunk)
                 default_chunk_class = generation_chunk.message.__class__
                 logprobs = (generation_chunk.generation_info or {}).get(
                     "logprobs"
                 )
-                if run_manager:
+                if dispatcher is not None:
+                    dispatcher.put(
+                        generation_chunk.text, generation_chunk, logprobs
+                    )
+                elif run_manager:
                     await run_manager.on_llm_new_token(
                         generation_chunk.text,
                         chunk=generation_chunk,
                         logprobs=logprobs,
                     )
                 is_first_chunk = False
+                if watch is not None and watch.stops_after(generation_chunk):
+                    # Passed once the response is closed.
+                    last_chunk = generation_chunk
+                    break
                 yield generation_chunk
+                if watch is not None and watch.stops():
+                    break
+            if watch is not None:
+                watch.finish(0 if buffer is None else len(buffer))
+        if last_chunk is not None:
+            yield last_chunk
+        if timer is not None:
+            yield self._finish_stream_timer(timer)
+
+    @asynccontextmanager
+    async def _aopen_stream(
+        self, payload: dict
+    ) -> AsyncIterator[Tuple[AsyncIterator[dict], Dict]]:
+        """Send the streaming chat completion request asynchronously,
+        replay the cached response or join the identical request in flight.
+
+        Yields:
+            The iterator over the chunk dictionaries and the base generation info.
+        """
+        cache = self.response_cache
+        coalescer = self.request_coalescer
+        if (cache is None and coalescer is None) or (
+            key := self._get_request_key(payload)
+        ) is None:
+            async with self._asend_stream(payload) as stream:
+                yield stream
+            return
+        if (
+            cache is not None
+            and (cached := await cache.alookup(key)) is not None
+        ):
+            chunks, base_generation_info = _load_cached_response(cached)
+            yield _aiter_list(chunks), base_generation_info
+            return
+        open_stream = partial(self._asend_stream_and_store, payload, key)
+        if coalescer is not None:
+            open_stream = partial(coalescer.stream, key, open_stream)
+        async with open_stream() as stream:
+            yield stream
+
+    @asynccontextmanager
+    async def _asend_stream_and_store(
+        self, payload: dict, key: str
+    ) -> AsyncIterator[Tuple[AsyncIterator[dict], Dict]]:
+        """Send the streaming request storing the complete stream in the cache."""
+        async with self._asend_stream(payload) as (
+            chunks,
+            base_generation_info,
+        ):
+            if (cache := self.response_cache) is not None:
+                chunks = _arecord_chunks(
+                    chunks, base_generation_info, partial(cache.aset, key)
+                )
+            yield chunks, base_generation_info
+
+    @asynccontextmanager
+    async def _asend_stream(
+        self, payload: dict
+    ) -> AsyncIterator[Tuple[AsyncIterator[dict], Dict]]:
+        """Send the streaming chat completion request asynchronously,
+        hedging it if the first chunk is late.
+
+        Yields:
+            The iterator over the chunk dictionaries and the base generation info.
+        """
+        if (hedger := self.request_hedger) is None:
+            async with self._asend_stream_admitted(payload) as stream:
+                yield stream
+            return
+        async with hedger.stream(
+            partial(self._asend_stream_admitted, payload),
+            partial(
+                self._get_hedge_llm()._asend_stream_admitted, dict(payload)
+            ),
+        ) as stream:
+            yield stream
+
+    @asynccontextmanager
+    async def _asend_stream_admitted(
+        self, payload: dict
+    ) -> AsyncIterator[Tuple[AsyncIterator[dict], Dict]]:
+        """Send the streaming chat completion request asynchronously
+        once it's admitted by the scheduler, the token budget
+        and the concurrency limit of the deployment.
+
+        Yields:
+            The iterator over the chunk dictionaries and the base generation info.
+        """
+        if not self._needs_admission():
+            async with self._asend_stream_request(payload) as stream:
+                yield stream
+            return
+        async with AsyncExitStack() as stack:
+            admission = await self._aadmit(stack, payload)
+            with admission.observe():
+                chunks, base_generation_info = await stack.enter_async_context(
+                    self._asend_stream_request(payload)
+                )
+            if admission.call is not None:
+                # The latency is measured up to the start of the stream.
+                admission.call.respond()
+            if admission.slot is not None:
+                admission.slot.complete()
+            if admission.reservation is not None:
+                chunks = admission.reservation.awatch_usage(chunks)
+            yield chunks, admission.get_generation_info(base_generation_info)
+
+    @asynccontextmanager
+    async def _asend_stream_request(
+        self, payload: dict
+    ) -> AsyncIterator[Tuple[AsyncIterator[dict], Dict]]:
+        """Send the streaming chat completion request asynchronously
+        within the stream timeouts, if any.
+
+        Yields:
+            The iterator over the chunk dictionaries and the base generation info.
+        """
+        if (timeouts := self.stream_timeouts) is None:
+            async with self._asend_stream_http_request(payload) as stream:
+                yield stream
+            return
+        payload = {
+            **payload,
+            "timeout": timeouts.get_http_timeout(
+                self.async_client._client.timeout, sync=False
+            ),
+        }
+        async with timeouts.awatch(
+            partial(self._asend_stream_http_request, payload)
+        ) as stream:
+            yield stream
+
+    @asynccontextmanager
+    async def _asend_stream_http_request(
+        self, payload: dict
+    ) -> AsyncIterator[Tuple[AsyncIterator[dict], Dict]]:
+        """Send the streaming chat completion request asynchronously.
+
+        Yields:
+            The iterator over the chunk dictionaries and the base generation info.
+        """
+        if self.raw_json_responses:
+            async with self.async_client.with_streaming_response.create(
+                **payload
+            ) as raw_response:
+                yield aiter_sse_json(
+                    raw_response.http_response.request,
+                    raw_response.iter_bytes(),
+                ), self._get_base_generation_info(raw_response)
+        else:
+            if self.include_response_headers:
+                raw_response = await self.async_client.with_raw_response.create(
+                    **payload
+                )
+                response = raw_response.parse()
+                base_generation_info = self._get_base_generation_info(
+                    raw_response
+                )
+            else:
+                response = await self.async_client.create(**payload)
+                base_generation_info = {}
+            async with response:
+                yield _adump_chunks(response), base_generation_info
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.streaming:
+            stream_iter = self._astream(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            )
+            return await agenerate_from_stream(stream_iter)
+        payload = self._get_request_payload(messages, stop=stop, **kwargs)
+        try:
+            response, generation_info = await self._acreate(payload)
+        except CircuitOpenError:
+            if self.fallback_llm is None:
+                raise
+            return await self.fallback_llm._agenerate(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            )
+        return await run_in_executor(
+            None, self._create_chat_result, response, generation_info
+        )
+
+    async def _acreate(
+        self, payload: dict
+    ) -> Tuple[Union[dict, openai.BaseModel], Optional[Dict]]:
+        """Send the chat completion request asynchronously,
+        take the response from the cache or join the identical request in flight.
+
+        Returns:
+            The response and the generation info.
+        """
+        cache = self.response_cache
+        coalescer = self.request_coalescer
+        if (cache is None and coalescer is None) or (
+            key := self._get_request_key(payload)
+        ) is None:
+            return await self._asend(payload)
+        if (
+            cache is not None
+            and (cached := await cache.alookup(key)) is not None
+        ):
+            return _load_cached_response(cached)
+        send = partial(self._asend_and_store, payload, key)
+        if coalescer is None:
+            return await send()
+        response, generation_info = await coalescer.run(key, send)
+        # The generation info is updated with the results of every caller.
+        return response, generation_info and dict(generation_info)
+
+    async def _asend_and_store(
+        self, payload: dict, key: str
+    ) -> Tuple[dict, Optional[Dict]]:
+        """Send the chat completion request storing the response in the cache."""
+        response, generation_info = await self._asend(payload)
+        response = _normalize_response(response)
+        if (cache := self.response_cache) is not None:
+            await cache.aset(
+                key, _dump_cached_response(response, generation_info)
+            )
+        return response, generation_info
+
+    async def _asend(
+        self, payload: dict
+    ) -> Tuple[Union[dict, openai.BaseModel], Optional[Dict]]:
+        """Send the chat completion request asynchronously,
+        hedging it if the response is late.
+
+        Returns:
+            The response and the generation info.
+        """
+        if (hedger := self.request_hedger) is None:
+            return await self._asend_admitted(payload)
+        return await hedger.run(
+            partial(self._asend_admitted, payload),
+            # The payload is modified by the request.
+            partial(self._get_hedge_llm()._asend_admitted, dict(payload)),
+        )
+
+    async def _asend_admitted(
+        self, payload: dict
+    ) -> Tuple[Union[dict, openai.BaseModel], Optional[Dict]]:
+        """Send the chat completion request asynchronously
+        once it's admitted by the scheduler, the token budget
+        and the concurrency limit of the deployment.
+
+        Returns:
+            The response and the generation info.
+        """
+        if not self._needs_admission():
+            return await self._asend_request(payload)
+        async with AsyncExitStack() as stack:
+            admission = await self._aadmit(stack, payload)
+            with admission.observe():
+                response, generation_info = await self._asend_request(payload)
+            if admission.reservation is not None:
+                admission.reservation.reconcile(_get_usage(response))
+            return response, admission.get_generation_info(generation_info)
+
+    async def _asend_request(
+        self, payload: dict
+    ) -> Tuple[Union[dict, openai.BaseModel], Optional[Dict]]:
+        """Send the chat completion request asynchronously.
+
+        Returns:
+            The response and the generation info.
+        """
+        generation_info = None
+        if "response_format" in payload:
+            if self.include_response_headers:
+                warnings.warn(
+                    "Cannot currently include response headers when response_format is "
+                    "specified."
+                )
+            payload.pop("stream")
+            response = await self.root_async_client.beta.chat.completions.parse(
+                **payload
+            )
+        elif self.include_response_headers or self.raw_json_responses:
+            raw_response = await self.async_client.with_raw_response.create(
+                **payload
+            )
+            response = (
+                json_loads(raw_response.content)
+                if self.raw_json_responses
+                else raw_response.parse()
+            )
+            if self.include_response_headers:
+                generation_info = {"headers": dict(raw_response.headers)}
+        else:
+            response = await self.async_client.create(**payload)
+        return response, generation_info
 
 
 def _lc_tool_call_to_openai_tool_call(tool_call: ToolCall) -> dict:
@@ -0,0 +1,164 @@
+"""Dispatch of the token callbacks of the async streams in the background."""
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun
+from langchain_core.outputs import ChatGenerationChunk
+
+
+class _TokenEvent:
+    """The pending `on_llm_new_token` event, possibly of several tokens."""
+
+    __slots__ = ("token", "chunk", "logprobs")
+
+    def __init__(
+        self,
+        token: str,
+        chunk: ChatGenerationChunk,
+        logprobs: Optional[Dict[str, Any]],
+    ):
+        self.token = token
+        self.chunk = chunk
+        self.logprobs = logprobs
+
+    def merge(
+        self,
+        token: str,
+        chunk: ChatGenerationChunk,
+        logprobs: Optional[Dict[str, Any]],
+    ) -> None:
+        self.token += token
+        self.chunk += chunk
+        if self.logprobs is None or logprobs is None:
+            self.logprobs = self.logprobs or logprobs
+        else:
+            self.logprobs = {
+                "content": (self.logprobs.get("content") or [])
+                + (logprobs.get("content") or [])
+            }
+
+
+class _Dispatcher:
+    """Delivers the token events of one stream in the background task."""
+
+    def __init__(
+        self,
+        dispatch: "CallbackDispatch",
+        run_manager: AsyncCallbackManagerForLLMRun,
+    ):
+        self._dispatch = dispatch
+        self._run_manager = run_manager
+        self._pending: Deque[_TokenEvent] = deque()
+        self._ready = asyncio.Event()
+        self._closed = False
+        self._task: Optional[asyncio.Future] = None
+
+    def put(
+        self,
+        token: str,
+        chunk: ChatGenerationChunk,
+        logprobs: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Queue the event without waiting for the callbacks."""
+        dispatch = self._dispatch
+        dispatch.events += 1
+        if len(self._pending) >= dispatch.max_pending:
+            self._pending[-1].merge(token, chunk, logprobs)
+            dispatch.coalesced += 1
+            return
+        self._pending.append(_TokenEvent(token, chunk, logprobs))
+        self._ready.set()
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def flush(self) -> None:
+        """Wait for the pending events to be delivered.
+
+        Raises:
+            The error of the callbacks, if any.
+        """
+        self._closed = True
+        self._ready.set()
+        if self._task is not None:
+            await self._task
+
+    def cancel(self) -> None:
+        """Drop the pending events."""
+        self._pending.clear()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _run(self) -> None:
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while self._pending:
+                event = self._pending.popleft()
+                await self._run_manager.on_llm_new_token(
+                    event.token, chunk=event.chunk, logprobs=event.logprobs
+                )
+            if self._closed:
+                return
+
+
+class CallbackDispatch:
+    """Dispatch of the token callbacks of the async streams
+    by a background task.
+
+    The chunks are read from the upstream without waiting
+    for the `on_llm_new_token` callbacks: the events are queued
+    and delivered in order by a task per stream. Once `max_pending` events
+    are queued (e.g. behind a slow tracer), the next tokens are coalesced
+    into the last queued event, so that the queue stays bounded
+    and the callbacks catch up in fewer, larger events.
+    All the events are delivered before the stream ends,
+    before the error of the stream is reported or once the stream is closed
+    early. The events are dropped if the stream is cancelled.
+
+    Example:
+        .. code-block:: python
+
+            dispatch = CallbackDispatch(max_pending=64)
+            llm = AzureChatOpenAI(..., callback_dispatch=dispatch)
+            async for chunk in llm.astream(prompt, config={"callbacks": [...]}):
+                ...
+            print(dispatch.snapshot())
+    """
+
+    def __init__(self, max_pending: int = 64):
+        if max_pending < 1:
+            raise ValueError("max_pending must be positive.")
+        self.max_pending = max_pending
+        # The number of the token events
+        self.events = 0
+        # The number of the token events coalesced into the queued ones
+        self.coalesced = 0
+
+    def snapshot(self) -> Dict[str, int]:
+        """The numbers of the token events and the coalesced ones."""
+        return {"events": self.events, "coalesced": self.coalesced}
+
+    @asynccontextmanager
+    async def dispatching(
+        self, run_manager: AsyncCallbackManagerForLLMRun
+    ) -> AsyncIterator[_Dispatcher]:
+        """Dispatch the token events of the stream within the block.
+
+        Yields:
+            The dispatcher queueing the events.
+        """
+        dispatcher = _Dispatcher(self, run_manager)
+        try:
+            yield dispatcher
+        except (Exception, GeneratorExit):
+            # The tokens received are reported before the error.
+            await dispatcher.flush()
+            raise
+        except BaseException:
+            dispatcher.cancel()
+            raise
+        else:
+            await dispatcher.flush()
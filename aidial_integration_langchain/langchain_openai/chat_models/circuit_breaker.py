@@ -0,0 +1,373 @@
+"""Circuit breaking of the requests to a failing deployment."""
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import partial
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    Iterator,
+    Literal,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+import httpx
+import openai
+
+from aidial_integration_langchain.langchain_openai.chat_models.concurrency import (
+    is_overload_error,
+    is_overload_status,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.observers import (
+    retry_guard,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.stream_timeouts import (
+    StreamTimeoutError,
+)
+
+logger = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+CircuitState = Literal["closed", "open", "half_open"]
+
+
+class CircuitOpenError(Exception):
+    """The circuit of the deployment is open, so the request isn't sent."""
+
+    def __init__(self, deployment: Hashable):
+        super().__init__(f"The circuit of deployment {deployment!r} is open.")
+        self.deployment = deployment
+
+
+def is_circuit_failure(error: BaseException) -> bool:
+    """Whether the error counts as a failure of the deployment.
+
+    The client errors (e.g. 400) are caused by the request,
+    so they don't count.
+    """
+    return isinstance(
+        error,
+        (
+            openai.APIConnectionError,
+            openai.InternalServerError,
+            StreamTimeoutError,
+        ),
+    ) or is_overload_error(error)
+
+
+def is_failure_status(status_code: int) -> bool:
+    """Whether the response status counts as a failure of the deployment,
+    the same as its error by `is_circuit_failure`."""
+    return status_code >= 500 or is_overload_status(status_code)
+
+
+class _Call:
+    """The call permitted by the circuit, measuring its latency."""
+
+    __slots__ = ("circuit", "trial", "opening", "started", "responded")
+
+    def __init__(self, circuit: "Circuit", trial: bool, opening: int) -> None:
+        self.circuit = circuit
+        self.trial = trial
+        # The number of the openings of the circuit before the call
+        self.opening = opening
+        self.started = time.monotonic()
+        self.responded: Optional[float] = None
+
+    def respond(self) -> None:
+        """Mark the response as received, e.g. when the stream is opened."""
+        if self.responded is None:
+            self.responded = time.monotonic()
+
+    @contextmanager
+    def observe_retries(self) -> Iterator[None]:
+        """Count the failed attempts retried by the openai SDK within the block,
+        stopping the retries once the circuit opens."""
+        token = retry_guard.set(partial(self.circuit.on_retry, self))
+        try:
+            yield
+        finally:
+            retry_guard.reset(token)
+
+
+class Circuit:
+    """The circuit of a deployment.
+
+    The circuit is closed while the deployment is healthy.
+    It opens once at least `min_calls` of the last `window` calls
+    have been made and either the rate of the failed ones
+    (connection errors and timeouts including the stream timeouts,
+    5xx and 429 responses,
+    including the attempts retried by the openai SDK)
+    reaches `failure_rate_threshold` or the rate of the ones slower than
+    `slow_call_duration` seconds (up to the start of the stream for streams)
+    reaches `slow_call_rate_threshold`. While open, the calls fail fast
+    with `CircuitOpenError` and the retries of the calls in flight stop.
+    After `open_time` seconds the circuit is half-open: `half_open_calls`
+    trial calls are let through, closing the circuit if all of them succeed
+    and opening it again on the first failure. The calls let in
+    before the circuit opened don't count as the trial ones.
+    """
+
+    def __init__(
+        self,
+        failure_rate_threshold: float = 0.5,
+        slow_call_duration: Optional[float] = None,
+        slow_call_rate_threshold: float = 1.0,
+        window: int = 20,
+        min_calls: int = 10,
+        open_time: float = 30.0,
+        half_open_calls: int = 1,
+    ):
+        if not 0 < failure_rate_threshold <= 1:
+            raise ValueError("failure_rate_threshold must be between 0 and 1.")
+        if not 0 < slow_call_rate_threshold <= 1:
+            raise ValueError(
+                "slow_call_rate_threshold must be between 0 and 1."
+            )
+        if not 1 <= min_calls <= window:
+            raise ValueError("min_calls must be between 1 and window.")
+        if half_open_calls < 1:
+            raise ValueError("half_open_calls must be positive.")
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.min_calls = min_calls
+        self.open_time = open_time
+        self.half_open_calls = half_open_calls
+        self.deployment: Hashable = None
+        self._state: CircuitState = "closed"
+        # The (failed, slow) outcomes of the last calls
+        self._outcomes: Deque[Tuple[bool, bool]] = deque(maxlen=window)
+        self._opened_until = 0.0
+        self._trials = 0
+        self._successful_trials = 0
+        self._openings = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            return self._get_state(time.monotonic())
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self._get_state(time.monotonic())
+            calls = len(self._outcomes)
+            return {
+                "state": state,
+                "calls": calls,
+                "failure_rate": calls
+                and sum(failed for failed, _ in self._outcomes) / calls,
+                "slow_call_rate": calls
+                and sum(slow for _, slow in self._outcomes) / calls,
+            }
+
+    @contextmanager
+    def call(self) -> Iterator[_Call]:
+        """Permit the call and record its outcome.
+
+        Raises:
+            CircuitOpenError: The circuit is open.
+        """
+        call = _Call(self, *self._acquire())
+        try:
+            yield call
+        except BaseException as e:
+            self._release(call, e)
+            raise
+        else:
+            self._release(call, None)
+
+    def on_retry(self, call: _Call, response: Optional[httpx.Response]) -> None:
+        """Take into account the attempt of the call about to be retried.
+
+        It's counted as failed after a connection error or a timeout
+        (without the response) or with the failure status (5xx, 429),
+        the other retried statuses (e.g. 408, 409) aren't counted.
+
+        Raises:
+            CircuitOpenError: The circuit is open, so the retry isn't sent.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if response is None or is_failure_status(response.status_code):
+                self._record(call, True, False, now)
+            if self._get_state(now) == "open":
+                raise CircuitOpenError(self.deployment)
+
+    def _get_state(self, now: float) -> CircuitState:
+        if self._state == "open" and now >= self._opened_until:
+            self._state = "half_open"
+            self._trials = 0
+            self._successful_trials = 0
+        return self._state
+
+    def _acquire(self) -> Tuple[bool, int]:
+        """Whether the permitted call is a trial one
+        and the number of the openings of the circuit."""
+        with self._lock:
+            state = self._get_state(time.monotonic())
+            if state == "closed":
+                return False, self._openings
+            if state == "half_open" and self._trials < self.half_open_calls:
+                self._trials += 1
+                return True, self._openings
+        raise CircuitOpenError(self.deployment)
+
+    def _is_trial(self, call: _Call) -> bool:
+        """Whether the call is a trial one of the current half-open state."""
+        return call.trial and call.opening == self._openings
+
+    def _release(self, call: _Call, error: Optional[BaseException]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if isinstance(error, CircuitOpenError) or (
+                error is not None and not isinstance(error, Exception)
+            ):
+                # Cancelled, so the health isn't known,
+                # or stopped retrying, so already counted.
+                if self._is_trial(call) and self._state == "half_open":
+                    self._trials -= 1
+                return
+            failed = error is not None and is_circuit_failure(error)
+            slow = (
+                self.slow_call_duration is not None
+                and (call.responded or now) - call.started
+                > self.slow_call_duration
+            )
+            self._record(call, failed, slow, now)
+
+    def _record(
+        self, call: _Call, failed: bool, slow: bool, now: float
+    ) -> None:
+        state = self._get_state(now)
+        if state == "half_open":
+            if not self._is_trial(call):
+                # Let in before the circuit opened, so it tells nothing
+                # about the recovery of the deployment.
+                return
+            if failed or slow:
+                self._open(now)
+            else:
+                self._successful_trials += 1
+                if self._successful_trials >= self.half_open_calls:
+                    logger.info(
+                        "Circuit of deployment %r is closed", self.deployment
+                    )
+                    self._state = "closed"
+                    self._outcomes.clear()
+            return
+        if state == "open":
+            # The calls sent before the circuit opened
+            return
+        self._outcomes.append((failed, slow))
+        calls = len(self._outcomes)
+        if calls < self.min_calls:
+            return
+        failures = sum(failed for failed, _ in self._outcomes)
+        slow_calls = sum(slow for _, slow in self._outcomes)
+        if (
+            failures >= self.failure_rate_threshold * calls
+            or slow_calls >= self.slow_call_rate_threshold * calls
+        ):
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        self._state = "open"
+        self._openings += 1
+        self._opened_until = now + self.open_time
+        logger.warning(
+            "Circuit of deployment %r is open for %.1f seconds",
+            self.deployment,
+            self.open_time,
+        )
+
+
+class CircuitBreaker:
+    """Circuit breaking of the requests per deployment.
+
+    Every deployment (the endpoint, the deployment name and the API version)
+    gets its own `Circuit` built with the given parameters.
+    The instances sharing the breaker share the circuits of their deployments.
+
+    Example:
+        .. code-block:: python
+
+            breaker = CircuitBreaker(failure_rate_threshold=0.5, open_time=30)
+            llm = AzureChatOpenAI(
+                ..., circuit_breaker=breaker, fallback_llm=smaller_llm
+            )
+            print(breaker.snapshot())
+    """
+
+    def __init__(self, **circuit_params: Any):
+        Circuit(**circuit_params)
+        self.circuit_params = circuit_params
+        self._circuits: Dict[Hashable, Circuit] = {}
+        self._lock = threading.Lock()
+
+    def get_circuit(self, deployment: Hashable) -> Circuit:
+        """The circuit of the deployment."""
+        if (circuit := self._circuits.get(deployment)) is None:
+            with self._lock:
+                if (circuit := self._circuits.get(deployment)) is None:
+                    circuit = Circuit(**self.circuit_params)
+                    circuit.deployment = deployment
+                    self._circuits[deployment] = circuit
+        return circuit
+
+    def snapshot(self) -> Dict[Hashable, Dict[str, Any]]:
+        """The state, the calls in the window and the rates
+        of the failed and the slow calls of every deployment."""
+        return {
+            deployment: circuit.snapshot()
+            for deployment, circuit in list(self._circuits.items())
+        }
+
+
+def stream_with_fallback(
+    chunks: Iterator[_T], fallback: Callable[[], Iterator[_T]]
+) -> Iterator[_T]:
+    """The chunks of the stream or, if the circuit is open
+    before the first chunk, the chunks of the fallback."""
+    started = False
+    try:
+        for chunk in chunks:
+            started = True
+            yield chunk
+    except CircuitOpenError:
+        if started:
+            raise
+    else:
+        return
+    yield from fallback()
+
+
+async def astream_with_fallback(
+    chunks: AsyncIterator[_T], fallback: Callable[[], AsyncIterator[_T]]
+) -> AsyncIterator[_T]:
+    """The chunks of the async stream or, if the circuit is open
+    before the first chunk, the chunks of the fallback."""
+    started = False
+    try:
+        async for chunk in chunks:
+            started = True
+            yield chunk
+    except CircuitOpenError:
+        if started:
+            raise
+    else:
+        return
+    async for chunk in fallback():
+        yield chunk
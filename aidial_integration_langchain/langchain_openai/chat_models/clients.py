@@ -0,0 +1,293 @@
+"""Process-wide registry of the shared openai clients and connection pools.
+
+Chat model instances which talk to the same endpoint with the same
+credentials and timeouts share a single openai client,
+and all clients of the same endpoint share a single HTTP connection pool.
+So creating many model instances (e.g. one per tenant or per temperature)
+doesn't lead to connection churn and repeated TLS handshakes.
+"""
+
+import asyncio
+import hashlib
+import inspect
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Mapping, Optional
+
+import httpx
+import openai
+from openai._constants import DEFAULT_CONNECTION_LIMITS
+from pydantic import SecretStr
+
+
+@dataclass
+class _Entry:
+    value: Any
+    refs: int
+    # The event loop the value is bound to, if any
+    loop: Optional["weakref.ReferenceType[asyncio.AbstractEventLoop]"] = None
+
+    @property
+    def stale(self) -> bool:
+        """Whether the event loop the value is bound to is closed."""
+        if self.loop is None:
+            return False
+        loop = self.loop()
+        return loop is None or loop.is_closed()
+
+
+class ClientRegistry:
+    """Reference-counted registry of clients.
+
+    A client is created on the first acquisition of its key and
+    is shared by all the following acquisitions of the same key.
+    The client stays in the registry when all its references are released,
+    so that the model instances created per request reuse the pooled connections.
+    Use `prune` to drop the unused clients.
+    The clients bound to an event loop are dropped once the loop is closed.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, _Entry] = {}
+
+    def acquire(
+        self,
+        key: Hashable,
+        factory: Callable[[], Any],
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+    ) -> Any:
+        """Get the client for the key creating it with the factory if needed.
+
+        The client created for the given event loop is dropped
+        (without closing it) once the loop is closed.
+        """
+        with self._lock:
+            if loop is not None:
+                self._drop_stale()
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(
+                    value=factory(),
+                    refs=0,
+                    loop=None if loop is None else weakref.ref(loop),
+                )
+            entry.refs += 1
+            return entry.value
+
+    def _drop_stale(self) -> int:
+        stale = [k for k, e in self._entries.items() if e.stale]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def release(self, *keys: Hashable) -> None:
+        """Release the references to the clients acquired earlier."""
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry.refs > 0:
+                    entry.refs -= 1
+
+    def prune(self) -> int:
+        """Drop the clients without references and the clients
+        of the closed event loops and return their number.
+
+        The clients are dropped, but not closed: copies of a model instance
+        may still be using them. The dropped client is closed
+        when it's garbage collected.
+        """
+        with self._lock:
+            stale = self._drop_stale()
+            unused = [k for k, e in self._entries.items() if e.refs <= 0]
+            for key in unused:
+                del self._entries[key]
+            return stale + len(unused)
+
+    def refs(self, key: Hashable) -> int:
+        """The number of references to the client of the key."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return 0 if entry is None else entry.refs
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _pop_all(self) -> List[Any]:
+        with self._lock:
+            values = [entry.value for entry in self._entries.values()]
+            self._entries.clear()
+            return values
+
+    def close(self) -> None:
+        """Close all the synchronous clients and drop all the clients.
+
+        Use `aclose` to close the asynchronous clients as well.
+        """
+        for value in self._pop_all():
+            close = getattr(value, "close", None)
+            if close is not None and not inspect.iscoroutinefunction(close):
+                close()
+
+    async def aclose(self) -> None:
+        """Close all the clients and drop them from the registry."""
+        for value in self._pop_all():
+            if isinstance(value, httpx.AsyncClient):
+                await value.aclose()
+            elif (close := getattr(value, "close", None)) is not None:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+
+
+default_client_registry = ClientRegistry()
+"""The registry used by chat models unless another one is configured."""
+
+
+def get_pool_limits(
+    max_connections: Optional[int],
+    max_keepalive_connections: Optional[int],
+    keepalive_expiry: Optional[float],
+) -> httpx.Limits:
+    """Build the connection pool limits falling back to the openai defaults."""
+    return httpx.Limits(
+        max_connections=(
+            DEFAULT_CONNECTION_LIMITS.max_connections
+            if max_connections is None
+            else max_connections
+        ),
+        max_keepalive_connections=(
+            DEFAULT_CONNECTION_LIMITS.max_keepalive_connections
+            if max_keepalive_connections is None
+            else max_keepalive_connections
+        ),
+        keepalive_expiry=(
+            DEFAULT_CONNECTION_LIMITS.keepalive_expiry
+            if keepalive_expiry is None
+            else keepalive_expiry
+        ),
+    )
+
+
+def get_running_loop(is_async: bool) -> Optional[asyncio.AbstractEventLoop]:
+    """The event loop the asynchronous clients created now are bound to."""
+    if is_async:
+        try:
+            return asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+    return None
+
+
+def get_pool_key(
+    is_async: bool, endpoint: Optional[str], limits: httpx.Limits
+) -> Hashable:
+    """The key of the connection pool of the endpoint.
+
+    The asynchronous pools are bound to the running event loop,
+    since the pooled connections can't be used by other event loops.
+    The loop is referenced weakly, so a new loop allocated
+    at the address of a closed one doesn't get its pools.
+    """
+    loop = get_running_loop(is_async)
+    loop_ref = None if loop is None else weakref.ref(loop)
+    return (
+        "pool",
+        "async" if is_async else "sync",
+        endpoint,
+        limits.max_connections,
+        limits.max_keepalive_connections,
+        limits.keepalive_expiry,
+        loop_ref,
+    )
+
+
+def create_pool(is_async: bool, limits: httpx.Limits) -> httpx.Client:
+    """Create the HTTP client with the same defaults the openai SDK uses."""
+    if is_async:
+        return openai.DefaultAsyncHttpxClient(limits=limits)  # type: ignore
+    return openai.DefaultHttpxClient(limits=limits)
+
+
+def _fingerprint(secret: str) -> str:
+    return hashlib.sha256(secret.encode("utf-8")).hexdigest()
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, SecretStr):
+        return _fingerprint(value.get_secret_value())
+    if isinstance(value, httpx.Timeout):
+        return _freeze(value.as_dict())
+    if isinstance(value, Mapping):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return ("id", id(value))
+
+
+_SECRET_PARAMS = ("api_key", "azure_ad_token")
+
+
+def get_client_key(
+    is_async: bool, pool_key: Hashable, client_params: Mapping[str, Any]
+) -> Hashable:
+    """The key of the openai client with the given parameters.
+
+    The credentials are included as fingerprints, so that
+    the registry doesn't keep the secrets themselves.
+    """
+    return (
+        "client",
+        "async" if is_async else "sync",
+        pool_key,
+        _freeze(_hide_secrets(client_params)),
+    )
+
+
+def get_caller_key(caller_params: Mapping[str, Any]) -> Hashable:
+    """The key of the caller with the given credentials,
+    default headers and query.
+
+    The credentials are included as fingerprints,
+    so the key may be kept or hashed into other keys.
+    The callables (e.g. `azure_ad_token_provider`) are included
+    by their identity: only the callers sharing the same provider
+    get the same key.
+    """
+    return _freeze(
+        _hide_secrets(
+            {
+                k: _get_callable_identity(v) if callable(v) else v
+                for k, v in caller_params.items()
+            }
+        )
+    )
+
+
+def _get_callable_identity(func: Callable) -> Hashable:
+    # A bound method is created anew on every attribute access,
+    # so it's identified by its function and the bound object.
+    bound = getattr(func, "__self__", None)
+    func = getattr(func, "__func__", func)
+    return (
+        "callable",
+        getattr(func, "__module__", None),
+        getattr(func, "__qualname__", type(func).__qualname__),
+        id(func),
+        None if bound is None else id(bound),
+    )
+
+
+def _hide_secrets(params: Mapping[str, Any]) -> Dict[str, Any]:
+    return {
+        k: (
+            _fingerprint(v) if k in _SECRET_PARAMS and isinstance(v, str) else v
+        )
+        for k, v in params.items()
+    }
@@ -0,0 +1,245 @@
+"""Single-flight execution of concurrent identical requests."""
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+_T = TypeVar("_T")
+
+_Stream = Tuple[AsyncIterator[dict], Dict]
+_FlightKey = Tuple[int, str]
+
+
+def _copy(value: Any) -> Any:
+    """Copy of the dictionaries, lists and tuples of the JSON-like value,
+    so that every caller may modify its own result."""
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_copy(v) for v in value)
+    return value
+
+
+class _Flight:
+    """The request shared by its subscribers."""
+
+    joinable = True
+
+    def __init__(self, send: Callable[[], Awaitable[Any]]):
+        self.subscribers = 0
+        self.task = asyncio.ensure_future(send())
+
+
+class _StreamFlight:
+    """The streaming request fanned out to its subscribers.
+
+    The chunks are read by a background task, so the stream outlives
+    the subscriber which started it. Every subscriber reads the copies
+    of the chunks from its own queue. The first `replay_limit` chunks
+    are kept, so that the subscribers joining later replay them first;
+    a longer stream can't be joined anymore.
+    """
+
+    def __init__(
+        self,
+        open_stream: Callable[[], AsyncContextManager[_Stream]],
+        replay_limit: int,
+    ):
+        self.subscribers = 0
+        self.chunks: Optional[List[dict]] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.opened: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._replay_limit = replay_limit
+        self._queues: List[Deque[dict]] = []
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump(open_stream))
+
+    @property
+    def joinable(self) -> bool:
+        return self.chunks is not None
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def _pump(
+        self, open_stream: Callable[[], AsyncContextManager[_Stream]]
+    ) -> None:
+        try:
+            async with open_stream() as (chunks, generation_info):
+                self.opened.set_result(generation_info)
+                async for chunk in chunks:
+                    self._publish(chunk)
+        except asyncio.CancelledError:
+            self.opened.cancel()
+            raise
+        except Exception as e:
+            if self.opened.done():
+                self.error = e
+            else:
+                self.opened.set_exception(e)
+                # Retrieved, so it isn't logged if every subscriber has left.
+                self.opened.exception()
+        finally:
+            self.done = True
+            self._notify()
+
+    def _publish(self, chunk: dict) -> None:
+        for queue in self._queues:
+            queue.append(_copy(chunk))
+        if self.chunks is not None:
+            if len(self.chunks) < self._replay_limit:
+                self.chunks.append(chunk)
+            else:
+                self.chunks = None
+        self._notify()
+
+    def subscribe(self) -> Deque[dict]:
+        """The queue of the new subscriber filled with the replayed chunks."""
+        assert self.chunks is not None, "The stream can't be joined."
+        queue = deque(_copy(chunk) for chunk in self.chunks)
+        self._queues.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: Deque[dict]) -> None:
+        self._queues.remove(queue)
+        queue.clear()
+
+    async def read(self, queue: Deque[dict]) -> AsyncIterator[dict]:
+        while True:
+            if queue:
+                yield queue.popleft()
+            elif self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                await self._changed.wait()
+
+
+class RequestCoalescer:
+    """Single-flight execution of concurrent identical asynchronous requests.
+
+    Concurrent calls with the same request key share one upstream request.
+    A blocking request resolves all its callers with the same response.
+    A streaming request is read in the background: every subscriber replays
+    the chunks received so far and then receives the new ones as they arrive.
+
+    A caller which is cancelled or stops reading the stream leaves the request,
+    which is cancelled (closing the upstream connection) only once
+    all its callers have left. Errors are propagated to all the callers.
+
+    Every caller receives its own copy of the response or the chunks.
+    The first `replay_limit` chunks of a stream are kept for the subscribers
+    joining later; once the stream is longer, the calls coming next
+    start a new request.
+
+    Only the requests of the same event loop and the same coalescer
+    are coalesced, so the instances meant to share the requests
+    must share the coalescer.
+
+    Example:
+        .. code-block:: python
+
+            llm = AzureChatOpenAI(..., request_coalescer=RequestCoalescer())
+            ...
+            print(llm.request_coalescer.requests, llm.request_coalescer.coalesced)
+    """
+
+    def __init__(self, replay_limit: int = 1000) -> None:
+        if replay_limit < 0:
+            raise ValueError("replay_limit must be non-negative.")
+        self.replay_limit = replay_limit
+        # The number of the requests sent upstream
+        self.requests = 0
+        # The number of the calls which joined a request in flight
+        self.coalesced = 0
+        self._flights: Dict[_FlightKey, Union[_Flight, _StreamFlight]] = {}
+
+    def __len__(self) -> int:
+        """The number of the requests in flight."""
+        return len(self._flights)
+
+    def _join(
+        self, key: str, start: Callable[[], Union[_Flight, _StreamFlight]]
+    ) -> Tuple[_FlightKey, Any]:
+        flight_key = (id(asyncio.get_running_loop()), key)
+        flight = self._flights.get(flight_key)
+        if flight is None or not flight.joinable:
+            flight = self._flights[flight_key] = start()
+            flight.task.add_done_callback(
+                lambda _: self._forget(flight_key, flight)
+            )
+            self.requests += 1
+        else:
+            self.coalesced += 1
+        flight.subscribers += 1
+        return flight_key, flight
+
+    def _leave(
+        self, flight_key: _FlightKey, flight: Union[_Flight, _StreamFlight]
+    ) -> None:
+        flight.subscribers -= 1
+        if flight.subscribers == 0 and not flight.task.done():
+            # The calls coming next start a new request.
+            self._forget(flight_key, flight)
+            flight.task.cancel()
+
+    def _forget(
+        self, flight_key: _FlightKey, flight: Union[_Flight, _StreamFlight]
+    ) -> None:
+        if self._flights.get(flight_key) is flight:
+            del self._flights[flight_key]
+
+    async def run(self, key: str, send: Callable[[], Awaitable[_T]]) -> _T:
+        """Send the request unless the identical one is in flight.
+
+        Returns:
+            The result of the request shared by all its callers.
+        """
+        flight_key, flight = self._join(key, lambda: _Flight(send))
+        try:
+            result = await asyncio.shield(flight.task)
+            # The last caller to leave takes the result itself.
+            return _copy(result) if flight.subscribers > 1 else result
+        finally:
+            self._leave(flight_key, flight)
+
+    @asynccontextmanager
+    async def stream(
+        self, key: str, open_stream: Callable[[], AsyncContextManager[_Stream]]
+    ) -> AsyncIterator[_Stream]:
+        """Open the stream unless the identical one is in flight.
+
+        Yields:
+            The subscriber's iterator over the chunk dictionaries
+            and the base generation info.
+        """
+        flight_key, flight = self._join(
+            key, lambda: _StreamFlight(open_stream, self.replay_limit)
+        )
+        # Subscribed right away, so no chunk is missed once the replay ends.
+        queue = flight.subscribe()
+        try:
+            generation_info = await asyncio.shield(flight.opened)
+            yield flight.read(queue), dict(generation_info)
+        finally:
+            flight.unsubscribe(queue)
+            self._leave(flight_key, flight)
@@ -0,0 +1,264 @@
+"""Adaptive concurrency of the requests to a deployment."""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import (
+    Any,
+    AsyncIterator,
+    Deque,
+    Dict,
+    Hashable,
+    Iterator,
+    Optional,
+)
+
+import httpx
+import openai
+
+from aidial_integration_langchain.langchain_openai.chat_models.observers import (
+    retry_observer,
+)
+
+logger = logging.getLogger(__name__)
+
+_OVERLOAD_STATUS_CODES = frozenset({429, 503})
+
+
+def is_overload_status(status_code: int) -> bool:
+    """Whether the response status signals that the deployment is overloaded."""
+    return status_code in _OVERLOAD_STATUS_CODES
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """Whether the error signals that the deployment is overloaded."""
+    return isinstance(error, openai.APIStatusError) and is_overload_status(
+        error.status_code
+    )
+
+
+class _Slot:
+    """The permission to send a request, measuring its latency."""
+
+    __slots__ = ("started", "completed")
+
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.completed: Optional[float] = None
+
+    def complete(self) -> None:
+        """Mark the response as received, e.g. when the stream is opened."""
+        if self.completed is None:
+            self.completed = time.monotonic()
+
+
+class AIMDLimiter:
+    """Concurrency limit of a deployment controlled by AIMD.
+
+    The limit grows additively (by `increase` per `limit` successful requests,
+    i.e. roughly by `increase` per round trip) and is cut multiplicatively
+    by `decrease_factor` when the deployment signals overload:
+    429/503 responses (including the ones retried by the openai SDK)
+    and, if `latency_tolerance` is set, the latency exceeding
+    the baseline latency by that factor. Only one cut is made
+    per round trip: the signals of the requests sent before the last cut
+    are ignored.
+
+    The requests above the limit wait in the FIFO queue.
+    """
+
+    def __init__(
+        self,
+        initial_limit: float = 4,
+        min_limit: float = 1,
+        max_limit: float = 64,
+        increase: float = 1,
+        decrease_factor: float = 0.5,
+        latency_tolerance: Optional[float] = None,
+    ):
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError(
+                "The limits must satisfy 1 <= min_limit <= initial_limit <= max_limit."
+            )
+        if not 0 < decrease_factor < 1:
+            raise ValueError("decrease_factor must be between 0 and 1.")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._baseline_latency: Optional[float] = None
+        self._last_decrease = float("-inf")
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        """The current number of the requests allowed in flight."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """The number of the requests in flight."""
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """The number of the requests waiting for a slot."""
+        return len(self._waiters)
+
+    def snapshot(self) -> Dict[str, int]:
+        """The current limit, the requests in flight and the queue depth."""
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+        }
+
+    async def acquire(self) -> _Slot:
+        """Wait for a free slot."""
+        with self._lock:
+            if not self._waiters and self._in_flight < self.limit:
+                self._in_flight += 1
+                return _Slot()
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    # The slot has been already granted.
+                    self._release_slot()
+            raise
+        return _Slot()
+
+    def release(
+        self, slot: _Slot, error: Optional[BaseException] = None
+    ) -> None:
+        """Free the slot adjusting the limit by the outcome of the request."""
+        with self._lock:
+            if error is None or slot.completed is not None:
+                self._on_success(slot)
+            elif is_overload_error(error):
+                self._on_overload(slot)
+            self._release_slot()
+
+    def on_retry(self, slot: _Slot, response: httpx.Response) -> None:
+        """Take into account the response retried by the openai SDK."""
+        if is_overload_status(response.status_code):
+            with self._lock:
+                self._on_overload(slot)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[_Slot]:
+        """Hold a slot while sending the request."""
+        slot = await self.acquire()
+        try:
+            yield slot
+        except BaseException as e:
+            self.release(slot, e)
+            raise
+        else:
+            self.release(slot)
+
+    @contextmanager
+    def observe_retries(self, slot: _Slot) -> Iterator[None]:
+        """Observe the responses retried by the openai SDK within the block."""
+        token = retry_observer.set(
+            lambda response: self.on_retry(slot, response)
+        )
+        try:
+            yield
+        finally:
+            retry_observer.reset(token)
+
+    def _release_slot(self) -> None:
+        self._in_flight -= 1
+        # The waiters removed from the queue own their slots,
+        # the cancelled ones release them.
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            self._in_flight += 1
+            waiter.get_loop().call_soon_threadsafe(_grant, waiter)
+
+    def _on_success(self, slot: _Slot) -> None:
+        latency = (slot.completed or time.monotonic()) - slot.started
+        baseline = self._baseline_latency
+        if baseline is None or latency < baseline:
+            self._baseline_latency = latency
+        else:
+            # Drifts slowly towards the recent latencies.
+            self._baseline_latency = baseline + (latency - baseline) * 0.01
+            if (
+                self.latency_tolerance is not None
+                and latency > baseline * self.latency_tolerance
+            ):
+                self._on_overload(slot)
+                return
+        self._limit = min(
+            self.max_limit, self._limit + self.increase / self._limit
+        )
+
+    def _on_overload(self, slot: _Slot) -> None:
+        if slot.started < self._last_decrease:
+            return
+        self._last_decrease = time.monotonic()
+        self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+        logger.debug("Concurrency limit decreased to %.1f", self._limit)
+
+
+def _grant(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class AdaptiveConcurrency:
+    """Adaptive concurrency of the asynchronous requests per deployment.
+
+    Every deployment (the endpoint, the deployment name and the API version)
+    gets its own `AIMDLimiter` built with the given parameters.
+    The requests above the current limit of the deployment wait in the queue,
+    so `abatch` and concurrent `ainvoke`/`astream` calls may be issued
+    without a fixed `max_concurrency`. The instances sharing it
+    share the limit of each deployment.
+
+    Example:
+        .. code-block:: python
+
+            concurrency = AdaptiveConcurrency(initial_limit=8, max_limit=128)
+            llm = AzureChatOpenAI(..., adaptive_concurrency=concurrency)
+            await llm.abatch(prompts)
+            print(concurrency.snapshot())
+    """
+
+    def __init__(self, **limiter_params: Any):
+        # Validates the parameters in advance
+        AIMDLimiter(**limiter_params)
+        self.limiter_params = limiter_params
+        self._limiters: Dict[Hashable, AIMDLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get_limiter(self, deployment: Hashable) -> AIMDLimiter:
+        """The limiter of the deployment."""
+        if (limiter := self._limiters.get(deployment)) is None:
+            with self._lock:
+                limiter = self._limiters.setdefault(
+                    deployment, AIMDLimiter(**self.limiter_params)
+                )
+        return limiter
+
+    def snapshot(self) -> Dict[Hashable, Dict[str, int]]:
+        """The current limit, the requests in flight and the queue depth
+        of every deployment."""
+        return {
+            deployment: limiter.snapshot()
+            for deployment, limiter in list(self._limiters.items())
+        }
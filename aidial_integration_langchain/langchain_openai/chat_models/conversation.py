@@ -0,0 +1,115 @@
+"""Append-only conversations keeping their messages encoded to JSON."""
+
+import operator
+import threading
+from typing import Any, Callable, Iterable, List, Sequence
+
+from langchain_core.messages import BaseMessage, get_buffer_string
+from langchain_core.prompt_values import PromptValue
+from pydantic import Field, PrivateAttr
+
+from aidial_integration_langchain.langchain_openai.chat_models.encoded import (
+    EncodedMessages,
+    json_dumps,
+)
+
+
+class ConversationMessages(list):
+    """The messages of the conversation passed to the chat model."""
+
+    def __init__(self, conversation: "Conversation"):
+        super().__init__(conversation.messages)
+        self.conversation = conversation
+
+
+class _EncodedPrefix:
+    """The messages encoded so far along with their dictionaries and JSON."""
+
+    __slots__ = ("lock", "messages", "dicts", "segments")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.messages: List[BaseMessage] = []
+        self.dicts: List[dict] = []
+        self.segments: List[bytes] = []
+
+
+class Conversation(PromptValue):
+    """A conversation which keeps its messages converted and encoded to JSON.
+
+    In multi-turn applications the whole conversation history is sent
+    on every turn. When the conversation is passed to the chat model,
+    only the messages appended since the previous request are converted
+    and encoded, and the request body is assembled from the stored
+    JSON segments of the history, so the cost of a turn grows with the size
+    of the turn rather than with the size of the whole history
+    (e.g. of the DIAL `custom_content.state` carried by every message).
+
+    The history is expected to be append-only: the encodings are reused
+    only for the unchanged prefix of the messages, which must not be
+    modified in place.
+
+    Example:
+        .. code-block:: python
+
+            conversation = Conversation()
+            conversation.append(HumanMessage("Hi!"))
+            conversation.append(llm.invoke(conversation))
+            conversation.append(HumanMessage("How are you?"))
+            conversation.append(llm.invoke(conversation))
+    """
+
+    messages: List[BaseMessage] = Field(default_factory=list)
+    """The messages of the conversation."""
+
+    _encoded: _EncodedPrefix = PrivateAttr(default_factory=_EncodedPrefix)
+
+    def append(self, message: BaseMessage) -> None:
+        """Append the message to the conversation."""
+        self.messages.append(message)
+
+    def extend(self, messages: Iterable[BaseMessage]) -> None:
+        """Append the messages to the conversation."""
+        self.messages.extend(messages)
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def to_string(self) -> str:
+        """Return the conversation as a string."""
+        return get_buffer_string(self.messages)
+
+    def to_messages(self) -> List[BaseMessage]:
+        """Return the messages of the conversation."""
+        return ConversationMessages(self)
+
+    def encode(
+        self,
+        messages: Sequence[BaseMessage],
+        convert_message: Callable[[BaseMessage], Any],
+    ) -> EncodedMessages:
+        """Convert and encode the messages reusing the encoded prefix."""
+        state = self._encoded
+        with state.lock:
+            encoded = state.messages
+            dicts = state.dicts
+            segments = state.segments
+
+            prefix = len(encoded)
+            if prefix > len(messages) or not all(
+                map(operator.is_, encoded, messages)
+            ):
+                prefix = 0
+                for cached, message in zip(encoded, messages):
+                    if cached is not message:
+                        break
+                    prefix += 1
+                del encoded[prefix:], dicts[prefix:], segments[prefix:]
+
+            for message in messages[prefix:]:
+                message_dict = convert_message(message)
+                encoded.append(message)
+                dicts.append(message_dict)
+                segments.append(json_dumps(message_dict))
+
+            return EncodedMessages(dicts, list(segments))
@@ -0,0 +1,238 @@
+"""Requests with the messages already encoded to JSON.
+
+The openai SDK transforms and encodes the whole request body on every request.
+The chat completions below send the messages encoded in advance
+(`EncodedMessages`, e.g. of a `Conversation`) with a separate client,
+so that only the rest of the request body is encoded by the SDK
+and the HTTP body is assembled from the stored message segments.
+Any other messages are sent by the openai client as usual.
+
+orjson is used for encoding when it's installed,
+otherwise the standard json module is used.
+"""
+
+import json
+import threading
+from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar
+
+import httpx
+from openai import AsyncStream, Stream
+from openai._base_client import make_request_options
+from openai._models import FinalRequestOptions
+from openai._types import NOT_GIVEN
+from openai._utils import maybe_transform
+from openai.resources.chat import completions
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from openai.types.chat.completion_create_params import CompletionCreateParams
+
+from aidial_integration_langchain.langchain_openai.chat_models import (
+    observers,
+)
+
+try:
+    from orjson import dumps as _orjson_dumps
+except ImportError:
+    _orjson_dumps = None
+
+__all__ = [
+    "json_dumps",
+    "EncodedMessages",
+    "AzureOpenAI",
+    "AsyncAzureOpenAI",
+    "Completions",
+    "AsyncCompletions",
+]
+
+_C = TypeVar("_C")
+
+
+def json_dumps(value: Any) -> bytes:
+    """Encode the value to JSON bytes."""
+    if _orjson_dumps is not None:
+        try:
+            return _orjson_dumps(value)
+        except TypeError:
+            # E.g. non-string dictionary keys
+            pass
+    return json.dumps(value).encode("utf-8")
+
+
+class EncodedMessages(list):
+    """The list of message dictionaries along with their JSON encodings."""
+
+    def __init__(self, messages: List[dict], segments: List[bytes]):
+        super().__init__(messages)
+        self.segments = segments
+
+
+class _EncodedBody:
+    __slots__ = ("head", "segments")
+
+    def __init__(self, head: Dict[str, Any], segments: List[bytes]):
+        self.head = head
+        self.segments = segments
+
+
+def _encode_body(
+    messages: EncodedMessages, params: Dict[str, Any]
+) -> Optional[_EncodedBody]:
+    if len(messages.segments) != len(messages):
+        # The list was modified after encoding.
+        return None
+    head = maybe_transform(params, CompletionCreateParams)
+    # Only a missing input is transformed into None
+    assert head is not None
+    return _EncodedBody(head, messages.segments)
+
+
+class _EncodedBodyClient:
+    """Builds the requests with the encoded body from its segments."""
+
+    def _build_request(self, options: FinalRequestOptions) -> httpx.Request:
+        body = options.json_data
+        if not isinstance(body, _EncodedBody):
+            return super()._build_request(options)  # type: ignore
+
+        # The rest of the body is encoded by the SDK as usual
+        # (including the merge with `extra_body`).
+        request = super()._build_request(  # type: ignore
+            options.model_copy(update={"json_data": body.head})
+        )
+        head = request.content
+        content = b"".join(
+            (
+                b'{"messages":[',
+                b",".join(body.segments),
+                b"]}" if head == b"{}" else b"],",
+                b"" if head == b"{}" else head[1:],
+            )
+        )
+        headers = request.headers.copy()
+        headers.pop("Content-Length", None)
+        return httpx.Request(
+            request.method,
+            request.url,
+            headers=headers,
+            content=content,
+            extensions=request.extensions,
+        )
+
+
+class AzureOpenAI(_EncodedBodyClient, observers.AzureOpenAI):
+    pass
+
+
+class AsyncAzureOpenAI(_EncodedBodyClient, observers.AsyncAzureOpenAI):
+    pass
+
+
+class _EncodedClient(Generic[_C]):
+    """The client sending the encoded messages, created on first use."""
+
+    def __init__(self, create: Callable[[], _C]):
+        self._create = create
+        self._client: Optional[_C] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> _C:
+        if (client := self._client) is None:
+            with self._lock:
+                if (client := self._client) is None:
+                    client = self._client = self._create()
+        return client
+
+
+class Completions(completions.Completions):
+    """The chat completions sending `EncodedMessages`
+    with the client created by `create_encoded_client` on first use."""
+
+    def __init__(
+        self,
+        client: Any,
+        create_encoded_client: Callable[[], AzureOpenAI],
+    ):
+        super().__init__(client)
+        self._encoded_client = _EncodedClient(create_encoded_client)
+
+    def create(  # type: ignore[override]
+        self,
+        *,
+        messages: Any,
+        extra_headers: Any = None,
+        extra_query: Any = None,
+        extra_body: Any = None,
+        timeout: Any = NOT_GIVEN,
+        **params: Any,
+    ) -> Any:
+        if isinstance(messages, EncodedMessages) and (
+            body := _encode_body(messages, params)
+        ):
+            return self._encoded_client.get().post(
+                "/chat/completions",
+                body=body,  # type: ignore[arg-type]
+                options=make_request_options(
+                    extra_headers=extra_headers,
+                    extra_query=extra_query,
+                    extra_body=extra_body,
+                    timeout=timeout,
+                ),
+                cast_to=ChatCompletion,
+                stream=params.get("stream") or False,
+                stream_cls=Stream[ChatCompletionChunk],
+            )
+        return super().create(
+            messages=messages,
+            extra_headers=extra_headers,
+            extra_query=extra_query,
+            extra_body=extra_body,
+            timeout=timeout,
+            **params,
+        )
+
+
+class AsyncCompletions(completions.AsyncCompletions):
+    """The chat completions sending `EncodedMessages`
+    with the client created by `create_encoded_client` on first use."""
+
+    def __init__(
+        self,
+        client: Any,
+        create_encoded_client: Callable[[], AsyncAzureOpenAI],
+    ):
+        super().__init__(client)
+        self._encoded_client = _EncodedClient(create_encoded_client)
+
+    async def create(  # type: ignore[override]
+        self,
+        *,
+        messages: Any,
+        extra_headers: Any = None,
+        extra_query: Any = None,
+        extra_body: Any = None,
+        timeout: Any = NOT_GIVEN,
+        **params: Any,
+    ) -> Any:
+        if isinstance(messages, EncodedMessages) and (
+            body := _encode_body(messages, params)
+        ):
+            return await self._encoded_client.get().post(
+                "/chat/completions",
+                body=body,  # type: ignore[arg-type]
+                options=make_request_options(
+                    extra_headers=extra_headers,
+                    extra_query=extra_query,
+                    extra_body=extra_body,
+                    timeout=timeout,
+                ),
+                cast_to=ChatCompletion,
+                stream=params.get("stream") or False,
+                stream_cls=AsyncStream[ChatCompletionChunk],
+            )
+        return await super().create(
+            messages=messages,
+            extra_headers=extra_headers,
+            extra_query=extra_query,
+            extra_body=extra_body,
+            timeout=timeout,
+            **params,
+        )
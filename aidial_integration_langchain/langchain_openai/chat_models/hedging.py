@@ -0,0 +1,267 @@
+"""Hedging of the slow requests by duplicate requests."""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+_T = TypeVar("_T")
+
+_Stream = Tuple[AsyncIterator[dict], Dict]
+
+# The number of the new latency samples the hedge delay is recomputed after
+_RECOMPUTE_EVERY = 16
+
+
+class _OpenedStream:
+    """The stream which has received its first chunk."""
+
+    __slots__ = ("stack", "chunks", "first", "generation_info")
+
+    def __init__(
+        self,
+        stack: AsyncExitStack,
+        chunks: AsyncIterator[dict],
+        first: Optional[dict],
+        generation_info: Dict,
+    ):
+        self.stack = stack
+        self.chunks = chunks
+        self.first = first
+        self.generation_info = generation_info
+
+    async def iterate(self) -> AsyncIterator[dict]:
+        if self.first is None:
+            return
+        yield self.first
+        async for chunk in self.chunks:
+            yield chunk
+
+
+class RequestHedger:
+    """Hedging of the slow async requests by duplicate requests.
+
+    If no response (or no first chunk of a stream) arrives
+    within the hedge delay, a duplicate request is sent.
+    The first successful result wins and the other request is cancelled,
+    closing its connection. The hedge delay is the `percentile`
+    of the recent latencies (up to the first chunk for streams),
+    or the fixed `delay` if it's set. No hedges are sent until
+    `min_samples` latencies are measured. A cancelled request counts
+    with the time it has taken if that's beyond the hedge delay.
+
+    The hedges are capped by the budget: every request earns `budget`
+    hedges (e.g. 0.05 allows 5% extra requests) accumulated
+    up to `max_burst`, every hedge spends one. The instances sharing
+    the hedger share its latencies and its budget.
+
+    Example:
+        .. code-block:: python
+
+            hedger = RequestHedger(percentile=95, budget=0.05)
+            llm = AzureChatOpenAI(..., request_hedger=hedger)
+            ...
+            print(hedger.snapshot())
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95,
+        delay: Optional[float] = None,
+        min_samples: int = 20,
+        window: int = 1000,
+        budget: float = 0.05,
+        max_burst: float = 10,
+    ):
+        if not 0 < percentile < 100:
+            raise ValueError("percentile must be between 0 and 100.")
+        if budget < 0:
+            raise ValueError("budget must not be negative.")
+        self.percentile = percentile
+        self.delay = delay
+        self.min_samples = min_samples
+        self.budget = budget
+        self.max_burst = max_burst
+        # The number of the hedged requests
+        self.requests = 0
+        # The number of the hedges sent
+        self.hedges = 0
+        # The number of the hedges which won
+        self.wins = 0
+        self._tokens = 0.0
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._new_latencies = 0
+        self._delay: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The counters and the current hedge delay."""
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "wins": self.wins,
+            "delay": self.get_delay(),
+        }
+
+    def get_delay(self) -> Optional[float]:
+        """The time in seconds after which the request is hedged, if known."""
+        if self.delay is not None:
+            return self.delay
+        return self._delay
+
+    async def run(
+        self,
+        send: Callable[[], Awaitable[_T]],
+        send_hedge: Callable[[], Awaitable[_T]],
+    ) -> _T:
+        """Send the request, hedging it if the response is late.
+
+        Returns:
+            The first successful result.
+        """
+        winner = await self._race(send, send_hedge)
+        return winner.result()
+
+    @asynccontextmanager
+    async def stream(
+        self,
+        open_stream: Callable[[], AsyncContextManager[_Stream]],
+        open_hedge: Callable[[], AsyncContextManager[_Stream]],
+    ) -> AsyncIterator[_Stream]:
+        """Open the stream, hedging it if the first chunk is late.
+
+        Yields:
+            The iterator over the chunks of the first stream
+            which has received its first chunk, and its generation info.
+        """
+        winner = await self._race(
+            lambda: _open(open_stream), lambda: _open(open_hedge)
+        )
+        opened: _OpenedStream = winner.result()
+        async with opened.stack:
+            yield opened.iterate(), opened.generation_info
+
+    async def _race(
+        self,
+        send: Callable[[], Awaitable[Any]],
+        send_hedge: Callable[[], Awaitable[Any]],
+    ) -> "asyncio.Future[Any]":
+        with self._lock:
+            self.requests += 1
+            self._tokens = min(self.max_burst, self._tokens + self.budget)
+        attempts = [asyncio.ensure_future(self._timed(send))]
+        winner = None
+        try:
+            delay = self.get_delay()
+            if delay is not None:
+                done, _ = await asyncio.wait(attempts, timeout=delay)
+                if not done and self._take_hedge():
+                    attempts.append(
+                        asyncio.ensure_future(self._timed(send_hedge))
+                    )
+            winner = await _first_success(attempts)
+            if winner is not attempts[0]:
+                with self._lock:
+                    self.wins += 1
+            return winner
+        finally:
+            await _cancel([task for task in attempts if task is not winner])
+
+    def _take_hedge(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            self.hedges += 1
+            return True
+
+    async def _timed(self, send: Callable[[], Awaitable[_T]]) -> _T:
+        started = time.monotonic()
+        try:
+            result = await send()
+        except asyncio.CancelledError:
+            # The latency of the losing attempt is unknown, but at least
+            # the time it has taken, which places it in the tail
+            # only if it's beyond the delay. Otherwise it's left out.
+            elapsed = time.monotonic() - started
+            delay = self.get_delay()
+            if delay is not None and elapsed > delay:
+                self._record(elapsed)
+            raise
+        self._record(time.monotonic() - started)
+        return result
+
+    def _record(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+            self._new_latencies += 1
+            if len(self._latencies) < self.min_samples or (
+                self._delay is not None
+                and self._new_latencies < _RECOMPUTE_EVERY
+            ):
+                return
+            self._new_latencies = 0
+            latencies = sorted(self._latencies)
+            index = int(len(latencies) * self.percentile / 100)
+            self._delay = latencies[min(index, len(latencies) - 1)]
+
+
+async def _open(
+    open_stream: Callable[[], AsyncContextManager[_Stream]]
+) -> _OpenedStream:
+    """Open the stream and wait for its first chunk."""
+    stack = AsyncExitStack()
+    try:
+        chunks, generation_info = await stack.enter_async_context(open_stream())
+        iterator = chunks.__aiter__()
+        try:
+            first: Optional[dict] = await iterator.__anext__()
+        except StopAsyncIteration:
+            first = None
+    except BaseException:
+        await stack.aclose()
+        raise
+    return _OpenedStream(stack, iterator, first, generation_info)
+
+
+async def _first_success(
+    attempts: Sequence["asyncio.Future[Any]"],
+) -> "asyncio.Future[Any]":
+    """The first attempt to succeed, or raise the error of the first one."""
+    pending = set(attempts)
+    while pending:
+        done, pending = await asyncio.wait(
+            pending, return_when=asyncio.FIRST_COMPLETED
+        )
+        for attempt in attempts:
+            if attempt in done and attempt.exception() is None:
+                return attempt
+    # All failed
+    return attempts[0]
+
+
+async def _cancel(attempts: Sequence["asyncio.Future[Any]"]) -> None:
+    """Cancel the attempts releasing the streams which have been opened."""
+    for attempt in attempts:
+        attempt.cancel()
+    for attempt in attempts:
+        try:
+            result = await attempt
+        except BaseException:
+            continue
+        if isinstance(result, _OpenedStream):
+            await result.stack.aclose()
@@ -0,0 +1,145 @@
+"""Memoized conversion of messages to the OpenAI message dictionaries."""
+
+import threading
+from collections import OrderedDict
+from typing import (
+    Any,
+    Callable,
+    Hashable,
+    Iterable,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+)
+
+from langchain_core.messages import BaseMessage
+
+try:
+    from orjson import dumps as _orjson_dumps
+except ImportError:
+    _orjson_dumps = None
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, dict):
+        return (dict, tuple((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return (list, tuple(_freeze(v) for v in value))
+    if isinstance(value, str) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        # Otherwise True, 1 and 1.0 would make the same key.
+        return (type(value), value)
+    # Unexpected types are distinguished by identity, which is always safe.
+    return (id(value), type(value))
+
+
+def _identity(value: Any) -> Any:
+    return ["__id__", id(value)]
+
+
+def _content_key(message: BaseMessage) -> Hashable:
+    if _orjson_dumps is not None:
+        try:
+            # Several times faster than freezing the fields,
+            # which would take longer than the conversion itself.
+            return (type(message), _orjson_dumps(message.__dict__, _identity))
+        except TypeError:
+            # E.g. non-string dictionary keys
+            pass
+    return (type(message), _freeze(message.__dict__))
+
+
+class MessageDictCache:
+    """Bounded LRU cache of the messages converted to the OpenAI dictionaries.
+
+    Multi-turn applications send the whole conversation history on every turn,
+    so the unchanged history messages are converted only once.
+
+    The messages are looked up either by their identity (`key="identity"`),
+    which assumes the messages aren't modified in place, or by their content
+    (`key="content"`), which also works for the history rebuilt from storage
+    on every turn.
+
+    The cached dictionaries are shared between the requests
+    and must not be modified.
+
+    Example:
+        .. code-block:: python
+
+            cache = MessageDictCache(maxsize=4096)
+            llm = AzureChatOpenAI(..., message_cache=cache)
+            ...
+            print(cache.hits, cache.misses)
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        key: Literal["identity", "content"] = "identity",
+    ) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1.")
+        if key not in ("identity", "content"):
+            raise ValueError(f"Unknown cache key: {key!r}")
+        self.maxsize = maxsize
+        self.key = key
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # key -> (message, converted message)
+        self._entries: "OrderedDict[Hashable, Tuple[BaseMessage, dict]]" = (
+            OrderedDict()
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """Drop the cached messages and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def convert(
+        self,
+        messages: Iterable[BaseMessage],
+        convert_message: Callable[[BaseMessage], dict],
+    ) -> List[dict]:
+        """Convert the messages taking the converted ones from the cache."""
+        messages = list(messages)
+        # The entries reference the messages,
+        # so the ids of the cached messages aren't reused.
+        keys: List[Hashable] = (
+            [id(message) for message in messages]
+            if self.key == "identity"
+            else [_content_key(message) for message in messages]
+        )
+        entries = self._entries
+        result: List[Optional[dict]] = []
+        misses: List[int] = []
+
+        with self._lock:
+            for index, key in enumerate(keys):
+                if (entry := entries.get(key)) is not None:
+                    entries.move_to_end(key)
+                    result.append(entry[1])
+                else:
+                    misses.append(index)
+                    result.append(None)
+            self.hits += len(keys) - len(misses)
+            self.misses += len(misses)
+
+        if misses:
+            for index in misses:
+                result[index] = convert_message(messages[index])
+            with self._lock:
+                for index in misses:
+                    entries[keys[index]] = (messages[index], result[index])  # type: ignore
+                    entries.move_to_end(keys[index])
+                while len(entries) > self.maxsize:
+                    entries.popitem(last=False)
+
+        return result  # type: ignore
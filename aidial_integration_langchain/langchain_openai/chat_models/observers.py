@@ -0,0 +1,97 @@
+"""Observation of the responses and the retries of the openai SDK.
+
+The clients below report the received responses to the `response_observer`
+and the responses they are about to retry to the `retry_observer`
+of the current context. The `retry_guard` of the current context
+is told about every retry and may stop the retries.
+Outside of these contexts the clients behave as the openai ones.
+"""
+
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+import httpx
+import openai
+from openai._models import FinalRequestOptions
+
+__all__ = [
+    "response_observer",
+    "retry_guard",
+    "retry_observer",
+    "AzureOpenAI",
+    "AsyncAzureOpenAI",
+]
+
+
+retry_observer: ContextVar[Optional[Callable[[httpx.Response], None]]] = (
+    ContextVar("retry_observer", default=None)
+)
+"""Called with the error responses the openai SDK is about to retry."""
+
+response_observer: ContextVar[Optional[Callable[[httpx.Response], None]]] = (
+    ContextVar("response_observer", default=None)
+)
+"""Called with the final responses, both successful and failed."""
+
+retry_guard: ContextVar[
+    Optional[Callable[[Optional[httpx.Response]], None]]
+] = ContextVar("retry_guard", default=None)
+"""Called before every retry of the openai SDK with the response retried
+(None after a connection error or a timeout), may raise to stop the retries."""
+
+# The response the openai SDK is about to retry, passed to the `retry_guard`
+_retried_response: ContextVar[Optional[httpx.Response]] = ContextVar(
+    "_retried_response", default=None
+)
+
+
+class _ObservedClient:
+    """Reports the responses and the retries to the observers."""
+
+    def _should_retry(self, response: httpx.Response) -> bool:
+        if (observer := retry_observer.get()) is not None:
+            observer(response)
+        should_retry = super()._should_retry(response)  # type: ignore
+        if should_retry and retry_guard.get() is not None:
+            _retried_response.set(response)
+        return should_retry
+
+    def _remaining_retries(
+        self, remaining_retries: Optional[int], options: FinalRequestOptions
+    ) -> int:
+        # The remaining retries are passed to the retried requests only.
+        if (
+            remaining_retries is not None
+            and (guard := retry_guard.get()) is not None
+        ):
+            response = _retried_response.get()
+            _retried_response.set(None)
+            guard(response)
+        return super()._remaining_retries(  # type: ignore
+            remaining_retries, options
+        )
+
+    def _make_status_error_from_response(
+        self, response: httpx.Response
+    ) -> openai.APIStatusError:
+        if (observer := response_observer.get()) is not None:
+            observer(response)
+        return super()._make_status_error_from_response(response)  # type: ignore
+
+    def _process_response(
+        self, *, response: httpx.Response, **kwargs: Any
+    ) -> Any:
+        # Returns the coroutine in case of the async client.
+        if (observer := response_observer.get()) is not None:
+            observer(response)
+        return super()._process_response(  # type: ignore
+            response=response, **kwargs
+        )
+
+
+class AzureOpenAI(_ObservedClient, openai.AzureOpenAI):
+    pass
+
+
+class AsyncAzureOpenAI(_ObservedClient, openai.AsyncAzureOpenAI):
+    pass
@@ -0,0 +1,54 @@
+"""Validation of the individual fields of chat models.
+
+Used to derive a model instance with a few fields overridden
+without running the validation of the whole model.
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Type
+
+from pydantic import BaseModel, ConfigDict, PydanticUserError, TypeAdapter
+from typing_extensions import Annotated
+
+_ARBITRARY_TYPES_CONFIG = ConfigDict(arbitrary_types_allowed=True)
+
+
+@lru_cache(maxsize=None)
+def get_option_names(cls: Type[BaseModel]) -> Dict[str, str]:
+    """Map the field names and aliases to the field names."""
+    names: Dict[str, str] = {}
+    for name, field in cls.model_fields.items():
+        names[name] = name
+        if field.alias is not None:
+            names[field.alias] = name
+    return names
+
+
+@lru_cache(maxsize=None)
+def get_validated_fields(cls: Type[BaseModel]) -> FrozenSet[str]:
+    """The fields with dedicated field validators."""
+    decorators = cls.__pydantic_decorators__
+    return frozenset(
+        field
+        for validator in decorators.field_validators.values()
+        for field in validator.info.fields
+    )
+
+
+@lru_cache(maxsize=None)
+def _get_field_adapter(cls: Type[BaseModel], name: str) -> TypeAdapter:
+    field = cls.model_fields[name]
+    # A field declared without an annotation accepts any value.
+    annotation: Any = Any if field.annotation is None else field.annotation
+    if field.metadata:
+        annotation = Annotated[(annotation, *field.metadata)]  # type: ignore
+    try:
+        return TypeAdapter(annotation, config=_ARBITRARY_TYPES_CONFIG)
+    except PydanticUserError:
+        # The config can't be set for the types having their own config.
+        return TypeAdapter(annotation)
+
+
+def validate_option(cls: Type[BaseModel], name: str, value: Any) -> Any:
+    """Validate the value of the single field of the model."""
+    return _get_field_adapter(cls, name).validate_python(value)
@@ -0,0 +1,240 @@
+"""Azure OpenAI chat wrapper balancing the requests between several deployments."""
+
+import threading
+from typing import (
+    Any,
+    AsyncIterator,
+    ContextManager,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+)
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from pydantic import Field, PrivateAttr, model_validator
+
+from aidial_integration_langchain.langchain_openai.chat_models.azure import (
+    AzureChatOpenAI,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.balancing import (
+    LoadBalancer,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.encoded import (
+    json_dumps,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.options import (
+    get_option_names,
+)
+
+
+class _TargetBases:
+    """The instances of the deployments shared by the derived pools."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.instances: Optional[List[AzureChatOpenAI]] = None
+
+
+class PooledAzureChatOpenAI(AzureChatOpenAI):
+    """Azure OpenAI chat model balancing the requests between several deployments
+    of the same model, e.g. in different regions or DIAL instances.
+
+    Every target overrides the fields of the pool the deployment differs by,
+    e.g. the endpoint, the deployment name and the credentials.
+    The pool itself is described by its first target.
+    The deployment of every request is picked by the `load_balancer`,
+    which tracks the health of the deployments.
+    The hedges of the `request_hedger` are sent to the next deployment
+    unless `hedge_llm` is set.
+
+    Example:
+        .. code-block:: python
+
+            llm = PooledAzureChatOpenAI(
+                targets=[
+                    {"azure_endpoint": "https://east.example.com", "api_key": "..."},
+                    {"azure_endpoint": "https://west.example.com", "api_key": "..."},
+                ],
+                azure_deployment="gpt-4o",
+                api_version="2024-02-01",
+                load_balancer=LoadBalancer(strategy="ewma"),
+                conversation_affinity=True,
+            )
+    """
+
+    targets: List[Dict[str, Any]] = Field(
+        min_length=1, exclude=True, repr=False
+    )
+    """The fields of the deployments overriding the fields of the pool.
+
+    Not serialized, since they may contain the credentials.
+    """
+    load_balancer: LoadBalancer = Field(
+        default_factory=LoadBalancer, exclude=True
+    )
+    """Picks the deployment for every request and tracks their health."""
+    conversation_affinity: bool = False
+    """Whether to route the requests of the same conversation
+    to the same deployment by consistent hashing, keeping its prompt cache warm.
+
+    The conversation is identified by `affinity_key` or, if it isn't set,
+    by the first `affinity_messages` messages of the request.
+    """
+    affinity_key: Optional[str] = None
+    """The key of the conversation, e.g. set per request with `with_options`."""
+    affinity_messages: int = 2
+    """The number of the leading messages identifying the conversation."""
+
+    _target_bases: _TargetBases = PrivateAttr(default_factory=_TargetBases)
+
+    @model_validator(mode="before")
+    @classmethod
+    def _describe_by_first_target(cls, values: Any) -> Any:
+        if isinstance(values, dict) and values.get("targets"):
+            values = {**values["targets"][0], **values}
+        return values
+
+    def _get_target_bases(self) -> List[AzureChatOpenAI]:
+        """The instances of the deployments built once per pool."""
+        bases = self._target_bases
+        if (instances := bases.instances) is None:
+            with bases.lock:
+                if (instances := bases.instances) is None:
+                    params = {
+                        name: value
+                        for name, value in self.__dict__.items()
+                        if name in self.model_fields_set
+                        and name in AzureChatOpenAI.model_fields
+                        and name not in self._client_objects
+                    }
+                    instances = bases.instances = [
+                        AzureChatOpenAI(**{**params, **target})
+                        for target in self.targets
+                    ]
+        return instances
+
+    def _get_target_llms(self) -> List[AzureChatOpenAI]:
+        """The instances of the deployments with the fields of this pool."""
+        return self._get_compiled("target_llms", self._derive_target_llms)
+
+    def _derive_target_llms(self) -> List[AzureChatOpenAI]:
+        names = get_option_names(AzureChatOpenAI)
+        # The fields the deployments don't differ by
+        fields = {
+            name: value
+            for name, value in self.__dict__.items()
+            if name in AzureChatOpenAI.model_fields
+            and name not in self._client_fields
+        }
+        llms = []
+        for base, target in zip(self._get_target_bases(), self.targets):
+            overridden = {names.get(key, key) for key in target}
+            llms.append(
+                base.model_copy(
+                    update={
+                        name: value
+                        for name, value in fields.items()
+                        if name not in overridden
+                    }
+                )
+            )
+        if (
+            self.request_hedger is not None
+            and self.hedge_llm is None
+            and len(llms) > 1
+        ):
+            # The hedges are sent to the next deployment.
+            llms = [
+                llm.model_copy(update={"hedge_llm": llms[(i + 1) % len(llms)]})
+                for i, llm in enumerate(llms)
+            ]
+        return llms
+
+    def _get_target_identities(self) -> List[Any]:
+        return self._get_compiled(
+            "target_identities",
+            lambda: [
+                tuple(llm._get_upstream_identity())
+                for llm in self._get_target_llms()
+            ],
+        )
+
+    def _get_affinity_key(self, messages: List[BaseMessage]) -> Optional[str]:
+        if not self.conversation_affinity:
+            return None
+        if self.affinity_key is not None:
+            return self.affinity_key
+        return json_dumps(
+            [
+                [message.type, message.content]
+                for message in messages[: self.affinity_messages]
+            ]
+        ).decode("utf-8")
+
+    def _pick_target(self, messages: List[BaseMessage]) -> ContextManager[Any]:
+        """Pick the deployment for the request and track the request."""
+        return self.load_balancer.pick(
+            self._get_target_identities(), self._get_affinity_key(messages)
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        with self._pick_target(messages) as pick:
+            return self._get_target_llms()[pick.index]._generate(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            )
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        with self._pick_target(messages) as pick:
+            return await self._get_target_llms()[pick.index]._agenerate(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            )
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        with self._pick_target(messages) as pick:
+            llm = self._get_target_llms()[pick.index]
+            for chunk in llm._stream(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            ):
+                # The latency is measured up to the first chunk.
+                pick.respond()
+                yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        with self._pick_target(messages) as pick:
+            llm = self._get_target_llms()[pick.index]
+            async for chunk in llm._astream(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            ):
+                # The latency is measured up to the first chunk.
+                pick.respond()
+                yield chunk
@@ -0,0 +1,126 @@
+"""Decoding of raw HTTP response bodies.
+
+orjson is used for decoding when it's installed,
+otherwise the standard json module is used.
+"""
+
+from typing import (
+    AsyncIterable,
+    AsyncIterator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+import httpx
+import openai
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads  # type: ignore
+
+__all__ = ["json_loads", "SSEDecoder", "iter_sse_json", "aiter_sse_json"]
+
+_Event = Tuple[Optional[bytes], bytes]
+
+
+class SSEDecoder:
+    """Incremental decoder of server-sent events.
+
+    The received bytes are accumulated in a buffer,
+    which is split into lines only once a line terminator arrives.
+    The lines are terminated by "\\r\\n", "\\n" or "\\r".
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self._event: Optional[bytes] = None
+        self._data: List[bytes] = []
+        # The last line ended with "\r", which may be followed by "\n".
+        self._skip_lf = False
+
+    def feed(self, data: bytes) -> List[_Event]:
+        """Feed the next portion of bytes.
+
+        Returns:
+            The (event, data) pairs of the events completed by the portion.
+        """
+        if self._skip_lf and data:
+            self._skip_lf = False
+            if data.startswith(b"\n"):
+                data = data[1:]
+        self._buffer += data
+        end = max(self._buffer.rfind(b"\n"), self._buffer.rfind(b"\r"))
+        if end < 0:
+            return []
+
+        lines = bytes(self._buffer[: end + 1])
+        del self._buffer[: end + 1]
+        self._skip_lf = lines.endswith(b"\r")
+
+        events: List[_Event] = []
+        for line in lines.splitlines():
+            if not line:
+                if self._data:
+                    events.append((self._event, b"\n".join(self._data)))
+                self._event = None
+                self._data = []
+            elif line.startswith(b"data:"):
+                self._data.append(_field_value(line, 5))
+            elif line.startswith(b"event:"):
+                self._event = _field_value(line, 6)
+            # Comments and the rest of the fields aren't used by the API
+
+        return events
+
+
+def _field_value(line: bytes, offset: int) -> bytes:
+    value = line[offset:]
+    return value[1:] if value.startswith(b" ") else value
+
+
+def _decode_event(
+    request: httpx.Request, event: Optional[bytes], data: bytes
+) -> dict:
+    """Decode the event data in the same way the openai SDK does.
+
+    The data of a named event is wrapped with its name,
+    as the SDK does before parsing it into a chunk.
+    """
+    chunk = json_loads(data)
+    if isinstance(chunk, dict) and (error := chunk.get("error")):
+        if event is None or event == b"error":
+            message = error.get("message") if isinstance(error, dict) else None
+            if not message or not isinstance(message, str):
+                message = "An error occurred during streaming"
+            raise openai.APIError(message=message, request=request, body=error)
+    if event is None:
+        return chunk
+    return {"data": chunk, "event": event.decode("utf-8")}
+
+
+def iter_sse_json(
+    request: httpx.Request, byte_stream: Iterable[bytes]
+) -> Iterator[dict]:
+    """Decode the chat completion chunks from the raw SSE byte stream."""
+    decoder = SSEDecoder()
+    for data in byte_stream:
+        for event, event_data in decoder.feed(data):
+            if event_data.startswith(b"[DONE]"):
+                return
+            yield _decode_event(request, event, event_data)
+
+
+async def aiter_sse_json(
+    request: httpx.Request, byte_stream: AsyncIterable[bytes]
+) -> AsyncIterator[dict]:
+    """Decode the chat completion chunks from the raw SSE byte stream."""
+    decoder = SSEDecoder()
+    async for data in byte_stream:
+        for event, event_data in decoder.feed(data):
+            if event_data.startswith(b"[DONE]"):
+                return
+            yield _decode_event(request, event, event_data)
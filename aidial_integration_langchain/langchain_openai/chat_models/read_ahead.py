@@ -0,0 +1,162 @@
+"""Read-ahead of the async streams into a bounded buffer."""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterable, AsyncIterator, Deque, Dict, Optional
+
+
+class _Buffer(AsyncIterable[dict]):
+    """The chunks of one stream read ahead by the producer task."""
+
+    def __init__(self, read_ahead: "ReadAhead", chunks: AsyncIterator[dict]):
+        self._read_ahead = read_ahead
+        self._chunks = chunks
+        self._items: Deque[dict] = deque()
+        self._done = False
+        self._error: Optional[BaseException] = None
+        # Set when a chunk is buffered or the stream ends
+        self._readable = asyncio.Event()
+        # Cleared while the buffer is above the low water mark
+        # after reaching the high water mark
+        self._writable = asyncio.Event()
+        self._writable.set()
+
+    def __len__(self) -> int:
+        """The number of the chunks buffered."""
+        return len(self._items)
+
+    def __aiter__(self) -> AsyncIterator[dict]:
+        return self._consume()
+
+    async def produce(self) -> None:
+        read_ahead = self._read_ahead
+        try:
+            async for chunk in self._chunks:
+                self._items.append(chunk)
+                self._readable.set()
+                buffered = len(self._items)
+                if buffered > read_ahead.max_buffered:
+                    read_ahead.max_buffered = buffered
+                if buffered >= read_ahead.high_water:
+                    self._writable.clear()
+                    read_ahead.producer_stalls += 1
+                    started = time.monotonic()
+                    await self._writable.wait()
+                    read_ahead.producer_stall_time += time.monotonic() - started
+        except Exception as e:
+            self._error = e
+        finally:
+            self._done = True
+            self._readable.set()
+
+    async def _consume(self) -> AsyncIterator[dict]:
+        read_ahead = self._read_ahead
+        first = True
+        while True:
+            if not self._items:
+                if self._done:
+                    if self._error is not None:
+                        raise self._error
+                    return
+                self._readable.clear()
+                if first:
+                    # Waiting for the first chunk isn't a stall.
+                    await self._readable.wait()
+                    continue
+                read_ahead.consumer_stalls += 1
+                started = time.monotonic()
+                await self._readable.wait()
+                read_ahead.consumer_stall_time += time.monotonic() - started
+                continue
+            chunk = self._items.popleft()
+            if (
+                not self._writable.is_set()
+                and len(self._items) <= read_ahead.low_water
+            ):
+                self._writable.set()
+            read_ahead.chunks += 1
+            first = False
+            yield chunk
+
+
+class ReadAhead:
+    """Read-ahead of the async streams into a bounded buffer.
+
+    The chunks of every stream are read from the upstream by a producer task
+    into a buffer, so that the upstream connection keeps being read
+    while the consumer is busy (e.g. forwarding to a slow client)
+    and the chunks are prefetched for a fast consumer.
+    The producer pauses once `high_water` chunks are buffered
+    and resumes once the consumer drains the buffer to `low_water` chunks.
+
+    The stalls show which side is the bottleneck:
+    the producer stalls on the full buffer when the consumer is slower
+    than the upstream, the consumer stalls on the empty buffer
+    (after the first chunk) when the upstream is slower.
+
+    Example:
+        .. code-block:: python
+
+            read_ahead = ReadAhead(high_water=256, low_water=64)
+            llm = AzureChatOpenAI(..., read_ahead=read_ahead)
+            async for chunk in llm.astream(prompt):
+                ...
+            print(read_ahead.snapshot())
+    """
+
+    def __init__(self, high_water: int = 64, low_water: int = 16):
+        if not 0 <= low_water < high_water:
+            raise ValueError(
+                "The water marks must satisfy 0 <= low_water < high_water."
+            )
+        self.high_water = high_water
+        self.low_water = low_water
+        # The number of the streams read ahead
+        self.streams = 0
+        # The number of the chunks consumed
+        self.chunks = 0
+        # The largest number of the chunks buffered
+        self.max_buffered = 0
+        # The number of the times and the total time in seconds
+        # the producers waited for the consumers to drain the buffer
+        self.producer_stalls = 0
+        self.producer_stall_time = 0.0
+        # The number of the times and the total time in seconds
+        # the consumers waited for the upstream
+        self.consumer_stalls = 0
+        self.consumer_stall_time = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The read-ahead and the stall metrics."""
+        return {
+            "streams": self.streams,
+            "chunks": self.chunks,
+            "max_buffered": self.max_buffered,
+            "producer_stalls": self.producer_stalls,
+            "producer_stall_time": self.producer_stall_time,
+            "consumer_stalls": self.consumer_stalls,
+            "consumer_stall_time": self.consumer_stall_time,
+        }
+
+    @asynccontextmanager
+    async def buffer(
+        self, chunks: AsyncIterator[dict]
+    ) -> AsyncIterator[_Buffer]:
+        """Read the chunks ahead within the block.
+
+        Yields:
+            The buffer iterating over the chunks, sized by the chunks buffered.
+        """
+        self.streams += 1
+        buffer = _Buffer(self, chunks)
+        producer = asyncio.ensure_future(buffer.produce())
+        try:
+            yield buffer
+        finally:
+            producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
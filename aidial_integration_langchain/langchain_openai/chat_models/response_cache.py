@@ -0,0 +1,192 @@
+"""Exact-match cache of chat completion responses.
+
+The responses are cached by the hash of the canonical form of the request
+(the request payload along with the endpoint and the deployment it's sent to)
+and are stored as JSON, so that the cached responses are replayed
+the same way as the responses received from the server.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Mapping, Optional, Tuple, Union
+
+from langchain_core.runnables.config import run_in_executor
+
+CACHE_HIT_KEY = "cache_hit"
+"""The key of the generation info and the response metadata marking cache hits."""
+
+
+def get_cache_key(identity: Any, payload: Mapping[str, Any]) -> Optional[str]:
+    """The hash of the canonical form of the request.
+
+    Returns None for the requests which can't be cached,
+    e.g. with Pydantic `response_format`.
+    """
+    try:
+        canonical = json.dumps(
+            [identity, payload],
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+        )
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache(ABC):
+    """Base class of the response caches.
+
+    The cached values are the JSON-encoded responses.
+    The asynchronous methods call the synchronous ones by default.
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self._counters_lock = threading.Lock()
+
+    def lookup(self, key: str) -> Optional[bytes]:
+        """Get the cached value counting the hits and misses."""
+        return self._count(self.get(key))
+
+    async def alookup(self, key: str) -> Optional[bytes]:
+        """Get the cached value counting the hits and misses."""
+        return self._count(await self.aget(key))
+
+    def _count(self, value: Optional[bytes]) -> Optional[bytes]:
+        with self._counters_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Get the cached value or None if it's missing or expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: bytes) -> None:
+        """Cache the value."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Drop all the cached values."""
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        return self.get(key)
+
+    async def aset(self, key: str, value: bytes) -> None:
+        self.set(key, value)
+
+
+class InMemoryResponseCache(ResponseCache):
+    """In-memory LRU cache with optional expiration.
+
+    Args:
+        maxsize: The maximum number of cached responses.
+        ttl: The time in seconds after which a cached response expires.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        super().__init__()
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1.")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # key -> (expiration time, value)
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: bytes) -> None:
+        expires = (
+            float("inf") if self.ttl is None else time.monotonic() + self.ttl
+        )
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskResponseCache(ResponseCache):
+    """On-disk cache storing a file per response.
+
+    The cache survives restarts and may be shared by several processes.
+    The asynchronous methods access the disk in the default executor.
+
+    Args:
+        directory: The directory of the cache files. Created if missing.
+        ttl: The time in seconds after which a cached response expires.
+    """
+
+    def __init__(
+        self, directory: Union[str, os.PathLike], ttl: Optional[float] = None
+    ):
+        super().__init__()
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            if self.ttl is not None and (
+                path.stat().st_mtime + self.ttl <= time.time()
+            ):
+                path.unlink(missing_ok=True)
+                return None
+            return path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, value: bytes) -> None:
+        # Written to a temporary file first,
+        # so that the readers never see a partially written file.
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(value)
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def clear(self) -> None:
+        for path in self.directory.glob("*.json"):
+            path.unlink(missing_ok=True)
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        return await run_in_executor(None, self.get, key)
+
+    async def aset(self, key: str, value: bytes) -> None:
+        await run_in_executor(None, self.set, key, value)
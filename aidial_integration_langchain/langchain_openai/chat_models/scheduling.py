@@ -0,0 +1,307 @@
+"""Priority, deadline and tenant-aware scheduling of the requests to a deployment."""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import (
+    AsyncIterator,
+    Dict,
+    Hashable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+QUEUE_WAIT_KEY = "queue_wait"
+
+
+class RequestPriority(IntEnum):
+    """The priority classes of the requests: the lower, the sooner sent.
+
+    Any other integer may be used as a priority as well.
+    """
+
+    INTERACTIVE = 0
+    NORMAL = 1
+    BATCH = 2
+
+
+class DeadlineExceededError(TimeoutError):
+    """The request was dropped since its deadline passed before it was sent."""
+
+
+class _Waiter:
+    """The request waiting for its turn."""
+
+    __slots__ = (
+        "priority",
+        "finish",
+        "seq",
+        "start",
+        "deadline",
+        "future",
+        "granted",
+    )
+
+    def __init__(
+        self,
+        priority: int,
+        start: float,
+        finish: float,
+        seq: int,
+        deadline: Optional[float],
+    ):
+        self.priority = priority
+        self.start = start
+        self.finish = finish
+        self.seq = seq
+        self.deadline = deadline
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.granted = False
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.finish, self.seq) < (
+            other.priority,
+            other.finish,
+            other.seq,
+        )
+
+
+class FairQueue:
+    """The queue of the requests to a deployment with a fixed concurrency.
+
+    The requests above `max_concurrency` wait in the queue.
+    The higher priority classes are always sent first. Within a class,
+    the tenants share the deployment by their weights
+    (weighted fair queuing): every request of a tenant is tagged
+    with the virtual time it finishes at, advancing by `1 / weight`,
+    and the requests are sent in the order of their tags.
+    The requests of a tenant are sent in the order they came.
+
+    The requests whose deadline passes while waiting are dropped
+    with `DeadlineExceededError`.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        tenant_weights: Optional[Mapping[Optional[str], float]] = None,
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be positive.")
+        if tenant_weights and min(tenant_weights.values()) <= 0:
+            raise ValueError("The tenant weights must be positive.")
+        self.max_concurrency = max_concurrency
+        self.tenant_weights = dict(tenant_weights or {})
+        # The number of the requests dropped by their deadline
+        self.expired = 0
+        self._in_flight = 0
+        self._queue: List[_Waiter] = []
+        # The virtual time of every priority class
+        self._virtual_times: Dict[int, float] = {}
+        # The finish tag of the last request of every tenant within a class
+        self._finish_tags: Dict[Tuple[int, Optional[str]], float] = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        """The number of the requests in flight."""
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """The number of the requests waiting for their turn."""
+        return len(self._queue)
+
+    def snapshot(self) -> Dict[str, int]:
+        """The requests in flight, the queue depth and the expired requests."""
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "expired": self.expired,
+        }
+
+    async def acquire(
+        self,
+        priority: int = RequestPriority.NORMAL,
+        tenant: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> float:
+        """Wait for the turn of the request.
+
+        Args:
+            priority: The priority class of the request.
+            tenant: The tenant the request is sent on behalf of.
+            deadline: The `time.monotonic()` time the request
+                must be sent by.
+
+        Returns:
+            The time in seconds the request has waited in the queue.
+
+        Raises:
+            DeadlineExceededError: The deadline passed before the turn came.
+        """
+        enqueued = time.monotonic()
+        with self._lock:
+            if deadline is not None and deadline <= enqueued:
+                self.expired += 1
+                raise DeadlineExceededError("The request deadline has passed.")
+            if not self._queue and self._in_flight < self.max_concurrency:
+                self._in_flight += 1
+                return 0.0
+            waiter = self._enqueue(priority, tenant, deadline)
+        try:
+            if deadline is None:
+                await waiter.future
+            else:
+                await asyncio.wait_for(
+                    waiter.future, deadline - time.monotonic()
+                )
+        except DeadlineExceededError:
+            # Dropped from the queue and counted by `_release_slot`.
+            # Caught first, since it's `asyncio.TimeoutError` on Python 3.11+.
+            raise
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            with self._lock:
+                if waiter.granted:
+                    # Cancelled right after the turn came
+                    self._release_slot()
+                elif waiter in self._queue:
+                    self._queue.remove(waiter)
+                    heapq.heapify(self._queue)
+                if isinstance(e, asyncio.TimeoutError):
+                    self.expired += 1
+            if isinstance(e, asyncio.TimeoutError):
+                raise DeadlineExceededError(
+                    "The request deadline has passed."
+                ) from None
+            raise
+        return time.monotonic() - enqueued
+
+    def release(self) -> None:
+        """Free the place of the request sending the next one."""
+        with self._lock:
+            self._release_slot()
+
+    @asynccontextmanager
+    async def schedule(
+        self,
+        priority: int = RequestPriority.NORMAL,
+        tenant: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> AsyncIterator[float]:
+        """Hold the place of the request while sending it.
+
+        Yields:
+            The time in seconds the request has waited in the queue.
+        """
+        queue_wait = await self.acquire(priority, tenant, deadline)
+        try:
+            yield queue_wait
+        finally:
+            self.release()
+
+    def _enqueue(
+        self, priority: int, tenant: Optional[str], deadline: Optional[float]
+    ) -> _Waiter:
+        weight = self.tenant_weights.get(tenant, 1.0)
+        key = (priority, tenant)
+        start = max(
+            self._virtual_times.get(priority, 0.0),
+            self._finish_tags.get(key, 0.0),
+        )
+        finish = self._finish_tags[key] = start + 1 / weight
+        waiter = _Waiter(priority, start, finish, next(self._seq), deadline)
+        heapq.heappush(self._queue, waiter)
+        return waiter
+
+    def _release_slot(self) -> None:
+        self._in_flight -= 1
+        now = time.monotonic()
+        while self._queue and self._in_flight < self.max_concurrency:
+            waiter = heapq.heappop(self._queue)
+            loop = waiter.future.get_loop()
+            if waiter.deadline is not None and waiter.deadline <= now:
+                # Dropped before it's sent
+                self.expired += 1
+                loop.call_soon_threadsafe(_expire, waiter.future)
+                continue
+            self._in_flight += 1
+            waiter.granted = True
+            self._virtual_times[waiter.priority] = max(
+                self._virtual_times.get(waiter.priority, 0.0), waiter.start
+            )
+            loop.call_soon_threadsafe(_grant, waiter.future)
+
+
+def _grant(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def _expire(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_exception(
+            DeadlineExceededError("The request deadline has passed.")
+        )
+
+
+class RequestScheduler:
+    """Priority, deadline and tenant-aware scheduling of the async requests.
+
+    Every deployment (the endpoint, the deployment name and the API version)
+    gets its own `FairQueue` built with the given parameters.
+    The priority, the tenant and the deadline of the requests are taken
+    from the `request_priority`, `request_tenant` and `request_deadline`
+    fields of the instance, which are overridden per request
+    with `with_options`. The instances sharing the scheduler share
+    the queue of each deployment.
+
+    Example:
+        .. code-block:: python
+
+            scheduler = RequestScheduler(
+                max_concurrency=16, tenant_weights={"premium": 3}
+            )
+            llm = AzureChatOpenAI(..., request_scheduler=scheduler)
+            chat_llm = llm.with_options(
+                request_priority=RequestPriority.INTERACTIVE,
+                request_deadline=5.0,
+            )
+            batch_llm = llm.with_options(request_priority=RequestPriority.BATCH)
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        tenant_weights: Optional[Mapping[Optional[str], float]] = None,
+    ):
+        FairQueue(max_concurrency, tenant_weights)
+        self.max_concurrency = max_concurrency
+        self.tenant_weights = tenant_weights
+        self._queues: Dict[Hashable, FairQueue] = {}
+        self._lock = threading.Lock()
+
+    def get_queue(self, deployment: Hashable) -> FairQueue:
+        """The queue of the deployment."""
+        if (queue := self._queues.get(deployment)) is None:
+            with self._lock:
+                queue = self._queues.setdefault(
+                    deployment,
+                    FairQueue(self.max_concurrency, self.tenant_weights),
+                )
+        return queue
+
+    def snapshot(self) -> Dict[Hashable, Dict[str, int]]:
+        """The requests in flight, the queue depth and the expired requests
+        of every deployment."""
+        return {
+            deployment: queue.snapshot()
+            for deployment, queue in list(self._queues.items())
+        }
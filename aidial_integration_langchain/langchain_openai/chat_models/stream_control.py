@@ -0,0 +1,257 @@
+"""Early stop of the streams by the cancellation and the stop predicates."""
+
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.outputs import ChatGenerationChunk
+
+logger = logging.getLogger(__name__)
+
+StopPredicate = Callable[[ChatGenerationChunk], bool]
+"""Whether to stop the stream given the generation streamed so far."""
+
+ChunkCheck = Callable[[ChatGenerationChunk], bool]
+"""Whether to stop the stream given its next chunk."""
+
+CANCELLED = "cancelled"
+"""The stop reason of the cancelled streams."""
+
+
+def _checked_by_chunks(
+    predicate: StopPredicate, start: Callable[[], ChunkCheck]
+) -> StopPredicate:
+    """Let the streams check the predicate by their chunks:
+    `start()` returns the check of the chunks of a new stream."""
+    predicate.start = start  # type: ignore[attr-defined]
+    return predicate
+
+
+def stop_on_text(*stops: str) -> StopPredicate:
+    """Stop once the text streamed so far contains any of the strings
+    (the stop sequences applied on the client side)."""
+
+    def stop_on_text(generation: ChatGenerationChunk) -> bool:
+        text = generation.text
+        return any(stop in text for stop in stops)
+
+    # A stop string split between the chunks starts within the tail
+    # of the text checked before.
+    overlap = max(map(len, stops), default=1) - 1
+
+    def start() -> ChunkCheck:
+        tail = ""
+
+        def check(chunk: ChatGenerationChunk) -> bool:
+            nonlocal tail
+            text = tail + chunk.text
+            if any(stop in text for stop in stops):
+                return True
+            tail = text[-overlap:] if overlap else ""
+            return False
+
+        return check
+
+    return _checked_by_chunks(stop_on_text, start)
+
+
+def stop_on_finish_reason(*reasons: str) -> StopPredicate:
+    """Stop on any of the finish reasons, e.g. `content_filter`,
+    without waiting for the chunks following the finished choice."""
+
+    def stop_on_finish_reason(generation: ChatGenerationChunk) -> bool:
+        info = generation.generation_info or {}
+        return info.get("finish_reason") in reasons
+
+    # The finish reason arrives in a single chunk.
+    return _checked_by_chunks(
+        stop_on_finish_reason, lambda: stop_on_finish_reason
+    )
+
+
+def _is_complete(args: str) -> bool:
+    try:
+        json.loads(args)
+    except ValueError:
+        return False
+    return True
+
+
+def stop_on_tool_call() -> StopPredicate:
+    """Stop once the arguments of a tool call are complete,
+    i.e. parse as a complete JSON object."""
+
+    def stop_on_tool_call(generation: ChatGenerationChunk) -> bool:
+        tool_call_chunks = getattr(generation.message, "tool_call_chunks", [])
+        return any(
+            (args := tool_call_chunk.get("args")) and _is_complete(args)
+            for tool_call_chunk in tool_call_chunks
+        )
+
+    def start() -> ChunkCheck:
+        # The arguments of every tool call by its index
+        arguments: Dict[Any, List[str]] = {}
+
+        def check(chunk: ChatGenerationChunk) -> bool:
+            tool_call_chunks = getattr(chunk.message, "tool_call_chunks", [])
+            for tool_call_chunk in tool_call_chunks:
+                delta = tool_call_chunk.get("args")
+                if not delta:
+                    continue
+                parts = arguments.setdefault(tool_call_chunk.get("index"), [])
+                parts.append(delta)
+                # Only an object or an array may end with the delta;
+                # the arguments aren't parsed on every chunk.
+                if delta.rstrip()[-1:] in ("}", "]") and _is_complete(
+                    "".join(parts)
+                ):
+                    return True
+            return False
+
+        return check
+
+    return _checked_by_chunks(stop_on_tool_call, start)
+
+
+def _start_check(predicate: StopPredicate) -> Optional[ChunkCheck]:
+    """The check of the chunks of a new stream, if the predicate has one."""
+    start = getattr(predicate, "start", None)
+    return None if start is None else start()
+
+
+class _StreamWatch:
+    """Watches one stream for the stop."""
+
+    __slots__ = ("_controller", "_checks", "_generation", "stop_reason")
+
+    def __init__(self, controller: "StreamController"):
+        self._controller = controller
+        # The predicate and the check of the chunks, if it has one
+        self._checks: List[Tuple[StopPredicate, Optional[ChunkCheck]]] = [
+            (predicate, _start_check(predicate))
+            for predicate in controller.stop_predicates
+        ]
+        self._generation: Optional[ChatGenerationChunk] = None
+        self.stop_reason: Optional[str] = None
+
+    def stops_after(self, chunk: ChatGenerationChunk) -> bool:
+        """Whether the chunk is the last one to pass."""
+        controller = self._controller
+        controller.consumed_chunks += 1
+        if controller.cancelled:
+            self.stop_reason = CANCELLED
+            return True
+        generation = None
+        for predicate, check in self._checks:
+            if check is not None:
+                stops = check(chunk)
+            else:
+                # Built once per chunk for the predicates
+                # without the check of the chunks
+                if generation is None:
+                    generation = self._generation
+                    generation = (
+                        chunk if generation is None else generation + chunk
+                    )
+                    self._generation = generation
+                stops = predicate(generation)
+            if stops:
+                self.stop_reason = getattr(
+                    predicate, "__name__", type(predicate).__name__
+                )
+                return True
+        return False
+
+    def stops(self) -> bool:
+        """Whether the stream is cancelled after passing the chunk."""
+        if self._controller.cancelled:
+            self.stop_reason = CANCELLED
+            return True
+        return False
+
+    def finish(self, unconsumed_chunks: int) -> None:
+        """Record the stop, if any, before the upstream response is closed.
+
+        Args:
+            unconsumed_chunks: The number of the chunks received
+                from the upstream and never consumed.
+        """
+        if (reason := self.stop_reason) is None:
+            return
+        controller = self._controller
+        controller.stopped += 1
+        controller.stop_reason = reason
+        controller.unconsumed_chunks += unconsumed_chunks
+        logger.debug(
+            "Stream stopped early (%s), %d chunks unconsumed",
+            reason,
+            unconsumed_chunks,
+        )
+
+
+class StreamController:
+    """Stops the streams early: once cancelled or once any of the stop
+    predicates matches the generation streamed so far.
+
+    The chunk matching a predicate is the last one to pass.
+    The built-in predicates check only the new chunk of the stream
+    (`stop_on_text` with the tail of the text before it), the other ones
+    are called with the generation accumulated so far.
+    On the stop the upstream response is closed at once, releasing
+    its connection, instead of reading the rest of the stream;
+    the chunks already received and never consumed
+    (those read ahead by `ReadAhead`) are counted.
+    The cancellation takes effect before reading the next chunk and stays
+    in effect for the following streams until `reset()`: a controller shared
+    by the requests of e.g. an agent run cancels all of them.
+
+    Example:
+        .. code-block:: python
+
+            controller = StreamController(
+                stop_on_tool_call(), stop_on_finish_reason("content_filter")
+            )
+            async for chunk in llm.with_options(
+                stream_controller=controller
+            ).astream(prompt):
+                ...
+            print(controller.stop_reason, controller.snapshot())
+    """
+
+    def __init__(self, *stop_predicates: StopPredicate):
+        self.stop_predicates = stop_predicates
+        self._cancelled = False
+        # The reason of the last stop: "cancelled" or the name of the predicate
+        self.stop_reason: Optional[str] = None
+        # The number of the streams stopped early
+        self.stopped = 0
+        # The number of the chunks passed to the consumers
+        self.consumed_chunks = 0
+        # The number of the chunks received and dropped on the stops
+        self.unconsumed_chunks = 0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def cancel(self) -> None:
+        """Cancel the streams. May be called from another thread or task."""
+        self._cancelled = True
+
+    def reset(self) -> None:
+        """Withdraw the cancellation, e.g. before the next run,
+        keeping the metrics."""
+        self._cancelled = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The stop metrics."""
+        return {
+            "stopped": self.stopped,
+            "stop_reason": self.stop_reason,
+            "consumed_chunks": self.consumed_chunks,
+            "unconsumed_chunks": self.unconsumed_chunks,
+        }
+
+    def watch(self) -> _StreamWatch:
+        """Start watching a stream."""
+        return _StreamWatch(self)
@@ -0,0 +1,156 @@
+"""Latency metrics of the streams: the time to the first token
+and the gaps between the chunks."""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from langchain_core.outputs import ChatGenerationChunk
+
+STREAM_METRICS_KEY = "stream_metrics"
+"""The key of the generation info and the response metadata
+of the final chunk holding the metrics of the stream."""
+
+_PERCENTILES = (50, 90, 99)
+
+
+def _percentile(values: List[float], percentile: float) -> Optional[float]:
+    """The nearest-rank percentile of the sorted values."""
+    if not values:
+        return None
+    index = int(len(values) * percentile / 100)
+    return values[min(index, len(values) - 1)]
+
+
+class StreamTimer:
+    """Measures the latencies of one stream."""
+
+    __slots__ = (
+        "_started",
+        "_built",
+        "_opened",
+        "_first_token",
+        "_last_chunk",
+        "_gaps",
+    )
+
+    def __init__(self) -> None:
+        self._started = time.perf_counter()
+        self._built: Optional[float] = None
+        self._opened: Optional[float] = None
+        self._first_token: Optional[float] = None
+        self._last_chunk: Optional[float] = None
+        self._gaps: List[float] = []
+
+    def built(self) -> None:
+        """Mark the request payload as built."""
+        self._built = time.perf_counter()
+
+    def opened(self) -> None:
+        """Mark the stream as opened, i.e. the response headers received."""
+        self._opened = time.perf_counter()
+
+    def on_chunk(self, chunk: ChatGenerationChunk) -> None:
+        """Mark the chunk as received."""
+        now = time.perf_counter()
+        if self._last_chunk is not None:
+            self._gaps.append(now - self._last_chunk)
+        self._last_chunk = now
+        if self._first_token is None and (
+            chunk.text or getattr(chunk.message, "tool_call_chunks", None)
+        ):
+            self._first_token = now
+
+    def finish(self) -> Dict[str, Any]:
+        """The metrics of the ended stream in seconds.
+
+        The times are measured from the start of the request
+        (before building the request payload).
+        """
+        started = self._started
+        gaps = sorted(self._gaps)
+        metrics: Dict[str, Any] = {
+            "request_build": _since(started, self._built),
+            "first_byte": _since(started, self._opened),
+            "first_token": _since(started, self._first_token),
+            "total": time.perf_counter() - started,
+            "chunks": len(gaps) + (self._last_chunk is not None),
+        }
+        for percentile in _PERCENTILES:
+            metrics[f"inter_chunk_p{percentile}"] = _percentile(
+                gaps, percentile
+            )
+        metrics["inter_chunk_max"] = gaps[-1] if gaps else None
+        return metrics
+
+
+def _since(started: float, moment: Optional[float]) -> Optional[float]:
+    return None if moment is None else moment - started
+
+
+class StreamMetricsSink:
+    """Base class of the sinks of the stream metrics.
+
+    The streams are measured only when a sink is set.
+    The metrics of every stream are attached to the response metadata
+    of its final chunk under "stream_metrics" and reported to `record`.
+    The base sink doesn't record them anywhere else.
+    """
+
+    def record(self, metrics: Dict[str, Any]) -> None:
+        """Record the metrics of an ended stream."""
+
+
+class InMemoryStreamMetrics(StreamMetricsSink):
+    """Sink keeping the metrics of the last `window` streams in memory
+    and summarizing them by percentiles. The streams of all the instances
+    sharing the sink are summarized together.
+
+    Example:
+        .. code-block:: python
+
+            metrics = InMemoryStreamMetrics()
+            llm = AzureChatOpenAI(..., stream_metrics=metrics)
+            async for chunk in llm.astream(prompt):
+                ...
+            print(metrics.snapshot()["first_token"])
+    """
+
+    # The metrics summarized by the snapshot
+    _summarized = (
+        "request_build",
+        "first_byte",
+        "first_token",
+        "inter_chunk_p50",
+        "inter_chunk_p99",
+        "total",
+    )
+
+    def __init__(self, window: int = 1000):
+        self.streams = 0
+        self._records: Deque[Dict[str, Any]] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, metrics: Dict[str, Any]) -> None:
+        with self._lock:
+            self.streams += 1
+            self._records.append(metrics)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The number of the streams measured and the p50, p90 and p99
+        of the metrics of the streams in the window."""
+        with self._lock:
+            records = list(self._records)
+            snapshot: Dict[str, Any] = {"streams": self.streams}
+        for name in self._summarized:
+            values = sorted(
+                value
+                for record in records
+                if (value := record.get(name)) is not None
+            )
+            snapshot[name] = {
+                f"p{percentile}": _percentile(values, percentile)
+                for percentile in _PERCENTILES
+            }
+        return snapshot
@@ -0,0 +1,348 @@
+"""Phase-specific timeouts of the streams."""
+
+import asyncio
+import time
+from contextlib import (
+    AsyncExitStack,
+    ExitStack,
+    asynccontextmanager,
+    contextmanager,
+)
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Callable,
+    ClassVar,
+    ContextManager,
+    Dict,
+    Iterator,
+    Optional,
+    Tuple,
+    Type,
+)
+
+import httpx
+import openai
+
+_Stream = Tuple[Iterator[dict], Dict]
+_AsyncStream = Tuple[AsyncIterator[dict], Dict]
+
+
+class StreamTimeoutError(TimeoutError):
+    """The stream exceeded the timeout of one of its phases."""
+
+    phase: ClassVar[str] = ""
+
+    def __init__(self, timeout: float):
+        super().__init__(
+            f"The {self.phase.replace('_', ' ')} timeout"
+            f" of {timeout} seconds is exceeded."
+        )
+        self.timeout = timeout
+
+
+class ConnectTimeoutError(StreamTimeoutError):
+    """The connection to the upstream isn't established in time."""
+
+    phase = "connect"
+
+
+class FirstTokenTimeoutError(StreamTimeoutError):
+    """The first chunk of the stream doesn't arrive in time."""
+
+    phase = "first_token"
+
+
+class InterTokenTimeoutError(StreamTimeoutError):
+    """The stream stalled between the chunks."""
+
+    phase = "inter_token"
+
+
+class TotalTimeoutError(StreamTimeoutError):
+    """The stream doesn't end in time."""
+
+    phase = "total"
+
+
+class _Timer:
+    """Cancels the current task at the deadline raising the timeout error
+    instead, like `asyncio.timeout` (Python 3.11)."""
+
+    __slots__ = ("_deadline", "_error", "_task", "_handle", "_expired")
+
+    def __init__(
+        self, deadline: float, error: Callable[[], StreamTimeoutError]
+    ):
+        self._deadline = deadline
+        self._error = error
+        self._task: Optional[asyncio.Task] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._expired = False
+
+    def __enter__(self) -> None:
+        self._task = asyncio.current_task()
+        self._handle = asyncio.get_running_loop().call_at(
+            self._deadline, self._expire
+        )
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+        if not self._expired:
+            return
+        # The cancellation by the deadline is withdrawn (Python 3.11+).
+        task = self._task
+        if task is not None and hasattr(task, "uncancel"):
+            task.uncancel()
+        # The deadline has passed even if the block swallowed the cancellation.
+        if exc_type is None or exc_type is asyncio.CancelledError:
+            raise self._error() from exc
+
+    def _expire(self) -> None:
+        self._expired = True
+        if self._task is not None:
+            self._task.cancel()
+
+
+class StreamTimeouts:
+    """Phase-specific timeouts of the streams in seconds.
+
+    Unlike the single `request_timeout`, the phases of the stream
+    have timeouts of their own, each raising a distinct subclass
+    of `StreamTimeoutError` (a `TimeoutError`), so that a slow-to-start
+    generation is told from a stream stalled midway and the retries
+    and the fallbacks act without waiting out a generous global timeout:
+
+    * `connect`: establishing the connection, `ConnectTimeoutError`
+      (raised once the retries of the openai SDK are exhausted),
+    * `first_token`: from sending the request to the first chunk,
+      `FirstTokenTimeoutError`,
+    * `inter_token`: between the consecutive chunks
+      (not counting the time the consumer takes), `InterTokenTimeoutError`,
+    * `total`: from sending the request to the end of the stream,
+      `TotalTimeoutError`.
+
+    The timeouts of the async streams are enforced at the deadlines.
+    The sync streams can't be interrupted, so there the first token
+    and the inter-token timeouts are enforced by the read timeout
+    of the connection (the larger of the two) and all the timeouts
+    are checked on receiving the chunks.
+
+    Example:
+        .. code-block:: python
+
+            timeouts = StreamTimeouts(
+                connect=3, first_token=10, inter_token=5, total=120
+            )
+            llm = AzureChatOpenAI(..., stream_timeouts=timeouts)
+            llm.with_retry(retry_if_exception_type=(FirstTokenTimeoutError,))
+            print(timeouts.snapshot())
+    """
+
+    def __init__(
+        self,
+        connect: Optional[float] = None,
+        first_token: Optional[float] = None,
+        inter_token: Optional[float] = None,
+        total: Optional[float] = None,
+    ):
+        for name, timeout in (
+            ("connect", connect),
+            ("first_token", first_token),
+            ("inter_token", inter_token),
+            ("total", total),
+        ):
+            if timeout is not None and timeout <= 0:
+                raise ValueError(f"The {name} timeout must be positive.")
+        self.connect = connect
+        self.first_token = first_token
+        self.inter_token = inter_token
+        self.total = total
+        # The number of the exceeded timeouts per phase
+        self.timeouts: Dict[str, int] = {
+            "connect": 0,
+            "first_token": 0,
+            "inter_token": 0,
+            "total": 0,
+        }
+
+    def snapshot(self) -> Dict[str, int]:
+        """The number of the exceeded timeouts per phase."""
+        return dict(self.timeouts)
+
+    def get_http_timeout(self, timeout: Any, sync: bool) -> httpx.Timeout:
+        """The HTTP timeout of the request given the one of the client."""
+        if not isinstance(timeout, httpx.Timeout):
+            timeout = httpx.Timeout(timeout)
+        read = timeout.read
+        if sync:
+            read_timeouts = [
+                timeout
+                for timeout in (self.first_token, self.inter_token)
+                if timeout is not None
+            ]
+            if read_timeouts:
+                read = max(read_timeouts)
+        return httpx.Timeout(
+            connect=timeout.connect if self.connect is None else self.connect,
+            read=read,
+            write=timeout.write,
+            pool=timeout.pool,
+        )
+
+    @contextmanager
+    def watch(
+        self, open_stream: Callable[[], ContextManager[_Stream]]
+    ) -> Iterator[_Stream]:
+        """Open the stream and iterate over its chunks within the timeouts.
+
+        Yields:
+            The iterator over the chunk dictionaries and the base generation info.
+        """
+        started = time.monotonic()
+        with ExitStack() as stack:
+            try:
+                chunks, base_generation_info = stack.enter_context(
+                    open_stream()
+                )
+            except openai.APITimeoutError as e:
+                if (error := self._get_open_error(e, sync=True)) is None:
+                    raise
+                raise error from e
+            yield self._watch_chunks(chunks, started), base_generation_info
+
+    @asynccontextmanager
+    async def awatch(
+        self, open_stream: Callable[[], AsyncContextManager[_AsyncStream]]
+    ) -> AsyncIterator[_AsyncStream]:
+        """Open the async stream and iterate over its chunks
+        within the timeouts.
+
+        Yields:
+            The iterator over the chunk dictionaries and the base generation info.
+        """
+        started = asyncio.get_running_loop().time()
+        async with AsyncExitStack() as stack:
+            deadline = self._get_first_token_deadline(started)
+            try:
+                if deadline is None:
+                    chunks, base_generation_info = (
+                        await stack.enter_async_context(open_stream())
+                    )
+                else:
+                    with _Timer(*deadline):
+                        chunks, base_generation_info = (
+                            await stack.enter_async_context(open_stream())
+                        )
+            except openai.APITimeoutError as e:
+                if (error := self._get_open_error(e, sync=False)) is None:
+                    raise
+                raise error from e
+            yield self._awatch_chunks(chunks, started), base_generation_info
+
+    def _watch_chunks(
+        self, chunks: Iterator[dict], started: float
+    ) -> Iterator[dict]:
+        first_token, inter_token, total = (
+            self.first_token,
+            self.inter_token,
+            self.total,
+        )
+        first = True
+        requested = started
+        try:
+            for chunk in chunks:
+                now = time.monotonic()
+                if total is not None and now - started > total:
+                    raise self._expired(TotalTimeoutError, total)
+                if first:
+                    if first_token is not None and now - started > first_token:
+                        raise self._expired(FirstTokenTimeoutError, first_token)
+                elif inter_token is not None and now - requested > inter_token:
+                    raise self._expired(InterTokenTimeoutError, inter_token)
+                first = False
+                yield chunk
+                requested = time.monotonic()
+        except httpx.ReadTimeout as e:
+            if first:
+                if first_token is not None:
+                    raise self._expired(
+                        FirstTokenTimeoutError, first_token
+                    ) from e
+            elif inter_token is not None:
+                raise self._expired(InterTokenTimeoutError, inter_token) from e
+            raise
+
+    async def _awatch_chunks(
+        self, chunks: AsyncIterator[dict], started: float
+    ) -> AsyncIterator[dict]:
+        loop = asyncio.get_running_loop()
+        iterator = chunks.__aiter__()
+        deadline = self._get_first_token_deadline(started)
+        while True:
+            try:
+                if deadline is None:
+                    chunk = await iterator.__anext__()
+                else:
+                    with _Timer(*deadline):
+                        chunk = await iterator.__anext__()
+            except StopAsyncIteration:
+                return
+            yield chunk
+            deadline = self._get_deadline(
+                started,
+                loop.time(),
+                self.inter_token,
+                InterTokenTimeoutError,
+            )
+
+    def _get_first_token_deadline(
+        self, started: float
+    ) -> Optional[Tuple[float, Callable[[], StreamTimeoutError]]]:
+        return self._get_deadline(
+            started, started, self.first_token, FirstTokenTimeoutError
+        )
+
+    def _get_deadline(
+        self,
+        started: float,
+        now: float,
+        timeout: Optional[float],
+        error: Type[StreamTimeoutError],
+    ) -> Optional[Tuple[float, Callable[[], StreamTimeoutError]]]:
+        """The earliest of the deadline of the phase and the total one
+        with the error raised on reaching it."""
+        total = self.total
+        if total is not None and (
+            timeout is None or started + total <= now + timeout
+        ):
+            return started + total, lambda: self._expired(
+                TotalTimeoutError, total
+            )
+        if timeout is not None:
+            return now + timeout, lambda: self._expired(error, timeout)
+        return None
+
+    def _get_open_error(
+        self, error: openai.APITimeoutError, sync: bool
+    ) -> Optional[StreamTimeoutError]:
+        """The phase timeout error the timeout of the request stands for."""
+        cause = error.__cause__
+        if isinstance(cause, httpx.ConnectTimeout) and self.connect is not None:
+            return self._expired(ConnectTimeoutError, self.connect)
+        if (
+            sync
+            and isinstance(cause, httpx.ReadTimeout)
+            and self.first_token is not None
+        ):
+            # The read timeout is set by the first token timeout.
+            return self._expired(FirstTokenTimeoutError, self.first_token)
+        return None
+
+    def _expired(
+        self, error: Type[StreamTimeoutError], timeout: float
+    ) -> StreamTimeoutError:
+        self.timeouts[error.phase] += 1
+        return error(timeout)
@@ -0,0 +1,470 @@
+"""Client-side token-per-minute budget of the requests to a deployment."""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    Iterator,
+    Mapping,
+    Optional,
+)
+
+import httpx
+
+from aidial_integration_langchain.langchain_openai.chat_models.encoded import (
+    EncodedMessages,
+    json_dumps,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.observers import (
+    response_observer,
+)
+
+# A rough estimate for the tokenizers of the GPT models
+_CHARS_PER_TOKEN = 4
+# The tokens framing every message in the prompt
+_TOKENS_PER_MESSAGE = 4
+
+
+def estimate_prompt_tokens(messages: Any) -> int:
+    """Estimate the number of the prompt tokens by the length of the messages.
+
+    Precise enough for budgeting and orders of magnitude cheaper
+    than tokenizing the prompt.
+    """
+    if isinstance(messages, EncodedMessages) and len(messages.segments) == len(
+        messages
+    ):
+        chars = sum(map(len, messages.segments))
+    else:
+        chars = 0
+        for message in messages:
+            content = message.get("content")
+            if isinstance(content, str):
+                chars += len(content)
+            elif content:
+                chars += len(json_dumps(content))
+            if tool_calls := message.get("tool_calls"):
+                chars += len(json_dumps(tool_calls))
+    return chars // _CHARS_PER_TOKEN + _TOKENS_PER_MESSAGE * len(messages)
+
+
+def get_total_tokens(usage: Any) -> Optional[int]:
+    """The total tokens of the usage dictionary or model."""
+    if usage is None:
+        return None
+    if isinstance(usage, Mapping):
+        return usage.get("total_tokens")
+    return getattr(usage, "total_tokens", None)
+
+
+class _Waiter:
+    """The request waiting for its tokens, woken by the bucket."""
+
+    __slots__ = ("tokens", "event", "future")
+
+    def __init__(self, tokens: int, is_async: bool):
+        self.tokens = tokens
+        self.event: Optional[threading.Event] = None
+        self.future: Optional[asyncio.Future] = None
+        if is_async:
+            self.future = asyncio.get_running_loop().create_future()
+        else:
+            self.event = threading.Event()
+
+    def rearm(self) -> None:
+        """Get ready for the next wake-up."""
+        if self.event is not None:
+            self.event.clear()
+        elif self.future is not None and self.future.done():
+            self.future = self.future.get_loop().create_future()
+
+    def wake(self) -> None:
+        if self.event is not None:
+            self.event.set()
+        elif self.future is not None:
+            try:
+                self.future.get_loop().call_soon_threadsafe(_wake, self.future)
+            except RuntimeError:
+                # The event loop is closed.
+                pass
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class TokenBucket:
+    """Token bucket of a deployment refilled at the per-minute rate.
+
+    The tokens and, optionally, the requests are taken from the bucket
+    before sending a request. A request larger than the bucket is sent
+    once the bucket is full.
+
+    The requests waiting for the tokens are served in the order they came:
+    only the first one waits for the refill, the others wait for their turn,
+    and the newly arrived requests don't take the tokens ahead of them.
+    """
+
+    def __init__(
+        self,
+        tokens_per_minute: int,
+        requests_per_minute: Optional[int] = None,
+    ):
+        if tokens_per_minute <= 0:
+            raise ValueError("tokens_per_minute must be positive.")
+        if requests_per_minute is not None and requests_per_minute <= 0:
+            raise ValueError("requests_per_minute must be positive.")
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self._tokens = float(tokens_per_minute)
+        self._requests = float(requests_per_minute or 0)
+        self._updated = time.monotonic()
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self) -> float:
+        """The tokens available now."""
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    @property
+    def requests(self) -> Optional[float]:
+        """The requests available now."""
+        if self.requests_per_minute is None:
+            return None
+        with self._lock:
+            self._refill()
+            return self._requests
+
+    @property
+    def waiting(self) -> int:
+        """The number of the requests waiting for the tokens."""
+        return len(self._waiters)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(
+            self.tokens_per_minute,
+            self._tokens + elapsed * self.tokens_per_minute / 60,
+        )
+        if self.requests_per_minute is not None:
+            self._requests = min(
+                self.requests_per_minute,
+                self._requests + elapsed * self.requests_per_minute / 60,
+            )
+
+    def _get_wait(self, tokens: float, requests: int) -> float:
+        """The time until the tokens and the requests are available."""
+        needed = min(tokens, self.tokens_per_minute)
+        wait = max(0.0, needed - self._tokens) * 60 / self.tokens_per_minute
+        if self.requests_per_minute is not None:
+            wait = max(
+                wait,
+                max(0.0, requests - self._requests)
+                * 60
+                / self.requests_per_minute,
+            )
+        return wait
+
+    def _take(self, tokens: int) -> float:
+        self._refill()
+        if (wait := self._get_wait(tokens, 1)) > 0:
+            return wait
+        self._tokens -= tokens
+        if self.requests_per_minute is not None:
+            self._requests -= 1
+        return 0
+
+    def try_take(self, tokens: int) -> float:
+        """Take the tokens and a request if available
+        and no other request is waiting for them.
+
+        Returns:
+            0 if taken, otherwise the time in seconds to wait before retrying.
+        """
+        with self._lock:
+            if not self._waiters:
+                return self._take(tokens)
+            self._refill()
+            # Estimated as if the waiting requests were sent first
+            return self._get_wait(
+                sum(waiter.tokens for waiter in self._waiters) + tokens,
+                len(self._waiters) + 1,
+            )
+
+    def _enqueue(self, tokens: int, is_async: bool) -> Optional[_Waiter]:
+        """Take the tokens if no other request is waiting for them,
+        otherwise put the request in the queue."""
+        with self._lock:
+            if not self._waiters and self._take(tokens) == 0:
+                return None
+            waiter = _Waiter(tokens, is_async)
+            self._waiters.append(waiter)
+            return waiter
+
+    def _poll(self, waiter: _Waiter) -> Optional[float]:
+        """Take the tokens of the waiter if it's first in the queue.
+
+        Returns:
+            0 if taken, otherwise the time to wait for the refill
+            or None if waiting for the turn.
+        """
+        with self._lock:
+            waiter.rearm()
+            if self._waiters[0] is not waiter:
+                return None
+            if (wait := self._take(waiter.tokens)) > 0:
+                return wait
+            self._dequeue(waiter)
+            return 0
+
+    def _dequeue(self, waiter: _Waiter) -> None:
+        """Remove the waiter from the queue, letting the next one take
+        the tokens."""
+        is_first = self._waiters[0] is waiter
+        self._waiters.remove(waiter)
+        if is_first:
+            self._wake_first()
+
+    def _wake_first(self) -> None:
+        if self._waiters:
+            self._waiters[0].wake()
+
+    def take(self, tokens: int) -> None:
+        """Wait until the tokens are available and take them."""
+        if (waiter := self._enqueue(tokens, False)) is None:
+            return
+        try:
+            while (wait := self._poll(waiter)) != 0:
+                waiter.event.wait(wait)  # type: ignore[union-attr]
+        except BaseException:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._dequeue(waiter)
+            raise
+
+    async def atake(self, tokens: int) -> None:
+        """Wait until the tokens are available and take them."""
+        if (waiter := self._enqueue(tokens, True)) is None:
+            return
+        try:
+            while (wait := self._poll(waiter)) != 0:
+                await asyncio.wait(
+                    {waiter.future}, timeout=wait  # type: ignore[arg-type]
+                )
+        except BaseException:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._dequeue(waiter)
+            raise
+
+    def give_back(self, tokens: float) -> None:
+        """Return the tokens taken in excess (or take more, if negative)."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.tokens_per_minute, self._tokens + tokens)
+            if tokens > 0:
+                self._wake_first()
+
+    def resync(self, headers: Mapping[str, str]) -> None:
+        """Lower the available tokens and requests to the ones reported
+        by the deployment in the `x-ratelimit-remaining-*` headers."""
+        remaining_tokens = _parse_header(
+            headers, "x-ratelimit-remaining-tokens"
+        )
+        remaining_requests = _parse_header(
+            headers, "x-ratelimit-remaining-requests"
+        )
+        if remaining_tokens is None and remaining_requests is None:
+            return
+        with self._lock:
+            self._refill()
+            if remaining_tokens is not None:
+                self._tokens = min(self._tokens, remaining_tokens)
+            if (
+                remaining_requests is not None
+                and self.requests_per_minute is not None
+            ):
+                self._requests = min(self._requests, remaining_requests)
+
+
+def _parse_header(headers: Mapping[str, str], name: str) -> Optional[float]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class Reservation:
+    """The tokens taken from the bucket for a request."""
+
+    __slots__ = ("bucket", "tokens", "responded", "reconciled")
+
+    def __init__(self, bucket: TokenBucket, tokens: int):
+        self.bucket = bucket
+        self.tokens = tokens
+        self.responded = False
+        self.reconciled = False
+
+    def reconcile(self, usage: Any) -> None:
+        """Adjust the bucket by the actual usage of the request."""
+        if self.reconciled or (total_tokens := get_total_tokens(usage)) is None:
+            return
+        self.reconciled = True
+        self.bucket.give_back(self.tokens - total_tokens)
+
+    def on_response(self, response: httpx.Response) -> None:
+        if response.is_success:
+            self.responded = True
+        self.bucket.resync(response.headers)
+
+    @contextmanager
+    def observe_responses(self) -> Iterator[None]:
+        """Resync the bucket from the responses received within the block."""
+        token = response_observer.set(self.on_response)
+        try:
+            yield
+        finally:
+            response_observer.reset(token)
+
+    def watch_usage(self, chunks: Iterator[dict]) -> Iterator[dict]:
+        """Reconcile the reservation with the usage of the stream."""
+        for chunk in chunks:
+            if (usage := chunk.get("usage")) is not None:
+                self.reconcile(usage)
+            yield chunk
+
+    async def awatch_usage(
+        self, chunks: AsyncIterator[dict]
+    ) -> AsyncIterator[dict]:
+        """Reconcile the reservation with the usage of the stream."""
+        async for chunk in chunks:
+            if (usage := chunk.get("usage")) is not None:
+                self.reconcile(usage)
+            yield chunk
+
+    def release(self, error: Optional[BaseException]) -> None:
+        # The tokens of a request which failed before a successful response
+        # (e.g. rejected with 429) aren't consumed by the deployment.
+        if error is not None and not self.responded and not self.reconciled:
+            self.reconciled = True
+            self.bucket.give_back(self.tokens)
+
+
+class TokenBudget:
+    """Client-side token-per-minute budget of the requests per deployment.
+
+    Before a request is sent, its tokens (the estimated prompt tokens
+    and the requested completion tokens, as the deployment counts them)
+    are reserved in the token bucket of the deployment, waiting locally
+    for the bucket to refill instead of getting 429 responses.
+    The reservation is reconciled with the actual `usage` of the response
+    (a stream reports it with `stream_options={"include_usage": True}`),
+    and the bucket is lowered to the `x-ratelimit-remaining-tokens`/`-requests`
+    headers of the responses, which account for the other clients
+    of the deployment. The instances sharing the budget share the bucket
+    of each deployment.
+
+    Args:
+        tokens_per_minute: The token limit of a deployment.
+        requests_per_minute: The request limit of a deployment, if any.
+        completion_tokens: The completion tokens reserved for the requests
+            without `max_tokens`.
+        estimate_prompt_tokens: Estimates the prompt tokens of the messages.
+
+    Example:
+        .. code-block:: python
+
+            budget = TokenBudget(tokens_per_minute=120_000)
+            llm = AzureChatOpenAI(..., token_budget=budget)
+            print(budget.snapshot())
+    """
+
+    def __init__(
+        self,
+        tokens_per_minute: int,
+        requests_per_minute: Optional[int] = None,
+        completion_tokens: int = 256,
+        estimate_prompt_tokens: Callable[[Any], int] = estimate_prompt_tokens,
+    ):
+        TokenBucket(tokens_per_minute, requests_per_minute)
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self.completion_tokens = completion_tokens
+        self.estimate_prompt_tokens = estimate_prompt_tokens
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def get_bucket(self, deployment: Hashable) -> TokenBucket:
+        """The token bucket of the deployment."""
+        if (bucket := self._buckets.get(deployment)) is None:
+            with self._lock:
+                bucket = self._buckets.setdefault(
+                    deployment,
+                    TokenBucket(
+                        self.tokens_per_minute, self.requests_per_minute
+                    ),
+                )
+        return bucket
+
+    def estimate_tokens(self, payload: Mapping[str, Any]) -> int:
+        """Estimate the tokens of the request as counted by the deployment."""
+        completion_tokens = (
+            payload.get("max_tokens")
+            or payload.get("max_completion_tokens")
+            or self.completion_tokens
+        )
+        return self.estimate_prompt_tokens(
+            payload["messages"]
+        ) + completion_tokens * (payload.get("n") or 1)
+
+    @contextmanager
+    def reserve(
+        self, deployment: Hashable, payload: Mapping[str, Any]
+    ) -> Iterator[Reservation]:
+        """Reserve the tokens of the request, waiting for them if needed."""
+        bucket = self.get_bucket(deployment)
+        reservation = Reservation(bucket, self.estimate_tokens(payload))
+        bucket.take(reservation.tokens)
+        try:
+            yield reservation
+        except BaseException as e:
+            reservation.release(e)
+            raise
+
+    @asynccontextmanager
+    async def areserve(
+        self, deployment: Hashable, payload: Mapping[str, Any]
+    ) -> AsyncIterator[Reservation]:
+        """Reserve the tokens of the request, waiting for them if needed."""
+        bucket = self.get_bucket(deployment)
+        reservation = Reservation(bucket, self.estimate_tokens(payload))
+        await bucket.atake(reservation.tokens)
+        try:
+            yield reservation
+        except BaseException as e:
+            reservation.release(e)
+            raise
+
+    def snapshot(self) -> Dict[Hashable, Dict[str, Optional[float]]]:
+        """The tokens and the requests available for every deployment."""
+        return {
+            deployment: {"tokens": bucket.tokens, "requests": bucket.requests}
+            for deployment, bucket in list(self._buckets.items())
+        }
@@ -1,14 +1,45 @@
 import inspect
 import os
-from typing import Any, Dict, List, Mapping, Optional, Type, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
 
 import openai
 from langchain_core.messages import BaseMessage, BaseMessageChunk
 from langchain_core.outputs import ChatGenerationChunk
 
+_Projection = Callable[[Mapping[str, Any]], dict]
 
-def _mask_by_keys(d: dict, keys: list[str]) -> dict:
-    return {k: d[k] for k in keys if k in d}
+
+def _compile_projection(keys: Iterable[str]) -> _Projection:
+    """Build a function selecting the given keys from a mapping.
+
+    The keys are frozen when the projection is built,
+    so the returned function doesn't allocate anything but the result.
+    """
+    frozen_keys: Tuple[str, ...] = tuple(dict.fromkeys(keys))
+
+    if len(frozen_keys) == 1:
+        (key,) = frozen_keys
+
+        def _project_one(d: Mapping[str, Any]) -> dict:
+            return {key: d[key]} if key in d else {}
+
+        return _project_one
+
+    def _project(d: Mapping[str, Any]) -> dict:
+        return {k: d[k] for k in frozen_keys if k in d}
+
+    return _project
 
 
 def _get_pos_arg_count(func):
@@ -28,27 +59,35 @@ def _get_env_var_list(name: str) -> Optional[List[str]]:
     return None if value is None else value.split(",")
 
 
-EXTRA_REQUEST_MESSAGE_FIELDS = _get_env_var_list(
-    "LC_EXTRA_REQUEST_MESSAGE_FIELDS"
-) or ["custom_content"]
-EXTRA_RESPONSE_MESSAGE_FIELDS = _get_env_var_list(
-    "LC_EXTRA_RESPONSE_MESSAGE_FIELDS"
-) or ["custom_content"]
-EXTRA_RESPONSE_FIELDS = _get_env_var_list("LC_EXTRA_RESPONSE_FIELDS") or [
-    "statistics"
-]
+EXTRA_REQUEST_MESSAGE_FIELDS = tuple(
+    _get_env_var_list("LC_EXTRA_REQUEST_MESSAGE_FIELDS") or ["custom_content"]
+)
+EXTRA_RESPONSE_MESSAGE_FIELDS = tuple(
+    _get_env_var_list("LC_EXTRA_RESPONSE_MESSAGE_FIELDS") or ["custom_content"]
+)
+EXTRA_RESPONSE_FIELDS = tuple(
+    _get_env_var_list("LC_EXTRA_RESPONSE_FIELDS") or ["statistics"]
+)
 # NOTE: not really needed, since they are propagated automatically via extra_body
 # EXTRA_REQUEST_FIELDS = ["addons", "max_prompt_tokens", "custom_fields"]
 
+_project_request_message_extra = _compile_projection(
+    EXTRA_REQUEST_MESSAGE_FIELDS
+)
+_project_response_message_extra = _compile_projection(
+    EXTRA_RESPONSE_MESSAGE_FIELDS
+)
+_project_response_extra = _compile_projection(EXTRA_RESPONSE_FIELDS)
+# The `include` of `model_dump` selecting the extra fields
+_response_extra_keys: Dict[str, bool] = {
+    key: True for key in EXTRA_RESPONSE_FIELDS
+}
+
 
 def patch_convert_message_to_dict(func):
     def _func(message: BaseMessage) -> dict:
         result = func(message)
-        result.update(
-            _mask_by_keys(
-                message.additional_kwargs, EXTRA_REQUEST_MESSAGE_FIELDS
-            )
-        )
+        result.update(_project_request_message_extra(message.additional_kwargs))
         return result
 
     return _func
@@ -57,7 +96,7 @@ def patch_convert_message_to_dict(func):
 def patch_convert_dict_to_message(func):
     def _func(_dict: Mapping[str, Any]) -> BaseMessage:
         result = func(_dict)
-        result.additional_kwargs.update(_mask_by_keys(_dict, EXTRA_RESPONSE_MESSAGE_FIELDS))  # type: ignore
+        result.additional_kwargs.update(_project_response_message_extra(_dict))  # type: ignore
         return result
 
     return _func
@@ -68,13 +107,17 @@ def patch_convert_delta_to_message_chunk(func):
         _dict: Mapping[str, Any], default_class: Type[BaseMessageChunk]
     ) -> BaseMessageChunk:
         result = func(_dict, default_class)
-        result.additional_kwargs.update(_mask_by_keys(_dict, EXTRA_RESPONSE_MESSAGE_FIELDS))  # type: ignore
+        if extra := _project_response_message_extra(_dict):
+            result.additional_kwargs.update(extra)  # type: ignore
         return result
 
     return _func
 
 
 def patch_create_chat_result(func):
+    # langchain_openai<=0.1.16 doesn't accept generation_info
+    takes_generation_info = _get_pos_arg_count(func) == 3
+
     def _func(
         self,
         response: Union[dict, openai.BaseModel],
@@ -82,15 +125,19 @@ def patch_create_chat_result(func):
     ):
         result = (
             func(self, response, generation_info)
-            if _get_pos_arg_count(func) == 3
+            if takes_generation_info
             else func(self, response)
         )
 
+        # Only the extra fields are dumped, since the full conversion
+        # has been already done by the patched function
         _dict = (
-            response if isinstance(response, dict) else response.model_dump()
+            response
+            if isinstance(response, dict)
+            else response.model_dump(include=_response_extra_keys)
         )
 
-        if extra := _mask_by_keys(_dict, EXTRA_RESPONSE_FIELDS):
+        if extra := _project_response_extra(_dict):
             result.llm_output = result.llm_output or {}
             result.llm_output.update(extra)
 
@@ -106,10 +153,9 @@ def patch_convert_chunk_to_generation_chunk(func):
         base_generation_info: Optional[Dict],
     ) -> Optional[ChatGenerationChunk]:
         result = func(chunk, default_chunk_class, base_generation_info)
-        if result:
-            result.message.response_metadata.update(
-                _mask_by_keys(chunk, EXTRA_RESPONSE_FIELDS)
-            )
+        # Top-level extras are usually sent in the last chunk only
+        if result and (extra := _project_response_extra(chunk)):
+            result.message.response_metadata.update(extra)
         return result
 
     return _func
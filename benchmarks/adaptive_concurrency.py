@@ -0,0 +1,118 @@
+"""
+A batch sent to a deployment of a limited capacity.
+
+`abatch` firing all the requests at once and relying on the retries
+of the openai SDK (baseline) is compared to `abatch` with `AdaptiveConcurrency`.
+The mock deployment serves up to 8 concurrent requests with a fixed latency
+and responds with 429 to the requests above its capacity.
+
+Run with: python -m benchmarks.adaptive_concurrency
+"""
+
+import asyncio
+from typing import List
+
+import httpx
+from langchain_core.language_models import LanguageModelInput
+from pydantic import SecretStr
+
+# NOTE: the import of the custom class imports the patch package,
+# which patches the original langchain_openai module as a side effect.
+from aidial_integration_langchain.langchain_openai import (
+    AdaptiveConcurrency,
+    AzureChatOpenAI,
+)
+from benchmarks.utils import print_table, time_per_call
+
+_CAPACITY = 8
+_LATENCY = 0.02
+_BATCH_SIZE = 200
+
+_RESPONSE = {
+    "id": "chatcmpl-123",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4",
+    "choices": [
+        {
+            "index": 0,
+            "message": {"role": "assistant", "content": "answer"},
+            "finish_reason": "stop",
+        }
+    ],
+}
+
+
+class _Deployment:
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def handler(self, _: httpx.Request) -> httpx.Response:
+        if self.in_flight >= _CAPACITY:
+            self.rejected += 1
+            return httpx.Response(
+                429,
+                json={"error": {"message": "Too many requests"}},
+                headers={"retry-after-ms": "100"},
+            )
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(_LATENCY)
+            return httpx.Response(200, json=_RESPONSE)
+        finally:
+            self.in_flight -= 1
+
+
+def _create_llm(deployment: _Deployment, **kwargs) -> AzureChatOpenAI:
+    return AzureChatOpenAI(
+        api_key=SecretStr("dummy-key"),
+        api_version="dummy-version",
+        azure_endpoint="https://dummy-url",
+        azure_deployment="dummy-deployment",
+        http_async_client=httpx.AsyncClient(
+            transport=httpx.MockTransport(deployment.handler)
+        ),
+        raw_json_responses=True,
+        max_retries=100,
+        **kwargs,
+    )
+
+
+def main() -> None:
+    loop = asyncio.new_event_loop()
+    deployment = _Deployment()
+    adaptive_deployment = _Deployment()
+    llm = _create_llm(deployment)
+    adaptive_llm = _create_llm(
+        adaptive_deployment,
+        adaptive_concurrency=AdaptiveConcurrency(initial_limit=4),
+    )
+    prompts: List[LanguageModelInput] = [
+        f"question {i}" for i in range(_BATCH_SIZE)
+    ]
+
+    def _batch(llm: AzureChatOpenAI):
+        return lambda: loop.run_until_complete(llm.abatch(prompts))
+
+    print_table(
+        "Batch to a deployment with 8 slots: SDK retries (baseline) "
+        "vs AdaptiveConcurrency (measured)",
+        [
+            (
+                f"{_BATCH_SIZE} requests",
+                time_per_call(_batch(llm), number=1),
+                time_per_call(_batch(adaptive_llm), number=1),
+            )
+        ],
+    )
+    print(
+        f"429 responses: {deployment.rejected} (baseline), "
+        f"{adaptive_deployment.rejected} (measured)"
+    )
+    print()
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+A streamed response with a slow token callback handler.
+
+The mock deployment streams 100 tokens 2 ms apart and the callback handler
+(e.g. forwarding the tokens to a websocket) takes 5 ms per token.
+The tokens are dispatched inline (baseline), holding up reading the stream,
+and by `CallbackDispatch` in the background (measured), with and without
+coalescing the queued tokens.
+
+Run with: python -m benchmarks.callback_dispatch
+"""
+
+import asyncio
+import json
+from typing import Any, AsyncIterator, Optional
+
+import httpx
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.runnables import RunnableConfig
+from pydantic import SecretStr
+
+# NOTE: the import of the custom class imports the patch package,
+# which patches the original langchain_openai module as a side effect.
+from aidial_integration_langchain.langchain_openai import (
+    AzureChatOpenAI,
+    CallbackDispatch,
+)
+from benchmarks.utils import print_table, time_per_call
+
+_TOKENS = 100
+_TOKEN_INTERVAL = 0.002
+_CALLBACK_LATENCY = 0.005
+
+
+def _chunk(content: str) -> bytes:
+    chunk = {
+        "id": "chatcmpl-123",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": "gpt-4",
+        "choices": [{"index": 0, "delta": {"content": content}}],
+    }
+    return f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+
+
+async def _body() -> AsyncIterator[bytes]:
+    for i in range(_TOKENS):
+        await asyncio.sleep(_TOKEN_INTERVAL)
+        yield _chunk(f"token{i} ")
+    yield b"data: [DONE]\n\n"
+
+
+def _handler(_: httpx.Request) -> httpx.Response:
+    return httpx.Response(
+        200, content=_body(), headers={"Content-Type": "text/event-stream"}
+    )
+
+
+class _SlowHandler(AsyncCallbackHandler):
+    async def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        await asyncio.sleep(_CALLBACK_LATENCY)
+
+
+def _create_llm(dispatch: Optional[CallbackDispatch]) -> AzureChatOpenAI:
+    return AzureChatOpenAI(
+        api_key=SecretStr("dummy-key"),
+        api_version="dummy-version",
+        azure_endpoint="https://dummy-url",
+        azure_deployment="dummy-deployment",
+        http_async_client=httpx.AsyncClient(
+            transport=httpx.MockTransport(_handler)
+        ),
+        raw_json_responses=True,
+        streaming=True,
+        callback_dispatch=dispatch,
+    )
+
+
+def main() -> None:
+    loop = asyncio.new_event_loop()
+    config = RunnableConfig(callbacks=[_SlowHandler()])
+
+    def _invoke(llm: AzureChatOpenAI):
+        return lambda: loop.run_until_complete(llm.ainvoke("q", config=config))
+
+    baseline = time_per_call(_invoke(_create_llm(None)), number=1)
+    print_table(
+        "Streamed response with a slow callback handler: inline (baseline) "
+        "vs background dispatch (measured)",
+        [
+            (
+                f"{_TOKENS} tokens, max_pending={max_pending}",
+                baseline,
+                time_per_call(
+                    _invoke(_create_llm(CallbackDispatch(max_pending))),
+                    number=1,
+                ),
+            )
+            for max_pending in (_TOKENS, 4)
+        ],
+    )
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
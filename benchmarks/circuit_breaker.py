@@ -0,0 +1,110 @@
+"""
+Calls to a failing deployment with and without a circuit breaker.
+
+The mock deployment responds with 503 after 20 ms and the openai SDK
+retries every request twice. The calls wait through all the attempts
+without a circuit breaker (baseline), while `CircuitBreaker` opens
+the circuit after the first failures, so that the rest of the calls
+fail fast or fall back to another deployment (measured).
+
+Run with: python -m benchmarks.circuit_breaker
+"""
+
+import time
+from typing import Optional
+
+import httpx
+from pydantic import SecretStr
+
+# NOTE: the import of the custom class imports the patch package,
+# which patches the original langchain_openai module as a side effect.
+from aidial_integration_langchain.langchain_openai import (
+    AzureChatOpenAI,
+    CircuitBreaker,
+)
+from benchmarks.utils import print_table, time_per_call
+
+_LATENCY = 0.02
+_CALLS = 50
+
+_RESPONSE = {
+    "id": "chatcmpl-123",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4",
+    "choices": [
+        {
+            "index": 0,
+            "message": {"role": "assistant", "content": "answer"},
+            "finish_reason": "stop",
+        }
+    ],
+}
+
+
+def _handler(request: httpx.Request) -> httpx.Response:
+    time.sleep(_LATENCY)
+    if request.url.host == "failing":
+        return httpx.Response(
+            503,
+            json={"error": {"message": "unavailable"}},
+            headers={"retry-after-ms": "10"},
+        )
+    return httpx.Response(200, json=_RESPONSE)
+
+
+def _create_llm(host: str, **kwargs) -> AzureChatOpenAI:
+    return AzureChatOpenAI(
+        api_key=SecretStr("dummy-key"),
+        api_version="dummy-version",
+        azure_endpoint=f"https://{host}",
+        azure_deployment="dummy-deployment",
+        http_client=httpx.Client(transport=httpx.MockTransport(_handler)),
+        raw_json_responses=True,
+        max_retries=2,
+        **kwargs,
+    )
+
+
+def _calls(
+    breaker: Optional[CircuitBreaker],
+    fallback_llm: Optional[AzureChatOpenAI] = None,
+) -> None:
+    llm = _create_llm(
+        "failing", circuit_breaker=breaker, fallback_llm=fallback_llm
+    )
+    for i in range(_CALLS):
+        try:
+            llm.invoke(f"question {i}")
+        except Exception:
+            pass
+
+
+def main() -> None:
+    baseline = time_per_call(lambda: _calls(None), number=1)
+    fallback_llm = _create_llm("healthy")
+    print_table(
+        "Calls to a failing deployment: retries (baseline) "
+        "vs circuit breaker (measured)",
+        [
+            (
+                f"{_CALLS} calls, fail fast",
+                baseline,
+                time_per_call(
+                    lambda: _calls(CircuitBreaker(open_time=60)), number=1
+                ),
+            ),
+            (
+                f"{_CALLS} calls, fallback",
+                baseline,
+                time_per_call(
+                    lambda: _calls(CircuitBreaker(open_time=60), fallback_llm),
+                    number=1,
+                ),
+            ),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
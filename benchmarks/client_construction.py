@@ -0,0 +1,76 @@
+"""
+Cost of constructing AzureChatOpenAI instances.
+
+The original langchain_openai class is compared to the custom class,
+which creates the openai clients lazily and takes them from the shared registry
+unless created with `share_connection_pool=False`.
+
+Run with: python -m benchmarks.client_construction
+"""
+
+from typing import Any, Dict
+
+# NOTE: the import of the custom class imports the patch package,
+# which patches the original langchain_openai module as a side effect.
+from aidial_integration_langchain.langchain_openai import AzureChatOpenAI
+from benchmarks.utils import print_table, time_per_call
+
+_PARAMS: Dict[str, Any] = {
+    "api_key": "dummy-key",
+    "api_version": "dummy-version",
+    "azure_endpoint": "https://dummy-url",
+    "azure_deployment": "dummy-deployment",
+}
+_NOT_SHARED_PARAMS: Dict[str, Any] = {**_PARAMS, "share_connection_pool": False}
+
+
+# Each construction of the original class creates two openai clients
+# with their own SSL contexts, which takes tens of milliseconds.
+_SLOW_NUMBER = 5
+
+
+def main() -> None:
+    from langchain_openai import AzureChatOpenAI as OriginalAzureChatOpenAI
+
+    llm = AzureChatOpenAI(**_PARAMS)
+    baseline = time_per_call(
+        lambda: OriginalAzureChatOpenAI(**_PARAMS), number=_SLOW_NUMBER
+    )
+
+    print_table(
+        "Construction: langchain_openai (baseline) vs custom class (measured)",
+        [
+            (
+                "construction",
+                baseline,
+                time_per_call(lambda: AzureChatOpenAI(**_PARAMS), number=1000),
+            ),
+            (
+                "construction + sync client",
+                baseline,
+                time_per_call(
+                    lambda: AzureChatOpenAI(**_PARAMS).client,
+                    number=1000,
+                ),
+            ),
+            (
+                "with_options(temperature=...)",
+                baseline,
+                time_per_call(
+                    lambda: llm.with_options(temperature=0.5), number=10_000
+                ),
+            ),
+            (
+                "construction + sync client, not shared",
+                baseline,
+                time_per_call(
+                    lambda: AzureChatOpenAI(**_NOT_SHARED_PARAMS).client,
+                    number=_SLOW_NUMBER,
+                ),
+            ),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
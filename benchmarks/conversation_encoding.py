@@ -0,0 +1,87 @@
+"""
+Per-turn cost of a request with a long conversation history.
+
+A request with the history passed as a list of messages (baseline)
+is compared to a request with the history kept in `Conversation`,
+which encodes only the messages appended since the previous request.
+The requests are served by a mock transport.
+
+Run with: python -m benchmarks.conversation_encoding
+"""
+
+import httpx
+from langchain_core.messages import AIMessage, HumanMessage
+from pydantic import SecretStr
+
+# NOTE: the import of the custom class imports the patch package,
+# which patches the original langchain_openai module as a side effect.
+from aidial_integration_langchain.langchain_openai import (
+    AzureChatOpenAI,
+    Conversation,
+)
+from benchmarks.utils import print_table, time_per_call
+
+_RESPONSE = {
+    "id": "chatcmpl-123",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4",
+    "choices": [
+        {
+            "index": 0,
+            "message": {"role": "assistant", "content": "answer"},
+            "finish_reason": "stop",
+        }
+    ],
+}
+
+
+def _history(turns: int) -> list:
+    messages: list = []
+    for turn in range(turns):
+        state = {"state": {"turn": turn, "blob": "x" * 2000}}
+        messages.append(HumanMessage(content=f"question {turn}"))
+        messages.append(
+            AIMessage(
+                content=f"answer {turn}",
+                additional_kwargs={"custom_content": state},
+            )
+        )
+    messages.append(HumanMessage(content="question"))
+    return messages
+
+
+def main() -> None:
+    transport = httpx.MockTransport(
+        lambda _: httpx.Response(200, json=_RESPONSE)
+    )
+    llm = AzureChatOpenAI(
+        api_key=SecretStr("dummy-key"),
+        api_version="dummy-version",
+        azure_endpoint="https://dummy-url",
+        azure_deployment="dummy-deployment",
+        http_client=httpx.Client(transport=transport),
+        raw_json_responses=True,
+    )
+
+    rows = []
+    for turns in [10, 50, 200]:
+        messages = _history(turns)
+        conversation = Conversation(messages=messages)
+        llm.invoke(conversation)
+        rows.append(
+            (
+                f"{2 * turns + 1} messages",
+                time_per_call(lambda: llm.invoke(messages), number=5),
+                time_per_call(lambda: llm.invoke(conversation), number=5),
+            )
+        )
+
+    print_table(
+        "Request with history: list of messages (baseline) vs Conversation (measured)",
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
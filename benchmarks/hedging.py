@@ -0,0 +1,119 @@
+"""
+Tail latency of the requests to a deployment with slow outliers.
+
+The mock deployment responds in 20-30 ms, but 2% of its responses
+take 500 ms. A batch of 400 requests (20 at a time) is sent
+without hedging (baseline) and with `RequestHedger` hedging the requests
+slower than the 95th percentile within the budget of 5% extra requests
+(measured).
+
+Run with: python -m benchmarks.hedging
+"""
+
+import asyncio
+import random
+import time
+from typing import List, Optional
+
+import httpx
+from pydantic import SecretStr
+
+# NOTE: the import of the custom class imports the patch package,
+# which patches the original langchain_openai module as a side effect.
+from aidial_integration_langchain.langchain_openai import (
+    AzureChatOpenAI,
+    RequestHedger,
+)
+from benchmarks.utils import print_table
+
+_LATENCY = 0.02
+_JITTER = 0.01
+_SLOW_LATENCY = 0.5
+_SLOW_RATIO = 0.02
+_BATCH_SIZE = 400
+_CONCURRENCY = 20
+
+_RESPONSE = {
+    "id": "chatcmpl-123",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4",
+    "choices": [
+        {
+            "index": 0,
+            "message": {"role": "assistant", "content": "answer"},
+            "finish_reason": "stop",
+        }
+    ],
+}
+
+
+class _Deployment:
+    def __init__(self) -> None:
+        self.random = random.Random(0)
+        self.requests = 0
+
+    async def handler(self, _: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.random.random() < _SLOW_RATIO:
+            await asyncio.sleep(_SLOW_LATENCY)
+        else:
+            await asyncio.sleep(_LATENCY + self.random.random() * _JITTER)
+        return httpx.Response(200, json=_RESPONSE)
+
+
+async def _latencies(hedger: Optional[RequestHedger]) -> List[float]:
+    deployment = _Deployment()
+    llm = AzureChatOpenAI(
+        api_key=SecretStr("dummy-key"),
+        api_version="dummy-version",
+        azure_endpoint="https://dummy-url",
+        azure_deployment="dummy-deployment",
+        http_async_client=httpx.AsyncClient(
+            transport=httpx.MockTransport(deployment.handler)
+        ),
+        raw_json_responses=True,
+        request_hedger=hedger,
+    )
+    semaphore = asyncio.Semaphore(_CONCURRENCY)
+
+    async def _timed(prompt: str) -> float:
+        async with semaphore:
+            start = time.perf_counter()
+            await llm.ainvoke(prompt)
+            return time.perf_counter() - start
+
+    latencies = await asyncio.gather(
+        *(_timed(f"question {i}") for i in range(_BATCH_SIZE))
+    )
+    print(f"Upstream requests: {deployment.requests}")
+    return sorted(latencies)
+
+
+def main() -> None:
+    loop = asyncio.new_event_loop()
+    baseline = loop.run_until_complete(_latencies(None))
+    hedger = RequestHedger(percentile=95, budget=0.05)
+    measured = loop.run_until_complete(_latencies(hedger))
+    loop.close()
+    print(f"Hedger: {hedger.snapshot()}")
+
+    def _percentile(latencies: List[float], p: int) -> float:
+        return latencies[(len(latencies) - 1) * p // 100] * 1e9
+
+    print_table(
+        "Latency with slow outliers: no hedging (baseline) "
+        "vs hedged requests (measured)",
+        [
+            (
+                f"p{p} of {_BATCH_SIZE} requests",
+                _percentile(baseline, p),
+                _percentile(measured, p),
+            )
+            for p in (50, 95, 99)
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
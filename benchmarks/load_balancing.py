@@ -0,0 +1,113 @@
+"""
+A batch sent to one deployment and to a pool of three deployments.
+
+The mock deployments slow down with the number of the requests in flight,
+one of the three pooled deployments (a remote region) being slower
+than the others. The batch sent to the single deployment (baseline)
+is compared to the batch balanced by `PooledAzureChatOpenAI`
+with the least outstanding requests and with the EWMA latency strategies.
+
+Run with: python -m benchmarks.load_balancing
+"""
+
+import asyncio
+from typing import Dict, List
+
+import httpx
+from langchain_core.language_models import LanguageModelInput
+
+# NOTE: the import of the custom class imports the patch package,
+# which patches the original langchain_openai module as a side effect.
+from aidial_integration_langchain.langchain_openai import (
+    AzureChatOpenAI,
+    LoadBalancer,
+    PooledAzureChatOpenAI,
+)
+from benchmarks.utils import print_table, time_per_call
+
+_BASE_LATENCY = {"east": 0.02, "west": 0.02, "remote": 0.1}
+# The latency added by every request in flight
+_LOAD_LATENCY = 0.005
+_BATCH_SIZE = 200
+_CONCURRENCY = 20
+
+_RESPONSE = {
+    "id": "chatcmpl-123",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4",
+    "choices": [
+        {
+            "index": 0,
+            "message": {"role": "assistant", "content": "answer"},
+            "finish_reason": "stop",
+        }
+    ],
+}
+
+
+class _Deployments:
+    def __init__(self) -> None:
+        self.in_flight: Dict[str, int] = {}
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        in_flight = self.in_flight[host] = self.in_flight.get(host, 0) + 1
+        try:
+            await asyncio.sleep(
+                _BASE_LATENCY[host] + _LOAD_LATENCY * (in_flight - 1)
+            )
+            return httpx.Response(200, json=_RESPONSE)
+        finally:
+            self.in_flight[host] -= 1
+
+
+_PARAMS = {
+    "api_key": "dummy-key",
+    "api_version": "dummy-version",
+    "azure_deployment": "dummy-deployment",
+    "http_async_client": httpx.AsyncClient(
+        transport=httpx.MockTransport(_Deployments().handler)
+    ),
+    "raw_json_responses": True,
+}
+
+
+def main() -> None:
+    loop = asyncio.new_event_loop()
+    single_llm = AzureChatOpenAI(azure_endpoint="https://east", **_PARAMS)
+    targets = [{"azure_endpoint": f"https://{host}"} for host in _BASE_LATENCY]
+    pools = {
+        strategy: PooledAzureChatOpenAI(
+            targets=targets,
+            load_balancer=LoadBalancer(strategy=strategy),
+            **_PARAMS,
+        )
+        for strategy in ("least_outstanding", "ewma")
+    }
+    prompts: List[LanguageModelInput] = [
+        f"question {i}" for i in range(_BATCH_SIZE)
+    ]
+
+    def _batch(llm: AzureChatOpenAI):
+        return lambda: loop.run_until_complete(
+            llm.abatch(prompts, config={"max_concurrency": _CONCURRENCY})
+        )
+
+    baseline = time_per_call(_batch(single_llm), number=1)
+    print_table(
+        "Batch to one deployment (baseline) vs a pool of three (measured)",
+        [
+            (
+                f"{_BATCH_SIZE} requests, {strategy}",
+                baseline,
+                time_per_call(_batch(pool), number=1),
+            )
+            for strategy, pool in pools.items()
+        ],
+    )
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
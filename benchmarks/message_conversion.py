@@ -0,0 +1,65 @@
+"""
+Cost of converting a 100-message conversation history to the request messages.
+
+The conversion without the cache (baseline) is compared to the conversion
+with the warm `MessageDictCache` keyed by the message identity and content.
+
+Run with: python -m benchmarks.message_conversion
+"""
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+# NOTE: the import of the custom class imports the patch package,
+# which patches the original langchain_openai module as a side effect.
+from aidial_integration_langchain.langchain_openai import MessageDictCache
+from aidial_integration_langchain.langchain_openai.chat_models import base
+from benchmarks.utils import print_table, time_per_call
+
+
+def _history(turns: int) -> list:
+    messages: list = []
+    for turn in range(turns):
+        messages.append(
+            HumanMessage(
+                content=f"question {turn} " * 20,
+                additional_kwargs={"custom_content": {"state": {"turn": turn}}},
+            )
+        )
+        messages.append(
+            AIMessage(
+                content="",
+                tool_calls=[
+                    {"name": "f", "args": {"turn": turn}, "id": f"call_{turn}"}
+                ],
+            )
+        )
+    return messages
+
+
+def main() -> None:
+    messages = _history(50)
+    convert = base._convert_message_to_dict
+
+    rows = []
+    for key in ["identity", "content"]:
+        cache = MessageDictCache(key=key)  # type: ignore[arg-type]
+        cache.convert(messages, convert)
+        rows.append(
+            (
+                f"100 messages, {key} key",
+                time_per_call(
+                    lambda: [convert(m) for m in messages], number=200
+                ),
+                time_per_call(
+                    lambda: cache.convert(messages, convert), number=200
+                ),
+            )
+        )
+
+    print_table(
+        "History conversion: no cache (baseline) vs warm cache (measured)", rows
+    )
+
+
+if __name__ == "__main__":
+    main()
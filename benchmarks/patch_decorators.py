@@ -0,0 +1,116 @@
+"""
+Per-call overhead of the patch decorators compared to the unpatched functions.
+
+Run with: python -m benchmarks.patch_decorators
+"""
+
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import (
+    ChatGeneration,
+    ChatGenerationChunk,
+    ChatResult,
+)
+
+from aidial_integration_langchain.patch.decorators import (
+    patch_convert_chunk_to_generation_chunk,
+    patch_convert_delta_to_message_chunk,
+    patch_convert_dict_to_message,
+    patch_convert_message_to_dict,
+    patch_create_chat_result,
+)
+from benchmarks.utils import print_table, time_per_call
+
+_MESSAGE = HumanMessage(
+    content="question", additional_kwargs={"custom_content": {"state": "foo"}}
+)
+_RESPONSE = {
+    "choices": [{"index": 0, "message": {"role": "assistant"}}],
+    "statistics": {"a": "b"},
+}
+_CHUNK = {"choices": [{"index": 0, "delta": {"content": "token"}}]}
+
+
+# The stubs return prebuilt objects, so that only the patch overhead is measured
+_MESSAGE_DICT = {"role": "user", "content": "question"}
+_AI_MESSAGE = AIMessage(content="answer")
+_AI_MESSAGE_CHUNK = AIMessageChunk(content="token")
+_CHAT_RESULT = ChatResult(generations=[ChatGeneration(message=_AI_MESSAGE)])
+_GENERATION_CHUNK = ChatGenerationChunk(message=_AI_MESSAGE_CHUNK)
+
+
+def _convert_message_to_dict(message):
+    return _MESSAGE_DICT
+
+
+def _convert_dict_to_message(_dict):
+    return _AI_MESSAGE
+
+
+def _convert_delta_to_message_chunk(_dict, default_class):
+    return _AI_MESSAGE_CHUNK
+
+
+class _Model:
+    def _create_chat_result(self, response, generation_info=None):
+        return _CHAT_RESULT
+
+
+def _convert_chunk_to_generation_chunk(
+    chunk, default_chunk_class, base_generation_info
+):
+    return _GENERATION_CHUNK
+
+
+def main() -> None:
+    model = _Model()
+    create_chat_result = patch_create_chat_result(_Model._create_chat_result)
+
+    cases = [
+        (
+            "convert_message_to_dict",
+            lambda: _convert_message_to_dict(_MESSAGE),
+            lambda f=patch_convert_message_to_dict(_convert_message_to_dict): f(
+                _MESSAGE
+            ),
+        ),
+        (
+            "convert_dict_to_message",
+            lambda: _convert_dict_to_message(_RESPONSE),
+            lambda f=patch_convert_dict_to_message(_convert_dict_to_message): f(
+                _RESPONSE
+            ),
+        ),
+        (
+            "convert_delta_to_message_chunk",
+            lambda: _convert_delta_to_message_chunk(_CHUNK, AIMessageChunk),
+            lambda f=patch_convert_delta_to_message_chunk(
+                _convert_delta_to_message_chunk
+            ): f(_CHUNK, AIMessageChunk),
+        ),
+        (
+            "create_chat_result",
+            lambda: model._create_chat_result(_RESPONSE, None),
+            lambda: create_chat_result(model, _RESPONSE, None),
+        ),
+        (
+            "convert_chunk_to_generation_chunk",
+            lambda: _convert_chunk_to_generation_chunk(
+                _CHUNK, AIMessageChunk, None
+            ),
+            lambda f=patch_convert_chunk_to_generation_chunk(
+                _convert_chunk_to_generation_chunk
+            ): f(_CHUNK, AIMessageChunk, None),
+        ),
+    ]
+
+    print_table(
+        "Patch decorators: unpatched (baseline) vs patched (measured)",
+        [
+            (name, time_per_call(baseline), time_per_call(patched))
+            for name, baseline, patched in cases
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
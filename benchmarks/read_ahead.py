@@ -0,0 +1,103 @@
+"""
+A streamed response consumed by a slow consumer.
+
+The mock deployment streams 200 tokens 2 ms apart and the consumer
+of `astream` (e.g. forwarding to a slow client) takes 4 ms per chunk.
+Without read-ahead (baseline) the upstream is read only as fast
+as the consumer goes, while `ReadAhead` keeps reading the upstream
+into the buffer (measured). Both the time the upstream is read for
+(the connection is held) and the total time of the stream are reported.
+
+Run with: python -m benchmarks.read_ahead
+"""
+
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Optional, Tuple
+
+import httpx
+from pydantic import SecretStr
+
+# NOTE: the import of the custom class imports the patch package,
+# which patches the original langchain_openai module as a side effect.
+from aidial_integration_langchain.langchain_openai import (
+    AzureChatOpenAI,
+    ReadAhead,
+)
+from benchmarks.utils import print_table
+
+_TOKENS = 200
+_TOKEN_INTERVAL = 0.002
+_CONSUMER_LATENCY = 0.004
+
+
+def _chunk(content: str) -> bytes:
+    chunk = {
+        "id": "chatcmpl-123",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": "gpt-4",
+        "choices": [{"index": 0, "delta": {"content": content}}],
+    }
+    return f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+
+
+class _Deployment:
+    def __init__(self) -> None:
+        self.finished = 0.0
+
+    def handler(self, _: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            content=self._body(),
+            headers={"Content-Type": "text/event-stream"},
+        )
+
+    async def _body(self) -> AsyncIterator[bytes]:
+        for i in range(_TOKENS):
+            await asyncio.sleep(_TOKEN_INTERVAL)
+            yield _chunk(f"token{i} ")
+        self.finished = time.perf_counter()
+        yield b"data: [DONE]\n\n"
+
+
+async def _stream(read_ahead: Optional[ReadAhead]) -> Tuple[float, float]:
+    deployment = _Deployment()
+    llm = AzureChatOpenAI(
+        api_key=SecretStr("dummy-key"),
+        api_version="dummy-version",
+        azure_endpoint="https://dummy-url",
+        azure_deployment="dummy-deployment",
+        http_async_client=httpx.AsyncClient(
+            transport=httpx.MockTransport(deployment.handler)
+        ),
+        raw_json_responses=True,
+        read_ahead=read_ahead,
+    )
+    start = time.perf_counter()
+    async for _ in llm.astream("q"):
+        await asyncio.sleep(_CONSUMER_LATENCY)
+    end = time.perf_counter()
+    return (deployment.finished - start) * 1e9, (end - start) * 1e9
+
+
+def main() -> None:
+    loop = asyncio.new_event_loop()
+    baseline = loop.run_until_complete(_stream(None))
+    read_ahead = ReadAhead(high_water=256, low_water=64)
+    measured = loop.run_until_complete(_stream(read_ahead))
+    loop.close()
+    print(f"Read-ahead: {read_ahead.snapshot()}")
+    print_table(
+        "Slow consumer of a stream: no read-ahead (baseline) "
+        "vs read-ahead (measured)",
+        [
+            (f"{_TOKENS} chunks, upstream read", baseline[0], measured[0]),
+            (f"{_TOKENS} chunks, total", baseline[1], measured[1]),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
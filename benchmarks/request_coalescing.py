@@ -0,0 +1,90 @@
+"""
+A burst of concurrent identical requests.
+
+Every call sending its own request (baseline) is compared
+to the calls sharing one request via `RequestCoalescer`.
+The requests are served by a mock transport with a fixed latency.
+
+Run with: python -m benchmarks.request_coalescing
+"""
+
+import asyncio
+
+import httpx
+from pydantic import SecretStr
+
+# NOTE: the import of the custom class imports the patch package,
+# which patches the original langchain_openai module as a side effect.
+from aidial_integration_langchain.langchain_openai import (
+    AzureChatOpenAI,
+    RequestCoalescer,
+)
+from benchmarks.utils import print_table, time_per_call
+
+_LATENCY = 0.02
+
+_RESPONSE = {
+    "id": "chatcmpl-123",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4",
+    "choices": [
+        {
+            "index": 0,
+            "message": {"role": "assistant", "content": "answer"},
+            "finish_reason": "stop",
+        }
+    ],
+}
+
+
+async def _handler(_: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(_LATENCY)
+    return httpx.Response(200, json=_RESPONSE)
+
+
+def _create_llm(**kwargs) -> AzureChatOpenAI:
+    return AzureChatOpenAI(
+        api_key=SecretStr("dummy-key"),
+        api_version="dummy-version",
+        azure_endpoint="https://dummy-url",
+        azure_deployment="dummy-deployment",
+        http_async_client=httpx.AsyncClient(
+            transport=httpx.MockTransport(_handler)
+        ),
+        raw_json_responses=True,
+        **kwargs,
+    )
+
+
+def main() -> None:
+    loop = asyncio.new_event_loop()
+    llm = _create_llm()
+    coalescing_llm = _create_llm(request_coalescer=RequestCoalescer())
+
+    def _burst(llm: AzureChatOpenAI, size: int):
+        async def _run():
+            await asyncio.gather(
+                *(llm.ainvoke("question") for _ in range(size))
+            )
+
+        return lambda: loop.run_until_complete(_run())
+
+    rows = [
+        (
+            f"{size} concurrent calls",
+            time_per_call(_burst(llm, size), number=3),
+            time_per_call(_burst(coalescing_llm, size), number=3),
+        )
+        for size in [10, 100]
+    ]
+    print_table(
+        "Burst of identical requests: one request per call (baseline) "
+        "vs RequestCoalescer (measured)",
+        rows,
+    )
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
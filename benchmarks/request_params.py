@@ -0,0 +1,61 @@
+"""
+Fixed per-request cost of building the request and tracing parameters.
+
+The original langchain_openai class is compared to the custom class,
+which compiles the invariant parts of the parameters once per instance.
+
+Run with: python -m benchmarks.request_params
+"""
+
+from langchain_core.messages import HumanMessage
+
+# NOTE: the import of the custom class imports the patch package,
+# which patches the original langchain_openai module as a side effect.
+from aidial_integration_langchain.langchain_openai import AzureChatOpenAI
+from benchmarks.utils import print_table, time_per_call
+
+_PARAMS = {
+    "api_key": "dummy-key",
+    "api_version": "dummy-version",
+    "azure_endpoint": "https://dummy-url",
+    "azure_deployment": "dummy-deployment",
+    "max_tokens": 100,
+    "extra_body": {"custom_fields": {"configuration": {}}},
+}
+
+_MESSAGES = [HumanMessage(content="question")]
+_STOP = ["\n"]
+
+
+def main() -> None:
+    from langchain_openai import AzureChatOpenAI as OriginalAzureChatOpenAI
+
+    original = OriginalAzureChatOpenAI(**_PARAMS)
+    custom = AzureChatOpenAI(**_PARAMS)
+
+    print_table(
+        "Per-request parameters: langchain_openai (baseline) vs custom class (measured)",
+        [
+            (
+                name,
+                time_per_call(lambda: func(original), number=20_000),
+                time_per_call(lambda: func(custom), number=20_000),
+            )
+            for name, func in [
+                (
+                    "_get_request_payload",
+                    lambda llm: llm._get_request_payload(_MESSAGES, stop=_STOP),
+                ),
+                (
+                    "_get_invocation_params",
+                    lambda llm: llm._get_invocation_params(stop=_STOP),
+                ),
+                ("_get_ls_params", lambda llm: llm._get_ls_params(stop=_STOP)),
+                ("_identifying_params", lambda llm: llm._identifying_params),
+            ]
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
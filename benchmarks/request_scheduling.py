@@ -0,0 +1,119 @@
+"""
+Latency of interactive requests sharing a deployment with a batch job.
+
+A batch of 200 requests is followed by 20 interactive requests
+while the batch is in flight. The requests go through `RequestScheduler`
+with 4 slots: all of the same priority (baseline, i.e. FIFO)
+and with the interactive requests of `RequestPriority.INTERACTIVE`
+(measured). The mock deployment responds with a fixed latency.
+
+Run with: python -m benchmarks.request_scheduling
+"""
+
+import asyncio
+import time
+from typing import List
+
+import httpx
+from pydantic import SecretStr
+
+# NOTE: the import of the custom class imports the patch package,
+# which patches the original langchain_openai module as a side effect.
+from aidial_integration_langchain.langchain_openai import (
+    AzureChatOpenAI,
+    RequestPriority,
+    RequestScheduler,
+)
+from benchmarks.utils import print_table
+
+_LATENCY = 0.005
+_BATCH_SIZE = 200
+_INTERACTIVE_SIZE = 20
+
+_RESPONSE = {
+    "id": "chatcmpl-123",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4",
+    "choices": [
+        {
+            "index": 0,
+            "message": {"role": "assistant", "content": "answer"},
+            "finish_reason": "stop",
+        }
+    ],
+}
+
+
+async def _handler(_: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(_LATENCY)
+    return httpx.Response(200, json=_RESPONSE)
+
+
+def _create_llm() -> AzureChatOpenAI:
+    return AzureChatOpenAI(
+        api_key=SecretStr("dummy-key"),
+        api_version="dummy-version",
+        azure_endpoint="https://dummy-url",
+        azure_deployment="dummy-deployment",
+        http_async_client=httpx.AsyncClient(
+            transport=httpx.MockTransport(_handler)
+        ),
+        raw_json_responses=True,
+        request_scheduler=RequestScheduler(max_concurrency=4),
+    )
+
+
+async def _timed(llm: AzureChatOpenAI, prompt: str) -> float:
+    start = time.perf_counter()
+    await llm.ainvoke(prompt)
+    return time.perf_counter() - start
+
+
+async def _interactive_latencies(interactive_priority: int) -> List[float]:
+    llm = _create_llm()
+    batch_llm = llm.with_options(request_priority=RequestPriority.BATCH)
+    interactive_llm = llm.with_options(request_priority=interactive_priority)
+    batch = asyncio.gather(
+        *(batch_llm.ainvoke(f"job {i}") for i in range(_BATCH_SIZE))
+    )
+    await asyncio.sleep(_LATENCY * 5)
+    latencies = await asyncio.gather(
+        *(
+            _timed(interactive_llm, f"question {i}")
+            for i in range(_INTERACTIVE_SIZE)
+        )
+    )
+    await batch
+    return sorted(latencies)
+
+
+def main() -> None:
+    loop = asyncio.new_event_loop()
+    baseline = loop.run_until_complete(
+        _interactive_latencies(RequestPriority.BATCH)
+    )
+    measured = loop.run_until_complete(
+        _interactive_latencies(RequestPriority.INTERACTIVE)
+    )
+    loop.close()
+
+    def _percentile(latencies: List[float], p: int) -> float:
+        return latencies[(len(latencies) - 1) * p // 100] * 1e9
+
+    print_table(
+        "Interactive latency behind a batch job: FIFO (baseline) "
+        "vs priority scheduling (measured)",
+        [
+            (
+                f"p{p} of {_INTERACTIVE_SIZE} interactive requests",
+                _percentile(baseline, p),
+                _percentile(measured, p),
+            )
+            for p in (50, 95)
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Cost of a repeated request served from the response cache.
+
+A request served by a mock transport (baseline) is compared
+to the same request served from `InMemoryResponseCache`.
+Since the mock transport responds instantly, the baseline is only
+the client-side part of the cost, which the real network latency adds to.
+
+Run with: python -m benchmarks.response_cache
+"""
+
+import json
+
+import httpx
+from langchain_core.messages import HumanMessage
+from pydantic import SecretStr
+
+# NOTE: the import of the custom class imports the patch package,
+# which patches the original langchain_openai module as a side effect.
+from aidial_integration_langchain.langchain_openai import (
+    AzureChatOpenAI,
+    InMemoryResponseCache,
+)
+from benchmarks.utils import print_table, time_per_call
+
+_RESPONSE = {
+    "id": "chatcmpl-123",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4",
+    "choices": [
+        {
+            "index": 0,
+            "message": {"role": "assistant", "content": "answer " * 100},
+            "finish_reason": "stop",
+        }
+    ],
+    "usage": {
+        "prompt_tokens": 10,
+        "completion_tokens": 200,
+        "total_tokens": 210,
+    },
+}
+
+
+def _sse_body(tokens: int) -> bytes:
+    chunk = (
+        b'{"id":"chatcmpl-123","object":"chat.completion.chunk","created":0,'
+        b'"model":"gpt-4","choices":[{"index":0,"delta":{"content":"token "}}]}'
+    )
+    return b"".join(b"data: " + chunk + b"\n\n" for _ in range(tokens)) + (
+        b"data: [DONE]\n\n"
+    )
+
+
+def _handler(request: httpx.Request) -> httpx.Response:
+    if json.loads(request.content).get("stream"):
+        return httpx.Response(
+            200,
+            content=_sse_body(200),
+            headers={"Content-Type": "text/event-stream"},
+        )
+    return httpx.Response(200, json=_RESPONSE)
+
+
+def _create_llm(**kwargs) -> AzureChatOpenAI:
+    return AzureChatOpenAI(
+        api_key=SecretStr("dummy-key"),
+        api_version="dummy-version",
+        azure_endpoint="https://dummy-url",
+        azure_deployment="dummy-deployment",
+        http_client=httpx.Client(transport=httpx.MockTransport(_handler)),
+        raw_json_responses=True,
+        **kwargs,
+    )
+
+
+def main() -> None:
+    messages = [
+        HumanMessage(
+            content=f"question {i}",
+            additional_kwargs={"custom_content": {"state": {"turn": i}}},
+        )
+        for i in range(20)
+    ]
+    llm = _create_llm()
+    cached_llm = _create_llm(response_cache=InMemoryResponseCache())
+    cached_llm.invoke(messages)
+    list(cached_llm.stream(messages))
+
+    print_table(
+        "Repeated request: mock transport (baseline) vs response cache (measured)",
+        [
+            (
+                "invoke",
+                time_per_call(lambda: llm.invoke(messages), number=100),
+                time_per_call(lambda: cached_llm.invoke(messages), number=100),
+            ),
+            (
+                "stream, 200 chunks",
+                time_per_call(lambda: list(llm.stream(messages)), number=20),
+                time_per_call(
+                    lambda: list(cached_llm.stream(messages)), number=20
+                ),
+            ),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Accumulation of a streamed response with many chunks and attachments:
+`AIMessageChunk.__add__` compared to `StreamAccumulator`.
+
+Run with: python -m benchmarks.stream_accumulation
+"""
+
+from langchain_core.messages import AIMessageChunk
+
+from aidial_integration_langchain.langchain_openai import StreamAccumulator
+from benchmarks.utils import print_table, time_per_call
+
+
+def _chunks(count: int) -> list:
+    return [
+        AIMessageChunk(
+            content="token ",
+            additional_kwargs={
+                "custom_content": {
+                    "attachments": [
+                        {"index": idx % 10, "data": "x" * 10, "title": "t"}
+                    ]
+                }
+            },
+        )
+        for idx in range(count)
+    ]
+
+
+def _add(chunks: list) -> AIMessageChunk:
+    result = chunks[0]
+    for chunk in chunks[1:]:
+        result = result + chunk
+    return result
+
+
+def _accumulate(chunks: list) -> AIMessageChunk:
+    accumulator = StreamAccumulator()
+    accumulator.extend(chunks)
+    return accumulator.to_chunk()
+
+
+def main() -> None:
+    rows = []
+    for count in [100, 1_000, 5_000]:
+        chunks = _chunks(count)
+        rows.append(
+            (
+                f"{count} chunks",
+                time_per_call(lambda: _add(chunks), number=1),
+                time_per_call(lambda: _accumulate(chunks), number=1),
+            )
+        )
+
+    print_table(
+        "Stream accumulation: AIMessageChunk.__add__ (baseline) vs StreamAccumulator (measured)",
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
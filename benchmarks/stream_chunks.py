@@ -0,0 +1,85 @@
+"""
+Per-chunk cost of converting streamed chunks to generation chunks.
+
+The original langchain_openai conversion wrapped with the patch decorators
+is compared to the conversion of the custom class.
+
+Run with: python -m benchmarks.stream_chunks
+"""
+
+from langchain_core.messages import AIMessageChunk
+
+# NOTE: the import of the custom class imports the patch package,
+# which patches the original langchain_openai module as a side effect.
+from aidial_integration_langchain.langchain_openai.chat_models import base
+from benchmarks.utils import print_table, time_per_call
+
+
+def _chunk(delta: dict, **extra) -> dict:
+    return {
+        "id": "chatcmpl-123",
+        "model": "gpt-4",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+        **extra,
+    }
+
+
+_CASES = {
+    "content-only delta": _chunk({"content": "token"}),
+    "content-only delta (SDK dump)": _chunk(
+        {
+            "content": "token",
+            "function_call": None,
+            "refusal": None,
+            "role": None,
+            "tool_calls": None,
+        }
+    ),
+    "delta with custom_content": _chunk(
+        {"content": "token", "custom_content": {"attachments": []}}
+    ),
+    "last chunk with statistics": _chunk(
+        {"content": ""}, statistics={"a": "b"}
+    ),
+    "tool call delta": _chunk(
+        {
+            "tool_calls": [
+                {
+                    "index": 0,
+                    "id": "call_1",
+                    "function": {"name": "f", "arguments": '{"a":'},
+                }
+            ]
+        }
+    ),
+}
+
+
+def main() -> None:
+    import langchain_openai.chat_models.base as original
+
+    original_convert = original._convert_chunk_to_generation_chunk
+
+    print_table(
+        "Per-chunk conversion: patched langchain_openai (baseline) vs custom class (measured)",
+        [
+            (
+                name,
+                time_per_call(
+                    lambda: original_convert(chunk, AIMessageChunk, {}),
+                    number=20_000,
+                ),
+                time_per_call(
+                    lambda: base._convert_chunk_to_generation_chunk(
+                        chunk, AIMessageChunk, {}
+                    ),
+                    number=20_000,
+                ),
+            )
+            for name, chunk in _CASES.items()
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+A streamed response needed only up to a marker.
+
+The mock deployment streams 500 tokens 1 ms apart and the consumer
+(e.g. an agent) has what it needs once the marker at the 50th token arrives.
+The consumer ignores the rest of the stream, which is still read
+to the end (baseline), or stops the stream on the marker
+by `StreamController` with `stop_on_text` (measured),
+closing the response and releasing its connection.
+The time the connection is held for is reported.
+
+Run with: python -m benchmarks.stream_control
+"""
+
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Optional
+
+import httpx
+from pydantic import SecretStr
+
+# NOTE: the import of the custom class imports the patch package,
+# which patches the original langchain_openai module as a side effect.
+from aidial_integration_langchain.langchain_openai import (
+    AzureChatOpenAI,
+    StreamController,
+    stop_on_text,
+)
+from benchmarks.utils import print_table
+
+_TOKENS = 500
+_MARKER_TOKEN = 50
+_TOKEN_INTERVAL = 0.001
+_MARKER = "<done>"
+
+
+def _chunk(content: str) -> bytes:
+    chunk = {
+        "id": "chatcmpl-123",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": "gpt-4",
+        "choices": [{"index": 0, "delta": {"content": content}}],
+    }
+    return f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+
+
+async def _body() -> AsyncIterator[bytes]:
+    for i in range(_TOKENS):
+        await asyncio.sleep(_TOKEN_INTERVAL)
+        yield _chunk(_MARKER if i == _MARKER_TOKEN else f"token{i} ")
+    yield b"data: [DONE]\n\n"
+
+
+def _handler(_: httpx.Request) -> httpx.Response:
+    return httpx.Response(
+        200, content=_body(), headers={"Content-Type": "text/event-stream"}
+    )
+
+
+async def _stream(controller: Optional[StreamController]) -> float:
+    llm = AzureChatOpenAI(
+        api_key=SecretStr("dummy-key"),
+        api_version="dummy-version",
+        azure_endpoint="https://dummy-url",
+        azure_deployment="dummy-deployment",
+        http_async_client=httpx.AsyncClient(
+            transport=httpx.MockTransport(_handler)
+        ),
+        raw_json_responses=True,
+        stream_controller=controller,
+    )
+    done = False
+    start = time.perf_counter()
+    async for chunk in llm.astream("q"):
+        # The chunks after the marker are of no use.
+        done = done or chunk.content == _MARKER
+    end = time.perf_counter()
+    assert done
+    return (end - start) * 1e9
+
+
+def main() -> None:
+    loop = asyncio.new_event_loop()
+    baseline = loop.run_until_complete(_stream(None))
+    controller = StreamController(stop_on_text(_MARKER))
+    measured = loop.run_until_complete(_stream(controller))
+    loop.close()
+    print(f"Stream controller: {controller.snapshot()}")
+    print_table(
+        "Stream needed up to a marker: read to the end (baseline) "
+        "vs stopped on the marker (measured)",
+        [
+            (
+                f"{_TOKENS} chunks, marker at {_MARKER_TOKEN}",
+                baseline,
+                measured,
+            )
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Cost of measuring the latencies of a stream.
+
+A stream of 1000 chunks served from memory is read without the metrics
+(baseline) and measured by `InMemoryStreamMetrics` (measured).
+Without a sink the streams aren't measured at all.
+The per-chunk cost of the measurement is reported separately,
+since it's within the noise of reading the whole stream.
+
+Run with: python -m benchmarks.stream_metrics
+"""
+
+import json
+from typing import Optional
+
+import httpx
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+from pydantic import SecretStr
+
+# NOTE: the import of the custom class imports the patch package,
+# which patches the original langchain_openai module as a side effect.
+from aidial_integration_langchain.langchain_openai import (
+    AzureChatOpenAI,
+    InMemoryStreamMetrics,
+)
+from aidial_integration_langchain.langchain_openai.chat_models.stream_metrics import (
+    StreamTimer,
+)
+from benchmarks.utils import print_table, time_per_call
+
+_TOKENS = 1000
+
+
+def _chunk(content: str) -> str:
+    chunk = {
+        "id": "chatcmpl-123",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": "gpt-4",
+        "choices": [{"index": 0, "delta": {"content": content}}],
+    }
+    return f"data: {json.dumps(chunk)}\n\n"
+
+
+_BODY = (
+    "".join(_chunk(f"token{i} ") for i in range(_TOKENS)) + "data: [DONE]\n\n"
+).encode("utf-8")
+
+
+def _handler(_: httpx.Request) -> httpx.Response:
+    return httpx.Response(
+        200, content=_BODY, headers={"Content-Type": "text/event-stream"}
+    )
+
+
+def _create_llm(metrics: Optional[InMemoryStreamMetrics]) -> AzureChatOpenAI:
+    return AzureChatOpenAI(
+        api_key=SecretStr("dummy-key"),
+        api_version="dummy-version",
+        azure_endpoint="https://dummy-url",
+        azure_deployment="dummy-deployment",
+        http_client=httpx.Client(transport=httpx.MockTransport(_handler)),
+        raw_json_responses=True,
+        stream_metrics=metrics,
+    )
+
+
+def _read(llm: AzureChatOpenAI) -> None:
+    for _ in llm.stream("q"):
+        pass
+
+
+def main() -> None:
+    baseline_llm = _create_llm(None)
+    metrics = InMemoryStreamMetrics()
+    measured_llm = _create_llm(metrics)
+    timer = StreamTimer()
+    chunk = ChatGenerationChunk(message=AIMessageChunk(content="token"))
+    print_table(
+        "Stream read: not measured (baseline) vs measured (measured)",
+        [
+            (
+                f"{_TOKENS} chunks",
+                time_per_call(lambda: _read(baseline_llm), number=20),
+                time_per_call(lambda: _read(measured_llm), number=20),
+            ),
+            (
+                "per chunk",
+                time_per_call(lambda: None),
+                time_per_call(lambda: timer.on_chunk(chunk)),
+            ),
+        ],
+    )
+    print(f"Stream metrics: {metrics.snapshot()['first_token']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+A stream stalled midway, retried.
+
+The mock deployment streams 50 tokens 1 ms apart, but the first stream
+stalls after 10 tokens. The stall is detected by a generous
+global timeout of the whole stream of 2 s (baseline)
+or by the inter-token timeout of `StreamTimeouts` of 100 ms (measured),
+then the stream is retried. The time to the complete answer is reported.
+
+Run with: python -m benchmarks.stream_timeouts
+"""
+
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Optional
+
+import httpx
+from pydantic import SecretStr
+
+# NOTE: the import of the custom class imports the patch package,
+# which patches the original langchain_openai module as a side effect.
+from aidial_integration_langchain.langchain_openai import (
+    AzureChatOpenAI,
+    StreamTimeouts,
+)
+from benchmarks.utils import print_table
+
+_TOKENS = 50
+_STALL_AT = 10
+_STALL = 60.0
+_TOKEN_INTERVAL = 0.001
+_GLOBAL_TIMEOUT = 2.0
+_INTER_TOKEN_TIMEOUT = 0.1
+
+
+def _chunk(content: str) -> bytes:
+    chunk = {
+        "id": "chatcmpl-123",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": "gpt-4",
+        "choices": [{"index": 0, "delta": {"content": content}}],
+    }
+    return f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+
+
+class _Deployment:
+    def __init__(self) -> None:
+        self.requests = 0
+
+    def handler(self, _: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        return httpx.Response(
+            200,
+            content=self._body(stall=self.requests == 1),
+            headers={"Content-Type": "text/event-stream"},
+        )
+
+    async def _body(self, stall: bool) -> AsyncIterator[bytes]:
+        for i in range(_TOKENS):
+            await asyncio.sleep(
+                _STALL if stall and i == _STALL_AT else _TOKEN_INTERVAL
+            )
+            yield _chunk(f"token{i} ")
+        yield b"data: [DONE]\n\n"
+
+
+async def _read(llm: AzureChatOpenAI) -> int:
+    return len([chunk async for chunk in llm.astream("q")])
+
+
+async def _answer(timeouts: Optional[StreamTimeouts]) -> float:
+    llm = AzureChatOpenAI(
+        api_key=SecretStr("dummy-key"),
+        api_version="dummy-version",
+        azure_endpoint="https://dummy-url",
+        azure_deployment="dummy-deployment",
+        http_async_client=httpx.AsyncClient(
+            transport=httpx.MockTransport(_Deployment().handler)
+        ),
+        raw_json_responses=True,
+        stream_timeouts=timeouts,
+    )
+    start = time.perf_counter()
+    for _ in range(2):
+        try:
+            await asyncio.wait_for(_read(llm), _GLOBAL_TIMEOUT)
+        except (asyncio.TimeoutError, TimeoutError):
+            continue
+        break
+    end = time.perf_counter()
+    return (end - start) * 1e9
+
+
+def main() -> None:
+    loop = asyncio.new_event_loop()
+    baseline = loop.run_until_complete(_answer(None))
+    timeouts = StreamTimeouts(inter_token=_INTER_TOKEN_TIMEOUT)
+    measured = loop.run_until_complete(_answer(timeouts))
+    loop.close()
+    print(f"Stream timeouts: {timeouts.snapshot()}")
+    print_table(
+        "Stream stalled midway and retried: global timeout (baseline) "
+        "vs inter-token timeout (measured)",
+        [(f"{_TOKENS} chunks, stall at {_STALL_AT}", baseline, measured)],
+    )
+
+
+if __name__ == "__main__":
+    main()
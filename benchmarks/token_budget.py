@@ -0,0 +1,150 @@
+"""
+A batch sent to a deployment with a token-per-minute limit.
+
+`abatch` relying on the 429 responses and the retries of the openai SDK
+(baseline) is compared to `abatch` with `TokenBudget`, which waits locally
+for the tokens. The mock deployment counts the tokens of the responses
+in a token bucket of 120K tokens per minute and rejects the requests
+once it's exhausted, reporting the remaining tokens in the headers.
+The batch exceeds the limit by a few seconds worth of tokens.
+The mock deployment tells the exact retry delay, so the time is close
+and the difference is in the rejected requests.
+
+Run with: python -m benchmarks.token_budget
+"""
+
+import asyncio
+import time
+from typing import List
+
+import httpx
+from langchain_core.language_models import LanguageModelInput
+from pydantic import SecretStr
+
+# NOTE: the import of the custom class imports the patch package,
+# which patches the original langchain_openai module as a side effect.
+from aidial_integration_langchain.langchain_openai import (
+    AzureChatOpenAI,
+    TokenBudget,
+)
+from benchmarks.utils import print_table, time_per_call
+
+_TOKENS_PER_MINUTE = 120_000
+_PROMPT = "word " * 320
+_MAX_TOKENS = 100
+_USAGE = {"prompt_tokens": 400, "completion_tokens": 50, "total_tokens": 450}
+_BATCH_SIZE = 280
+
+_RESPONSE = {
+    "id": "chatcmpl-123",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4",
+    "choices": [
+        {
+            "index": 0,
+            "message": {"role": "assistant", "content": "answer"},
+            "finish_reason": "stop",
+        }
+    ],
+    "usage": _USAGE,
+}
+
+
+class _Deployment:
+    def __init__(self) -> None:
+        self.tokens = float(_TOKENS_PER_MINUTE)
+        self.updated = time.monotonic()
+        self.rejected = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            _TOKENS_PER_MINUTE,
+            self.tokens + (now - self.updated) * _TOKENS_PER_MINUTE / 60,
+        )
+        self.updated = now
+
+    async def handler(self, _: httpx.Request) -> httpx.Response:
+        self._refill()
+        if self.tokens < _USAGE["total_tokens"]:
+            self.rejected += 1
+            wait = (
+                (_USAGE["total_tokens"] - self.tokens) * 60 / _TOKENS_PER_MINUTE
+            )
+            return httpx.Response(
+                429,
+                json={"error": {"message": "Token rate limit exceeded"}},
+                headers={
+                    "retry-after-ms": str(int(wait * 1000) + 1),
+                    "x-ratelimit-remaining-tokens": str(int(self.tokens)),
+                },
+            )
+        self.tokens -= _USAGE["total_tokens"]
+        await asyncio.sleep(0.01)
+        return httpx.Response(
+            200,
+            json=_RESPONSE,
+            headers={"x-ratelimit-remaining-tokens": str(int(self.tokens))},
+        )
+
+
+def _create_llm(deployment: _Deployment, **kwargs) -> AzureChatOpenAI:
+    return AzureChatOpenAI(
+        api_key=SecretStr("dummy-key"),
+        api_version="dummy-version",
+        azure_endpoint="https://dummy-url",
+        azure_deployment="dummy-deployment",
+        http_async_client=httpx.AsyncClient(
+            transport=httpx.MockTransport(deployment.handler)
+        ),
+        raw_json_responses=True,
+        max_tokens=_MAX_TOKENS,
+        max_retries=100,
+        **kwargs,
+    )
+
+
+def main() -> None:
+    loop = asyncio.new_event_loop()
+    prompts: List[LanguageModelInput] = [_PROMPT] * _BATCH_SIZE
+    rejected = {}
+
+    def _batch(name: str, budgeted: bool):
+        def _run():
+            # Every run starts with the full token buckets.
+            deployment = _Deployment()
+            llm = _create_llm(
+                deployment,
+                token_budget=(
+                    TokenBudget(tokens_per_minute=_TOKENS_PER_MINUTE)
+                    if budgeted
+                    else None
+                ),
+            )
+            loop.run_until_complete(llm.abatch(prompts))
+            rejected[name] = deployment.rejected
+
+        return _run
+
+    print_table(
+        "Batch to a deployment with 120K TPM: SDK retries (baseline) "
+        "vs TokenBudget (measured)",
+        [
+            (
+                f"{_BATCH_SIZE} requests",
+                time_per_call(_batch("baseline", False), number=1),
+                time_per_call(_batch("measured", True), number=1),
+            )
+        ],
+    )
+    print(
+        f"429 responses per batch: {rejected['baseline']} (baseline), "
+        f"{rejected['measured']} (measured)"
+    )
+    print()
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import timeit
+from typing import Callable, List, Tuple
+
+
+def time_per_call(func: Callable[[], object], number: int = 100_000) -> float:
+    """Returns the best observed time of a single call in nanoseconds."""
+    timer = timeit.Timer(func)
+    best = min(timer.repeat(repeat=5, number=number))
+    return best / number * 1e9
+
+
+def print_table(title: str, rows: List[Tuple[str, float, float]]) -> None:
+    """Prints (name, baseline ns, measured ns) rows."""
+    print(title)
+    print(
+        f"{'case':<40}{'baseline, ns':>14}{'measured, ns':>14}{'delta, ns':>12}"
+    )
+    for name, baseline, measured in rows:
+        print(
+            f"{name:<40}{baseline:>14.0f}{measured:>14.0f}{measured - baseline:>12.0f}"
+        )
+    print()
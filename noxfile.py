@@ -87,7 +87,9 @@ def test_custom_class(session: nox.Session, langchain_openai: str) -> None:
     """Runs tests for the patch"""
     session.run("poetry", "install", external=True)
     session.install(f"langchain_openai=={langchain_openai}")
-    session.run("pytest", "tests/test_langchain_custom_class.py")
+    session.run(
+        "pytest", "tests/test_langchain_custom_class.py", "tests/custom_class"
+    )
 
 
 @nox.session(python=supported_python_versions)
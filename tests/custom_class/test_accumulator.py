@@ -0,0 +1,114 @@
+import functools
+
+import pytest
+
+from tests.mock import chat_completion_chunks, create_azure_chat, sse_response
+from tests.utils import with_custom_class
+
+_CUSTOM_CONTENT_DELTAS = [
+    {"attachments": [{"index": 0, "title": "Doc", "url": "files/a"}]},
+    {"stages": [{"index": 0, "name": "Search", "content": ""}]},
+    {"stages": [{"index": 0, "content": "Found "}]},
+    {"stages": [{"index": 0, "content": "3 documents", "status": "completed"}]},
+    {"attachments": [{"index": 1, "type": "text/plain", "data": "a"}]},
+    {"attachments": [{"index": 1, "data": "bc"}]},
+    {"state": {"step": 1}},
+]
+
+
+def _chunks():
+    from langchain_core.messages import AIMessageChunk
+    from langchain_core.messages.tool import tool_call_chunk
+
+    chunks = [
+        AIMessageChunk(
+            content=f"token{idx} ",
+            id="run-1",
+            additional_kwargs={"custom_content": delta},
+        )
+        for idx, delta in enumerate(_CUSTOM_CONTENT_DELTAS)
+    ]
+    chunks += [
+        AIMessageChunk(
+            content="",
+            tool_call_chunks=[
+                tool_call_chunk(name="f", args='{"a"', id="call_1", index=0)
+            ],
+        ),
+        AIMessageChunk(
+            content="",
+            tool_call_chunks=[
+                tool_call_chunk(name=None, args=": 1}", id=None, index=0)
+            ],
+        ),
+        AIMessageChunk(
+            content="",
+            response_metadata={"finish_reason": "stop"},
+            usage_metadata={
+                "input_tokens": 1,
+                "output_tokens": 2,
+                "total_tokens": 3,
+            },
+        ),
+    ]
+    return chunks
+
+
+def test_accumulator_matches_chunk_addition():
+    with with_custom_class() as lc:
+        chunks = _chunks()
+        accumulator = lc.StreamAccumulator()
+        accumulator.extend(chunks)
+
+        expected = functools.reduce(lambda left, right: left + right, chunks)
+        assert len(accumulator) == len(chunks)
+        assert accumulator.to_chunk() == expected
+
+        message = accumulator.to_message()
+        assert message.additional_kwargs["custom_content"] == {
+            "attachments": [
+                {"index": 0, "title": "Doc", "url": "files/a"},
+                {"index": 1, "type": "text/plain", "data": "abc"},
+            ],
+            "stages": [
+                {
+                    "index": 0,
+                    "name": "Search",
+                    "content": "Found 3 documents",
+                    "status": "completed",
+                }
+            ],
+            "state": {"step": 1},
+        }
+        assert message.tool_calls == [
+            {"name": "f", "args": {"a": 1}, "id": "call_1", "type": "tool_call"}
+        ]
+
+
+def test_accumulator_does_not_mutate_chunks():
+    with with_custom_class() as lc:
+        chunks = _chunks()
+        snapshot = [chunk.model_copy(deep=True) for chunk in chunks]
+
+        accumulator = lc.StreamAccumulator()
+        accumulator.extend(chunks)
+        accumulator.to_message()
+
+        assert chunks == snapshot
+
+
+@pytest.mark.asyncio
+async def test_accumulator_with_astream():
+    chunks = chat_completion_chunks(["Hello", ", ", "world"])
+    chunks[-1]["statistics"] = {"a": "b"}
+
+    with with_custom_class() as lc:
+        chat, _ = create_azure_chat(lc, lambda _: sse_response(chunks))
+        accumulator = lc.StreamAccumulator()
+        async for chunk in chat.astream("question"):
+            accumulator.add(chunk)
+        message = accumulator.to_message()
+
+    assert message.content == "Hello, world"
+    assert message.response_metadata["statistics"] == {"a": "b"}
+    assert message.response_metadata["finish_reason"] == "stop"
@@ -0,0 +1,175 @@
+import asyncio
+import uuid
+
+import httpx
+import pytest
+from langchain_core.callbacks import (
+    AsyncCallbackHandler,
+    AsyncCallbackManagerForLLMRun,
+)
+
+from tests.mock import (
+    chat_completion_chunks,
+    create_azure_chat_with,
+    sse_body,
+    sse_response,
+)
+from tests.utils import with_custom_class
+
+_TOKENS = [f"t{i} " for i in range(10)]
+
+
+@pytest.fixture(scope="module")
+def lc():
+    with with_custom_class() as module:
+        yield module
+
+
+class SlowHandler(AsyncCallbackHandler):
+    """Records the token events, taking its time on each one."""
+
+    def __init__(self, delay=0.01, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.raise_error = fail
+        self.tokens = []
+        self.events = []
+
+    async def on_llm_new_token(self, token, **kwargs):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ValueError("handler failed")
+        self.tokens.append(token)
+        self.events.append("token")
+
+    async def on_llm_end(self, response, **kwargs):
+        self.events.append("end")
+
+    async def on_llm_error(self, error, **kwargs):
+        self.events.append("error")
+
+
+# The models stream: the run manager is passed to `_astream` by `_agenerate`.
+def _handler(request):
+    return sse_response(chat_completion_chunks(_TOKENS))
+
+
+@pytest.mark.asyncio
+async def test_tokens_delivered_in_order_before_end(lc):
+    chat, dispatch, _ = create_azure_chat_with(
+        lc, _handler, "callback_dispatch", lc.CallbackDispatch(), streaming=True
+    )
+    handler = SlowHandler()
+
+    response = await chat.ainvoke("q", config={"callbacks": [handler]})
+
+    assert response.content == "".join(_TOKENS)
+    assert handler.tokens == _TOKENS
+    assert handler.events == ["token"] * len(_TOKENS) + ["end"]
+    assert dispatch.snapshot() == {"events": len(_TOKENS), "coalesced": 0}
+
+
+@pytest.mark.asyncio
+async def test_reads_dont_wait_for_callbacks(lc):
+    handler = SlowHandler(delay=0.05)
+    progress = []
+
+    async def _body():
+        for chunk in chat_completion_chunks(_TOKENS):
+            progress.append(len(handler.tokens))
+            yield sse_body([chunk])[: -len(b"data: [DONE]\n\n")]
+        yield b"data: [DONE]\n\n"
+
+    chat, _, _ = create_azure_chat_with(
+        lc,
+        lambda request: httpx.Response(
+            200,
+            content=_body(),
+            headers={"Content-Type": "text/event-stream"},
+        ),
+        "callback_dispatch",
+        lc.CallbackDispatch(),
+        streaming=True,
+    )
+
+    await chat.ainvoke("q", config={"callbacks": [handler]})
+
+    # The whole stream is read while the first callback is in progress.
+    assert progress == [0] * len(_TOKENS)
+    assert handler.tokens == _TOKENS
+
+
+@pytest.mark.asyncio
+async def test_tokens_coalesced_under_load(lc):
+    chat, dispatch, _ = create_azure_chat_with(
+        lc,
+        _handler,
+        "callback_dispatch",
+        lc.CallbackDispatch(max_pending=1),
+        streaming=True,
+    )
+    handler = SlowHandler()
+
+    response = await chat.ainvoke("q", config={"callbacks": [handler]})
+
+    assert "".join(handler.tokens) == response.content == "".join(_TOKENS)
+    assert len(handler.tokens) < len(_TOKENS)
+    assert dispatch.coalesced == len(_TOKENS) - len(handler.tokens)
+
+
+@pytest.mark.asyncio
+async def test_tokens_flushed_when_closed_early(lc):
+    from langchain_core.messages import HumanMessage
+
+    chat, _, _ = create_azure_chat_with(
+        lc, _handler, "callback_dispatch", lc.CallbackDispatch(), streaming=True
+    )
+    handler = SlowHandler()
+    run_manager = _run_manager(handler)
+
+    stream = chat._astream([HumanMessage("q")], run_manager=run_manager)
+    async for _ in stream:
+        break
+    await stream.aclose()
+
+    assert handler.tokens == _TOKENS[:1]
+
+
+@pytest.mark.asyncio
+async def test_tokens_flushed_before_error(lc):
+    def handler(request):
+        return httpx.Response(
+            200,
+            # The stream breaks off after the first token
+            content=sse_body(chat_completion_chunks(_TOKENS)[:1])[
+                : -len(b"data: [DONE]\n\n")
+            ]
+            + b'data: {"error": {"message": "broken"}}\n\n',
+            headers={"Content-Type": "text/event-stream"},
+        )
+
+    chat, _, _ = create_azure_chat_with(
+        lc, handler, "callback_dispatch", lc.CallbackDispatch(), streaming=True
+    )
+    callbacks = SlowHandler()
+
+    with pytest.raises(Exception):
+        await chat.ainvoke("q", config={"callbacks": [callbacks]})
+
+    assert callbacks.events == ["token", "error"]
+
+
+@pytest.mark.asyncio
+async def test_callback_error_raised(lc):
+    chat, _, _ = create_azure_chat_with(
+        lc, _handler, "callback_dispatch", lc.CallbackDispatch(), streaming=True
+    )
+
+    with pytest.raises(ValueError, match="handler failed"):
+        await chat.ainvoke("q", config={"callbacks": [SlowHandler(fail=True)]})
+
+
+def _run_manager(handler):
+    return AsyncCallbackManagerForLLMRun(
+        run_id=uuid.uuid4(), handlers=[handler], inheritable_handlers=[]
+    )
@@ -0,0 +1,268 @@
+import asyncio
+import time
+from contextlib import ExitStack
+
+import httpx
+import openai
+import pytest
+
+from tests.mock import (
+    chat_completion,
+    chat_completion_chunks,
+    create_azure_chat,
+    create_azure_chat_with,
+    json_response,
+    request_json,
+    sse_response,
+)
+from tests.utils import with_custom_class
+
+
+@pytest.fixture(scope="module")
+def lc():
+    with with_custom_class() as module:
+        yield module
+
+
+class Upstream:
+    """Mock deployment failing on demand."""
+
+    def __init__(self, content="answer", status_code=500):
+        self.content = content
+        self.status_code = status_code
+        self.failing = False
+
+    def handler(self, request):
+        if self.failing:
+            return httpx.Response(
+                self.status_code,
+                json={"error": {"message": "down"}},
+                # Retried without waiting
+                headers={"retry-after-ms": "1"},
+            )
+        if request_json(request).get("stream"):
+            return sse_response(chat_completion_chunks([self.content]))
+        return json_response(chat_completion(self.content))
+
+
+def _state(breaker):
+    (state,) = breaker.snapshot().values()
+    return state["state"]
+
+
+def test_open_circuit_fails_fast(lc):
+    upstream = Upstream()
+    upstream.failing = True
+    chat, breaker, transport = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "circuit_breaker",
+        lc.CircuitBreaker(window=4, min_calls=2, open_time=0.05),
+    )
+
+    for _ in range(2):
+        with pytest.raises(Exception) as e:
+            chat.invoke("q")
+        assert not isinstance(e.value, lc.CircuitOpenError)
+    assert _state(breaker) == "open"
+
+    with pytest.raises(lc.CircuitOpenError):
+        chat.invoke("q")
+    with pytest.raises(lc.CircuitOpenError):
+        list(chat.stream("q"))
+    assert len(transport.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_stops_retries(lc):
+    upstream = Upstream()
+    upstream.failing = True
+    chat, breaker, transport = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "circuit_breaker",
+        lc.CircuitBreaker(window=4, min_calls=2, open_time=0.05),
+    )
+    chat = chat.with_options(max_retries=5)
+
+    with pytest.raises(lc.CircuitOpenError):
+        await chat.ainvoke("q")
+    # The failed attempts open the circuit.
+    assert len(transport.requests) == 2
+    assert _state(breaker) == "open"
+
+
+@pytest.mark.asyncio
+async def test_half_open_trial(lc):
+    upstream = Upstream()
+    upstream.failing = True
+    chat, breaker, transport = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "circuit_breaker",
+        lc.CircuitBreaker(window=4, min_calls=2, open_time=0.05),
+    )
+    for _ in range(2):
+        with pytest.raises(Exception):
+            await chat.ainvoke("q")
+
+    await asyncio.sleep(0.06)
+    assert _state(breaker) == "half_open"
+    with pytest.raises(Exception):
+        await chat.ainvoke("q")
+    assert _state(breaker) == "open"
+
+    upstream.failing = False
+    await asyncio.sleep(0.06)
+    assert (await chat.ainvoke("q")).content == "answer"
+    assert _state(breaker) == "closed"
+    assert len(transport.requests) == 4
+
+
+def test_client_errors_not_counted(lc):
+    upstream = Upstream(status_code=400)
+    upstream.failing = True
+    chat, breaker, transport = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "circuit_breaker",
+        lc.CircuitBreaker(window=4, min_calls=2, open_time=0.05),
+    )
+
+    for _ in range(4):
+        with pytest.raises(Exception):
+            chat.invoke("q")
+
+    assert _state(breaker) == "closed"
+    assert len(transport.requests) == 4
+
+
+def test_retried_client_errors_not_counted(lc):
+    upstream = Upstream(status_code=408)
+    upstream.failing = True
+    chat, breaker, transport = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "circuit_breaker",
+        lc.CircuitBreaker(window=4, min_calls=2, open_time=0.05),
+    )
+    chat = chat.with_options(max_retries=2)
+
+    for _ in range(2):
+        with pytest.raises(Exception):
+            chat.invoke("q")
+
+    assert _state(breaker) == "closed"
+    assert len(transport.requests) == 6
+
+
+def test_trial_given_back_when_stopped(lc):
+    circuit = lc.Circuit(window=2, min_calls=2, open_time=0.01)
+    with pytest.raises(lc.CircuitOpenError):
+        with circuit.call() as call:
+            circuit.on_retry(call, httpx.Response(408))
+            circuit.on_retry(call, None)
+            assert circuit.state == "closed"
+            circuit.on_retry(call, httpx.Response(500))
+
+    time.sleep(0.02)
+    assert circuit.state == "half_open"
+    with pytest.raises(lc.CircuitOpenError):
+        with circuit.call():
+            # E.g. stopped retrying by another circuit
+            raise lc.CircuitOpenError("other")
+    with circuit.call():
+        pass
+    assert circuit.state == "closed"
+
+
+def test_stale_call_not_counted_as_trial(lc):
+    circuit = lc.Circuit(window=2, min_calls=2, open_time=0.01)
+    error = openai.APIConnectionError(request=httpx.Request("POST", "/"))
+    with ExitStack() as stale:
+        # Let in while the circuit is closed
+        stale.enter_context(circuit.call())
+        for _ in range(2):
+            with pytest.raises(openai.APIConnectionError):
+                with circuit.call():
+                    raise error
+        time.sleep(0.02)
+        assert circuit.state == "half_open"
+
+    assert circuit.state == "half_open"
+    with circuit.call():
+        pass
+    assert circuit.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_slow_calls_open_circuit(lc):
+    async def handler(request):
+        await asyncio.sleep(0.02)
+        return json_response(chat_completion())
+
+    breaker = lc.CircuitBreaker(window=4, min_calls=2, slow_call_duration=0.01)
+    chat, _ = create_azure_chat(lc, handler, circuit_breaker=breaker)
+
+    for _ in range(2):
+        await chat.ainvoke("q")
+
+    assert _state(breaker) == "open"
+    assert breaker.snapshot() == {
+        ("https://dummy-url", "dummy-deployment", "dummy-version"): {
+            "state": "open",
+            "calls": 2,
+            "failure_rate": 0.0,
+            "slow_call_rate": 1.0,
+        }
+    }
+
+
+@pytest.mark.asyncio
+async def test_fallback_on_open_circuit(lc):
+    upstream = Upstream()
+    upstream.failing = True
+    fallback, fallback_transport = create_azure_chat(
+        lc, Upstream(content="fallback").handler
+    )
+    # Stays open while the fallback client is created
+    chat, breaker, transport = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "circuit_breaker",
+        lc.CircuitBreaker(window=4, min_calls=2, open_time=10),
+    )
+    chat = chat.with_options(fallback_llm=fallback)
+    for _ in range(2):
+        with pytest.raises(Exception):
+            chat.invoke("q")
+    assert _state(breaker) == "open"
+
+    assert chat.invoke("q").content == "fallback"
+    assert (await chat.ainvoke("q")).content == "fallback"
+    assert [chunk.content for chunk in chat.stream("q")] == ["fallback"]
+    assert [chunk.content async for chunk in chat.astream("q")] == ["fallback"]
+    assert len(transport.requests) == 2
+    assert len(fallback_transport.requests) == 4
+
+
+def test_circuit_per_deployment(lc):
+    upstream = Upstream()
+    upstream.failing = True
+    chat, breaker, _ = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "circuit_breaker",
+        lc.CircuitBreaker(window=4, min_calls=2, open_time=0.05),
+    )
+    for _ in range(2):
+        with pytest.raises(Exception):
+            chat.invoke("q")
+
+    upstream.failing = False
+    other = chat.with_options(deployment_name="other-deployment")
+    assert other.invoke("q").content == "answer"
+    assert sorted(state["state"] for state in breaker.snapshot().values()) == [
+        "closed",
+        "open",
+    ]
@@ -0,0 +1,226 @@
+import asyncio
+import gc
+import json
+
+import pytest
+
+from tests.utils import with_custom_class
+
+
+@pytest.fixture(scope="module")
+def lc():
+    with with_custom_class() as module:
+        yield module
+
+
+def _create_chat(lc, registry, **kwargs):
+    kwargs = {
+        "api_key": "dummy-key",
+        "api_version": "dummy-version",
+        "azure_endpoint": "https://dummy-url",
+        "azure_deployment": "dummy-deployment",
+        "client_registry": registry,
+        **kwargs,
+    }
+    return lc.AzureChatOpenAI(**kwargs)
+
+
+def test_same_params_share_clients(lc):
+    registry = lc.ClientRegistry()
+    chat1 = _create_chat(lc, registry, temperature=0.1)
+    chat2 = _create_chat(lc, registry, temperature=0.9)
+
+    assert chat1.root_client is chat2.root_client
+    assert chat1.root_async_client is chat2.root_async_client
+    # sync and async clients with their pools
+    assert len(registry) == 4
+
+
+def test_different_credentials_share_pool(lc):
+    registry = lc.ClientRegistry()
+    chat1 = _create_chat(lc, registry, api_key="key-1")
+    chat2 = _create_chat(lc, registry, api_key="key-2")
+
+    assert chat1.root_client is not chat2.root_client
+    assert chat1.root_client._client is chat2.root_client._client
+
+
+def test_different_endpoints_dont_share_pool(lc):
+    registry = lc.ClientRegistry()
+    chat1 = _create_chat(lc, registry, azure_endpoint="https://url-1")
+    chat2 = _create_chat(lc, registry, azure_endpoint="https://url-2")
+
+    assert chat1.root_client._client is not chat2.root_client._client
+
+
+def test_pool_limits(lc):
+    registry = lc.ClientRegistry()
+    chat1 = _create_chat(lc, registry, max_connections=7, keepalive_expiry=3)
+    chat2 = _create_chat(lc, registry)
+
+    pool = chat1.root_client._client._transport._pool
+    assert pool._max_connections == 7
+    assert pool._keepalive_expiry == 3
+    assert chat1.root_client._client is not chat2.root_client._client
+
+
+def test_released_on_garbage_collection(lc):
+    registry = lc.ClientRegistry()
+    chat1 = _create_chat(lc, registry)
+    chat2 = _create_chat(lc, registry)
+    client = chat1.root_client
+    assert chat2.root_client is client
+    client_key = next(k for k in registry._entries if k[0] == "client")
+    assert registry.refs(client_key) == 2
+
+    del chat1
+    gc.collect()
+    assert registry.refs(client_key) == 1
+
+    del chat2
+    gc.collect()
+    assert registry.refs(client_key) == 0
+
+    # the unused clients are kept for the instances created later
+    assert _create_chat(lc, registry).root_client is client
+    gc.collect()
+
+    assert registry.prune() == 2
+    assert len(registry) == 0
+
+
+def test_custom_http_client_not_shared(lc):
+    import httpx
+
+    registry = lc.ClientRegistry()
+    http_client = httpx.Client()
+    chat = _create_chat(lc, registry, http_client=http_client)
+
+    assert chat.root_client._client is http_client
+    assert chat.root_async_client is not None
+    # only the async client and its pool are shared
+    assert len(registry) == 2
+
+
+def test_sharing_disabled(lc):
+    registry = lc.ClientRegistry()
+    chat1 = _create_chat(lc, registry, share_connection_pool=False)
+    chat2 = _create_chat(lc, registry, share_connection_pool=False)
+
+    assert chat1.root_client is not chat2.root_client
+    assert len(registry) == 0
+
+
+def test_shared_by_default(lc):
+    chat1 = lc.AzureChatOpenAI(
+        api_key="dummy-key",
+        api_version="dummy-version",
+        azure_endpoint="https://dummy-url",
+        azure_deployment="dummy-deployment",
+    )
+    chat2 = chat1.with_options(api_key="other-key")
+
+    # The different credentials share the pool of the endpoint.
+    assert chat1.root_client is not chat2.root_client
+    assert chat1.root_client._client is chat2.root_client._client
+
+
+def test_pool_options_not_serialized(lc):
+    from langchain_core.load import dumps
+
+    chat = _create_chat(lc, None, max_connections=7, keepalive_expiry=3)
+
+    kwargs = json.loads(dumps(chat))["kwargs"]
+    assert "share_connection_pool" not in kwargs
+    assert "max_connections" not in kwargs
+    assert "keepalive_expiry" not in kwargs
+
+
+def test_dropped_once_event_loop_closed(lc):
+    registry = lc.ClientRegistry()
+    chats = []
+
+    async def _get_pool():
+        chats.append(_create_chat(lc, registry))
+        return chats[-1].root_async_client._client
+
+    loop = asyncio.new_event_loop()
+    pool = loop.run_until_complete(_get_pool())
+    assert loop.run_until_complete(_get_pool()) is pool
+    loop.close()
+    other_loop = asyncio.new_event_loop()
+    other_pool = other_loop.run_until_complete(_get_pool())
+    other_loop.close()
+
+    assert other_pool is not pool
+    # the clients of the first loop are dropped on the next acquisition
+    assert len(registry) == 2
+    # the clients still referenced are dropped as well
+    assert registry.prune() == 2
+    assert len(registry) == 0
+
+
+def test_close(lc):
+    registry = lc.ClientRegistry()
+    chat = _create_chat(lc, registry)
+    pool = chat.root_client._client
+    async_pool = chat.root_async_client._client
+
+    asyncio.run(registry.aclose())
+
+    assert len(registry) == 0
+    assert pool.is_closed
+    assert async_pool.is_closed
+
+
+def test_clients_created_lazily(lc):
+    registry = lc.ClientRegistry()
+    chat = _create_chat(lc, registry)
+    assert len(registry) == 0
+    assert "client" not in chat.__dict__
+
+    client = chat.client
+    assert chat.__dict__["client"] is client
+    assert client._client is chat.root_client
+    assert "async_client" not in chat.__dict__
+    assert len(registry) == 2
+
+
+def test_explicit_client_kept(lc):
+    client = object()
+    chat = _create_chat(lc, lc.ClientRegistry(), client=client)
+
+    assert chat.client is client
+    assert chat.root_client is None
+
+
+def test_lazy_creation_thread_safe(lc, monkeypatch):
+    import threading
+
+    from openai import AzureOpenAI
+
+    created = []
+    init = AzureOpenAI.__init__
+
+    def _init(self, *args, **kwargs):
+        created.append(self)
+        init(self, *args, **kwargs)
+
+    monkeypatch.setattr(AzureOpenAI, "__init__", _init)
+
+    chat = _create_chat(lc, lc.ClientRegistry(), share_connection_pool=False)
+    barrier = threading.Barrier(8)
+    clients = []
+
+    def _get_client():
+        barrier.wait()
+        clients.append(chat.client)
+
+    threads = [threading.Thread(target=_get_client) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(created) == 1
+    assert all(client is clients[0] for client in clients)
@@ -0,0 +1,318 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+
+from tests.mock import (
+    chat_completion,
+    chat_completion_chunks,
+    create_azure_chat,
+    create_azure_chat_with,
+    json_response,
+)
+from tests.utils import wait_until, with_custom_class
+
+
+@pytest.fixture(scope="module")
+def lc():
+    with with_custom_class() as module:
+        yield module
+
+
+class GatedStream:
+    """Streamed response sending the next chunk once it's released."""
+
+    def __init__(self, tokens):
+        self.chunks = chat_completion_chunks(tokens)
+        self.released = asyncio.Semaphore(0)
+        self.closed = False
+
+    def release(self, count=1):
+        for _ in range(count):
+            self.released.release()
+
+    async def _body(self):
+        try:
+            for chunk in self.chunks:
+                await self.released.acquire()
+                yield f"data: {json.dumps(chunk)}\n\n".encode()
+            yield b"data: [DONE]\n\n"
+        finally:
+            self.closed = True
+
+    def response(self, _):
+        return httpx.Response(
+            200,
+            content=self._body(),
+            headers={"Content-Type": "text/event-stream"},
+        )
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_request(lc):
+    released = asyncio.Event()
+
+    async def handler(_):
+        await released.wait()
+        return json_response(chat_completion())
+
+    chat, coalescer, transport = create_azure_chat_with(
+        lc, handler, "request_coalescer", lc.RequestCoalescer()
+    )
+    tasks = [asyncio.ensure_future(chat.ainvoke("question")) for _ in range(5)]
+    await wait_until(lambda: coalescer.coalesced == 4)
+    released.set()
+    messages = await asyncio.gather(*tasks)
+
+    assert len(transport.requests) == 1
+    assert coalescer.requests == 1
+    assert [m.content for m in messages] == ["answer"] * 5
+    assert len({id(m.response_metadata) for m in messages}) == 5
+    assert len(coalescer) == 0
+
+    await chat.ainvoke("question")
+    assert len(transport.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_different_requests_not_shared(lc):
+    async def handler(_):
+        await asyncio.sleep(0.01)
+        return json_response(chat_completion())
+
+    chat, _, transport = create_azure_chat_with(
+        lc, handler, "request_coalescer", lc.RequestCoalescer()
+    )
+    await asyncio.gather(chat.ainvoke("a"), chat.ainvoke("b"))
+
+    assert len(transport.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_different_callers_not_shared(lc):
+    async def handler(_):
+        await asyncio.sleep(0.01)
+        return json_response(chat_completion())
+
+    chat, _, transport = create_azure_chat_with(
+        lc, handler, "request_coalescer", lc.RequestCoalescer()
+    )
+    other = chat.with_options(api_key="other-key")
+    await asyncio.gather(chat.ainvoke("a"), other.ainvoke("a"))
+
+    assert len(transport.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_callers_receive_own_copies(lc):
+    coalescer = lc.RequestCoalescer()
+    response = {"choices": [{"message": {"tool_calls": [{"id": "1"}]}}]}
+
+    async def send():
+        await asyncio.sleep(0.01)
+        return response
+
+    @asynccontextmanager
+    async def open_stream():
+        yield _aiter([{"delta": {"custom_content": {"state": 1}}}]), {}
+
+    async def read():
+        async with coalescer.stream("key", open_stream) as (chunks, _):
+            return [chunk async for chunk in chunks]
+
+    results = await asyncio.gather(
+        *(coalescer.run("key", send) for _ in range(3))
+    )
+    results[0]["choices"][0]["message"]["tool_calls"].append({"id": "2"})
+    streams = await asyncio.gather(read(), read())
+    streams[0][0]["delta"]["custom_content"]["state"] = 2
+
+    assert coalescer.requests == 2
+    assert results[1] == results[2] == response
+    assert results[0] is not results[1]
+    assert streams[1] == [{"delta": {"custom_content": {"state": 1}}}]
+
+
+@pytest.mark.asyncio
+async def test_stream_beyond_replay_limit_not_joined(lc):
+    stream = GatedStream(["a", "b", "c"])
+    chat, transport = create_azure_chat(
+        lc,
+        stream.response,
+        request_coalescer=lc.RequestCoalescer(replay_limit=1),
+    )
+
+    first = chat.astream("question")
+    stream.release(2)
+    assert (await first.__anext__()).content == "a"
+    assert (await first.__anext__()).content == "b"
+    second = chat.astream("question")
+    stream.release(4)
+
+    assert [chunk.content async for chunk in second] == ["a", "b", "c"]
+    assert [chunk.content async for chunk in first] == ["c"]
+    assert len(transport.requests) == 2
+    assert chat.request_coalescer.coalesced == 0
+
+
+@pytest.mark.asyncio
+async def test_error_propagated_to_all_callers(lc):
+    released = asyncio.Event()
+
+    async def handler(_):
+        await released.wait()
+        return httpx.Response(400, json={"error": {"message": "bad"}})
+
+    chat, coalescer, transport = create_azure_chat_with(
+        lc, handler, "request_coalescer", lc.RequestCoalescer()
+    )
+    tasks = [asyncio.ensure_future(chat.ainvoke("question")) for _ in range(3)]
+    await wait_until(lambda: coalescer.coalesced == 2)
+    released.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert len(transport.requests) == 1
+    assert all(isinstance(r, Exception) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_leaves_request(lc):
+    released = asyncio.Event()
+
+    async def handler(_):
+        await released.wait()
+        return json_response(chat_completion())
+
+    chat, coalescer, transport = create_azure_chat_with(
+        lc, handler, "request_coalescer", lc.RequestCoalescer()
+    )
+    first = asyncio.ensure_future(chat.ainvoke("question"))
+    second = asyncio.ensure_future(chat.ainvoke("question"))
+    await wait_until(lambda: coalescer.coalesced == 1)
+    first.cancel()
+    await asyncio.gather(first, return_exceptions=True)
+    released.set()
+
+    assert (await second).content == "answer"
+    assert first.cancelled()
+    assert len(transport.requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_request_cancelled_once_all_callers_left(lc):
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def handler(_) -> httpx.Response:
+        started.set()
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        raise AssertionError("Never released")
+
+    chat, coalescer, _ = create_azure_chat_with(
+        lc, handler, "request_coalescer", lc.RequestCoalescer()
+    )
+    tasks = [asyncio.ensure_future(chat.ainvoke("question")) for _ in range(2)]
+    await started.wait()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    await asyncio.wait_for(cancelled.wait(), 1)
+    assert len(coalescer) == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_fan_out_with_replay(lc):
+    stream = GatedStream(["a", "b", "c"])
+    chat, coalescer, transport = create_azure_chat_with(
+        lc, stream.response, "request_coalescer", lc.RequestCoalescer()
+    )
+
+    first = chat.astream("question")
+    stream.release()
+    assert (await first.__anext__()).content == "a"
+
+    async def _read_late():
+        return [chunk.content async for chunk in chat.astream("question")]
+
+    late = asyncio.ensure_future(_read_late())
+    await wait_until(lambda: coalescer.coalesced == 1)
+    stream.release(2)
+    rest = [chunk.content async for chunk in first]
+
+    assert rest == ["b", "c"]
+    assert await late == ["a", "b", "c"]
+    assert len(transport.requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_continues_when_subscriber_leaves(lc):
+    stream = GatedStream(["a", "b", "c"])
+    chat, _, _ = create_azure_chat_with(
+        lc, stream.response, "request_coalescer", lc.RequestCoalescer()
+    )
+
+    first = chat.astream("question")
+    second = chat.astream("question")
+    stream.release()
+    assert (await first.__anext__()).content == "a"
+    assert (await second.__anext__()).content == "a"
+    await first.aclose()
+    stream.release(2)
+
+    assert [chunk.content async for chunk in second] == ["b", "c"]
+    assert stream.closed
+
+
+@pytest.mark.asyncio
+async def test_stream_closed_once_all_subscribers_left(lc):
+    stream = GatedStream(["a", "b", "c"])
+    chat, coalescer, _ = create_azure_chat_with(
+        lc, stream.response, "request_coalescer", lc.RequestCoalescer()
+    )
+
+    first = chat.astream("question")
+    second = chat.astream("question")
+    stream.release()
+    await first.__anext__()
+    await second.__anext__()
+    await first.aclose()
+    await second.aclose()
+
+    await wait_until(lambda: stream.closed)
+    assert len(coalescer) == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_completed_once_cached(lc):
+    stream = GatedStream(["a", "b"])
+    chat, _, transport = create_azure_chat_with(
+        lc,
+        stream.response,
+        "request_coalescer",
+        lc.RequestCoalescer(),
+        response_cache=lc.InMemoryResponseCache(),
+    )
+    stream.release(2)
+
+    async def _read():
+        return [chunk async for chunk in chat.astream("question")]
+
+    first, second = await asyncio.gather(_read(), _read())
+    third = await _read()
+
+    assert [c.content for c in first] == [c.content for c in second]
+    assert "".join(chunk.content for chunk in third) == "ab"
+    assert third[0].response_metadata["cache_hit"] is True
+    assert len(transport.requests) == 1
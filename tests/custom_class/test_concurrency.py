@@ -0,0 +1,207 @@
+import asyncio
+
+import httpx
+import pytest
+
+from tests.mock import (
+    chat_completion,
+    chat_completion_chunks,
+    create_azure_chat_with,
+    json_response,
+    sse_response,
+)
+from tests.utils import wait_until, with_custom_class
+
+
+@pytest.fixture(scope="module")
+def lc():
+    with with_custom_class() as module:
+        yield module
+
+
+class Upstream:
+    """Mock deployment recording the peak number of concurrent requests."""
+
+    def __init__(self, statuses=()):
+        self.statuses = list(statuses)
+        self.in_flight = 0
+        self.peak = 0
+        self.released = asyncio.Event()
+
+    async def handler(self, request):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await self.released.wait()
+            if self.statuses:
+                status = self.statuses.pop(0)
+                return httpx.Response(
+                    status,
+                    json={"error": {"message": "overloaded"}},
+                    headers={"retry-after-ms": "1"},
+                )
+            if b'"stream": true' in request.content:
+                return sse_response(chat_completion_chunks(["a", "b"]))
+            return json_response(chat_completion())
+        finally:
+            self.in_flight -= 1
+
+
+def _limiter(concurrency):
+    (limiter,) = concurrency._limiters.values()
+    return limiter
+
+
+@pytest.mark.asyncio
+async def test_abatch_within_limit(lc):
+    upstream = Upstream()
+    chat, concurrency, _ = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "adaptive_concurrency",
+        lc.AdaptiveConcurrency(initial_limit=2, max_limit=2),
+    )
+
+    batch = asyncio.ensure_future(chat.abatch([f"q{i}" for i in range(10)]))
+    await wait_until(lambda: upstream.in_flight == 2)
+    assert _limiter(concurrency).snapshot() == {
+        "limit": 2,
+        "in_flight": 2,
+        "queue_depth": 8,
+    }
+    upstream.released.set()
+    results = await batch
+
+    assert [r.content for r in results] == ["answer"] * 10
+    assert upstream.peak == 2
+    assert _limiter(concurrency).snapshot() == {
+        "limit": 2,
+        "in_flight": 0,
+        "queue_depth": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_limit_grows_with_successes(lc):
+    upstream = Upstream()
+    upstream.released.set()
+    chat, concurrency, _ = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "adaptive_concurrency",
+        lc.AdaptiveConcurrency(initial_limit=2),
+    )
+
+    await chat.abatch([f"q{i}" for i in range(20)])
+
+    assert _limiter(concurrency).limit > 2
+
+
+@pytest.mark.asyncio
+async def test_limit_cut_once_per_round_trip(lc):
+    upstream = Upstream(statuses=[429, 503, 429])
+    chat, concurrency, _ = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "adaptive_concurrency",
+        lc.AdaptiveConcurrency(initial_limit=8, max_limit=8),
+    )
+
+    batch = asyncio.ensure_future(
+        chat.abatch(["q"] * 3, return_exceptions=True)
+    )
+    await wait_until(lambda: upstream.in_flight == 3)
+    upstream.released.set()
+    results = await batch
+
+    assert all(isinstance(r, Exception) for r in results)
+    assert _limiter(concurrency).limit == 4
+
+
+@pytest.mark.asyncio
+async def test_sdk_retries_observed(lc):
+    upstream = Upstream(statuses=[429])
+    upstream.released.set()
+    chat, concurrency, transport = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "adaptive_concurrency",
+        lc.AdaptiveConcurrency(initial_limit=8),
+        max_retries=1,
+    )
+
+    assert (await chat.ainvoke("q")).content == "answer"
+    assert len(transport.requests) == 2
+    assert _limiter(concurrency).limit == 4
+
+
+@pytest.mark.asyncio
+async def test_stream_holds_slot(lc):
+    upstream = Upstream()
+    upstream.released.set()
+    chat, concurrency, _ = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "adaptive_concurrency",
+        lc.AdaptiveConcurrency(initial_limit=1, max_limit=1),
+    )
+
+    stream = chat.astream("q")
+    assert (await stream.__anext__()).content == "a"
+    second = asyncio.ensure_future(chat.ainvoke("q"))
+    await wait_until(lambda: _limiter(concurrency).queue_depth == 1)
+    assert [chunk.content async for chunk in stream] == ["b"]
+
+    assert (await second).content == "answer"
+    assert _limiter(concurrency).in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_releases_slot(lc):
+    upstream = Upstream()
+    chat, concurrency, _ = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "adaptive_concurrency",
+        lc.AdaptiveConcurrency(initial_limit=1, max_limit=1),
+    )
+
+    first = asyncio.ensure_future(chat.ainvoke("q1"))
+    second = asyncio.ensure_future(chat.ainvoke("q2"))
+    await wait_until(lambda: upstream.in_flight == 1)
+    await wait_until(lambda: _limiter(concurrency).queue_depth == 1)
+    second.cancel()
+    upstream.released.set()
+    await first
+    await asyncio.gather(second, return_exceptions=True)
+
+    assert (await chat.ainvoke("q3")).content == "answer"
+    assert _limiter(concurrency).snapshot()["in_flight"] == 0
+
+
+def test_latency_inflation(lc):
+    from aidial_integration_langchain.langchain_openai.chat_models import (
+        concurrency,
+    )
+
+    limiter = lc.AIMDLimiter(initial_limit=8, latency_tolerance=2)
+
+    def _complete(latency):
+        limiter._in_flight += 1
+        slot = concurrency._Slot()
+        slot.completed = slot.started + latency
+        limiter.release(slot)
+
+    _complete(1.0)
+    assert limiter.limit == 8
+    _complete(1.5)
+    assert limiter.limit == 8
+    _complete(3.0)
+    assert limiter.limit == 4
+
+
+def test_invalid_parameters(lc):
+    with pytest.raises(ValueError):
+        lc.AdaptiveConcurrency(initial_limit=10, max_limit=5)
+    with pytest.raises(ValueError):
+        lc.AdaptiveConcurrency(decrease_factor=1)
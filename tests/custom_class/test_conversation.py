@@ -0,0 +1,180 @@
+import pytest
+
+from tests.mock import (
+    chat_completion,
+    chat_completion_chunks,
+    create_azure_chat,
+    json_response,
+    request_json,
+    sse_response,
+)
+from tests.utils import with_custom_class
+
+
+@pytest.fixture(scope="module")
+def lc():
+    with with_custom_class() as module:
+        yield module
+
+
+@pytest.fixture
+def encoded_count(monkeypatch):
+    from aidial_integration_langchain.langchain_openai.chat_models import (
+        conversation,
+    )
+
+    calls = []
+    json_dumps = conversation.json_dumps
+
+    def _json_dumps(value):
+        calls.append(value)
+        return json_dumps(value)
+
+    monkeypatch.setattr(conversation, "json_dumps", _json_dumps)
+    return calls
+
+
+def _messages():
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    state = {"state": {"blob": "x" * 1000}}
+    return [
+        HumanMessage(
+            content="привет", additional_kwargs={"custom_content": {}}
+        ),
+        AIMessage(content="hi", additional_kwargs={"custom_content": state}),
+        HumanMessage(content="question"),
+    ]
+
+
+def _create_chat(lc, **kwargs):
+    return create_azure_chat(
+        lc, lambda _: json_response(chat_completion()), **kwargs
+    )
+
+
+@pytest.mark.parametrize("raw_json_responses", [False, True])
+def test_same_request_body(lc, raw_json_responses):
+    chat, transport = _create_chat(
+        lc,
+        raw_json_responses=raw_json_responses,
+        extra_body={"custom_fields": {"a": 1}},
+    )
+    messages = _messages()
+
+    chat.invoke(messages, stop=["x"])
+    chat.invoke(lc.Conversation(messages=messages), stop=["x"])
+
+    expected, actual = (request_json(r) for r in transport.requests)
+    assert actual == expected
+    assert actual["custom_fields"] == {"a": 1}
+    assert transport.requests[1].url == transport.requests[0].url
+
+
+def test_only_new_messages_encoded(lc, encoded_count):
+    from langchain_core.messages import HumanMessage
+
+    chat, transport = _create_chat(lc)
+    conversation = lc.Conversation(messages=_messages())
+
+    conversation.append(chat.invoke(conversation))
+    assert len(encoded_count) == 3
+
+    conversation.append(HumanMessage(content="next"))
+    chat.invoke(conversation)
+    assert len(encoded_count) == 3 + 2
+
+    assert request_json(transport.requests[-1])["messages"][-2:] == [
+        {"role": "assistant", "content": "answer"},
+        {"role": "user", "content": "next"},
+    ]
+
+
+def test_changed_history_reencoded(lc, encoded_count):
+    from langchain_core.messages import HumanMessage
+
+    chat, transport = _create_chat(lc)
+    conversation = lc.Conversation(messages=_messages())
+    chat.invoke(conversation)
+
+    conversation.messages[1] = HumanMessage(content="changed")
+    chat.invoke(conversation)
+
+    assert len(encoded_count) == 3 + 2
+    assert [
+        m["content"] for m in request_json(transport.requests[-1])["messages"]
+    ] == [
+        "привет",
+        "changed",
+        "question",
+    ]
+
+
+def test_encoded_client_only_for_conversations(lc):
+    import openai
+
+    chat, transport = _create_chat(lc)
+    chat.invoke(_messages())
+    assert chat.client._encoded_client._client is None
+
+    chat.invoke(lc.Conversation(messages=_messages()))
+
+    encoded_client = chat.client._encoded_client._client
+    assert encoded_client is not None
+    assert encoded_client is not chat.root_client
+    # The other requests are built by the openai client as usual.
+    assert (
+        type(chat.root_client)._build_request
+        is openai.AzureOpenAI._build_request
+    )
+    assert request_json(transport.requests[0]) == request_json(
+        transport.requests[1]
+    )
+
+
+def test_modified_messages_sent_as_usual(lc):
+    chat, transport = _create_chat(lc)
+    conversation = lc.Conversation(messages=_messages())
+
+    payload = chat._get_request_payload(conversation)
+    payload["messages"].append({"role": "user", "content": "appended"})
+    chat.client.create(**payload)
+
+    messages = request_json(transport.requests[-1])["messages"]
+    assert messages[-1] == {"role": "user", "content": "appended"}
+    assert len(messages) == 4
+
+
+@pytest.mark.parametrize("raw_json_responses", [False, True])
+def test_stream(lc, raw_json_responses):
+    chunks = chat_completion_chunks(["a", "b"])
+    chat, transport = create_azure_chat(
+        lc,
+        lambda _: sse_response(chunks),
+        raw_json_responses=raw_json_responses,
+    )
+
+    conversation = lc.Conversation(messages=_messages())
+    content = "".join(str(c.content) for c in chat.stream(conversation))
+
+    assert content == "ab"
+    request = request_json(transport.requests[-1])
+    assert request["stream"] is True
+    assert len(request["messages"]) == 3
+
+
+@pytest.mark.asyncio
+async def test_async(lc, encoded_count):
+    chunks = chat_completion_chunks(["a", "b"])
+    chat, transport = create_azure_chat(lc, lambda _: sse_response(chunks))
+    conversation = lc.Conversation(messages=_messages())
+
+    content = ""
+    async for chunk in chat.astream(conversation):
+        content += str(chunk.content)
+    assert content == "ab"
+
+    chat, transport = _create_chat(lc)
+    assert (await chat.ainvoke(conversation)).content == "answer"
+    assert len(request_json(transport.requests[-1])["messages"]) == 3
+    assert len(encoded_count) == 3
@@ -0,0 +1,251 @@
+import asyncio
+
+import httpx
+import pytest
+
+from tests.mock import (
+    MockTransport,
+    chat_completion,
+    chat_completion_chunks,
+    create_azure_chat,
+    create_azure_chat_with,
+    json_response,
+    request_json,
+    sse_body,
+)
+from tests.utils import with_custom_class
+
+
+@pytest.fixture(scope="module")
+def lc():
+    with with_custom_class() as module:
+        yield module
+
+
+class Upstream:
+    """Mock deployment delaying the responses one by one."""
+
+    def __init__(self, delays=(), failures=()):
+        self.delays = list(delays)
+        self.failures = set(failures)
+        self.served = 0
+        self.cancelled = 0
+
+    async def handler(self, request):
+        index = self.served
+        self.served += 1
+        delay = self.delays[index] if index < len(self.delays) else 0
+        if request_json(request).get("stream"):
+            return httpx.Response(
+                status_code=200,
+                content=self._stream(delay),
+                headers={"Content-Type": "text/event-stream"},
+            )
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if index in self.failures:
+            return httpx.Response(500, json={"error": {"message": "down"}})
+        return json_response(chat_completion(f"answer {index}"))
+
+    async def _stream(self, delay):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        yield sse_body(chat_completion_chunks(["a", "b"]))
+
+
+@pytest.mark.asyncio
+async def test_late_response_hedged(lc):
+    upstream = Upstream(delays=[1])
+    chat, hedger, transport = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "request_hedger",
+        lc.RequestHedger(budget=1, delay=0.05),
+    )
+
+    response = await chat.ainvoke("q")
+
+    assert response.content == "answer 1"
+    assert len(transport.requests) == 2
+    assert upstream.cancelled == 1
+    assert hedger.snapshot() == {
+        "requests": 1,
+        "hedges": 1,
+        "wins": 1,
+        "delay": 0.05,
+    }
+
+
+@pytest.mark.asyncio
+async def test_fast_response_not_hedged(lc):
+    upstream = Upstream()
+    chat, hedger, transport = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "request_hedger",
+        lc.RequestHedger(budget=1, delay=0.05),
+    )
+
+    for _ in range(3):
+        assert (await chat.ainvoke("q")).content.startswith("answer")
+
+    assert len(transport.requests) == 3
+    assert hedger.snapshot()["hedges"] == 0
+
+
+@pytest.mark.asyncio
+async def test_primary_wins_after_hedge(lc):
+    upstream = Upstream(delays=[0.1, 1])
+    chat, hedger, _ = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "request_hedger",
+        lc.RequestHedger(budget=1, delay=0.05),
+    )
+
+    assert (await chat.ainvoke("q")).content == "answer 0"
+    assert upstream.cancelled == 1
+    assert (hedger.hedges, hedger.wins) == (1, 0)
+
+
+@pytest.mark.asyncio
+async def test_hedge_budget(lc):
+    upstream = Upstream(delays=[0.1] * 20)
+    chat, hedger, transport = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "request_hedger",
+        lc.RequestHedger(budget=0.5, delay=0.05),
+    )
+
+    for _ in range(4):
+        await chat.ainvoke("q")
+
+    # Every request earns half a hedge.
+    assert hedger.snapshot()["hedges"] == 2
+    assert len(transport.requests) == 6
+
+
+@pytest.mark.asyncio
+async def test_failed_request_falls_back_to_other(lc):
+    upstream = Upstream(delays=[0.1, 0.2], failures={0})
+    chat, hedger, _ = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "request_hedger",
+        lc.RequestHedger(budget=1, delay=0.05),
+    )
+
+    assert (await chat.ainvoke("q")).content == "answer 1"
+    assert hedger.wins == 1
+
+    upstream = Upstream(failures={0})
+    chat, _, transport = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "request_hedger",
+        lc.RequestHedger(budget=1, delay=0.05),
+    )
+    with pytest.raises(Exception):
+        await chat.ainvoke("q")
+    # Failed before the hedge delay
+    assert len(transport.requests) == 1
+
+
+def test_delay_follows_percentile(lc):
+    hedger = lc.RequestHedger(percentile=50, min_samples=4)
+    assert hedger.get_delay() is None
+
+    for latency in [0.3, 0.1, 0.4]:
+        hedger._record(latency)
+    assert hedger.get_delay() is None
+
+    hedger._record(0.2)
+    assert hedger.get_delay() == 0.3
+
+
+@pytest.mark.asyncio
+async def test_cancelled_request_latency_recorded(lc):
+    upstream = Upstream(delays=[1])
+    chat, hedger, _ = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "request_hedger",
+        lc.RequestHedger(budget=1, delay=None, percentile=50, min_samples=2),
+    )
+    for latency in [0.05, 0.05]:
+        hedger._record(latency)
+
+    assert (await chat.ainvoke("q")).content == "answer 1"
+
+    # The hedge and the cancelled request beyond the delay
+    assert len(hedger._latencies) == 4
+    assert max(hedger._latencies) > 0.05
+
+
+@pytest.mark.asyncio
+async def test_late_first_chunk_hedged(lc):
+    upstream = Upstream(delays=[1])
+    chat, hedger, transport = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "request_hedger",
+        lc.RequestHedger(budget=1, delay=0.05),
+    )
+
+    chunks = [chunk.content async for chunk in chat.astream("q")]
+
+    assert chunks == ["a", "b"]
+    assert len(transport.requests) == 2
+    assert upstream.cancelled == 1
+    assert (hedger.hedges, hedger.wins) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_hedge_sent_to_alternate_deployment(lc):
+    upstream = Upstream(delays=[1])
+    alternate_upstream = Upstream()
+    alternate, alternate_transport = create_azure_chat(
+        lc, alternate_upstream.handler
+    )
+    chat, hedger, transport = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "request_hedger",
+        lc.RequestHedger(budget=1, delay=0.05),
+    )
+    chat = chat.with_options(hedge_llm=alternate)
+
+    assert (await chat.ainvoke("q")).content == "answer 0"
+    assert len(transport.requests) == 1
+    assert len(alternate_transport.requests) == 1
+    assert hedger.wins == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_hedges_to_next_deployment(lc):
+    upstream = Upstream(delays=[1])
+    transport = MockTransport(upstream.handler)
+    pool = lc.PooledAzureChatOpenAI(
+        targets=[
+            {"azure_endpoint": "https://east"},
+            {"azure_endpoint": "https://west"},
+        ],
+        api_key="dummy-key",
+        api_version="dummy-version",
+        azure_deployment="dummy-deployment",
+        http_async_client=httpx.AsyncClient(transport=transport),
+        max_retries=0,
+        request_hedger=lc.RequestHedger(budget=1, delay=0.05),
+    )
+
+    await pool.ainvoke("q")
+
+    hosts = [request.url.host for request in transport.requests]
+    assert len(set(hosts)) == 2
@@ -0,0 +1,128 @@
+import pytest
+
+from tests.mock import (
+    chat_completion,
+    create_azure_chat,
+    json_response,
+    request_json,
+)
+from tests.utils import with_custom_class
+
+
+@pytest.fixture(scope="module")
+def lc():
+    with with_custom_class() as module:
+        yield module
+
+
+def _history(turns: int):
+    from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+    messages = []
+    for turn in range(turns):
+        messages.append(
+            HumanMessage(
+                content=f"question {turn}",
+                additional_kwargs={"custom_content": {"state": turn}},
+            )
+        )
+        messages.append(
+            AIMessage(
+                content="",
+                tool_calls=[
+                    {"name": "f", "args": {"turn": turn}, "id": f"call_{turn}"}
+                ],
+            )
+        )
+        messages.append(ToolMessage(content="42", tool_call_id=f"call_{turn}"))
+    return messages
+
+
+def _create_chat(lc, **kwargs):
+    return create_azure_chat(
+        lc, lambda _: json_response(chat_completion()), **kwargs
+    )
+
+
+@pytest.mark.parametrize("key", ["identity", "content"])
+def test_same_payload(lc, key):
+    chat, _ = _create_chat(lc)
+    cached_chat, _ = _create_chat(
+        lc, message_cache=lc.MessageDictCache(key=key)
+    )
+    messages = _history(5)
+
+    expected = chat._get_request_payload(messages)
+    assert cached_chat._get_request_payload(messages) == expected
+    assert cached_chat._get_request_payload(messages) == expected
+    assert expected["messages"][0]["custom_content"] == {"state": 0}
+
+
+def test_identity_hits(lc):
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    cache = lc.MessageDictCache()
+    chat, transport = _create_chat(lc, message_cache=cache)
+    messages = _history(1)
+
+    for _ in range(3):
+        chat.invoke(messages)
+        messages = [*messages, AIMessage(content="answer"), HumanMessage("q")]
+
+    assert cache.misses == 3 + 2 + 2
+    assert cache.hits == 3 + 5
+    assert request_json(transport.requests[-1])["messages"][-1] == {
+        "role": "user",
+        "content": "q",
+    }
+
+
+def test_content_hits_rebuilt_history(lc):
+    cache = lc.MessageDictCache(key="content")
+    chat, _ = _create_chat(lc, message_cache=cache)
+
+    chat._get_request_payload(_history(3))
+    chat._get_request_payload(_history(4))
+
+    assert cache.misses == 9 + 3
+    assert cache.hits == 9
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_content_key_distinguishes_types(lc, monkeypatch, use_orjson):
+    from langchain_core.messages import HumanMessage
+
+    from aidial_integration_langchain.langchain_openai.chat_models import (
+        message_cache,
+    )
+
+    if not use_orjson:
+        monkeypatch.setattr(message_cache, "_orjson_dumps", None)
+
+    cache = lc.MessageDictCache(key="content")
+    messages = [
+        HumanMessage(content="q", additional_kwargs={"custom_content": value})
+        for value in [1, True, 1.0, "1"]
+    ]
+    converted = cache.convert(messages, lambda m: m.additional_kwargs)
+
+    assert cache.misses == 4
+    assert [c["custom_content"] for c in converted] == [1, True, 1.0, "1"]
+
+
+def test_lru_eviction(lc):
+    from langchain_core.messages import HumanMessage
+
+    cache = lc.MessageDictCache(maxsize=2)
+    first, second, third = (HumanMessage(content=str(i)) for i in range(3))
+
+    cache.convert([first, second], dict)
+    cache.convert([first], dict)
+    cache.convert([third], dict)
+    assert len(cache) == 2
+
+    cache.convert([first, second], dict)
+    assert (cache.hits, cache.misses) == (2, 4)
+
+    cache.clear()
+    assert (len(cache), cache.hits, cache.misses) == (0, 0, 0)
@@ -0,0 +1,222 @@
+import asyncio
+import time
+from collections import Counter
+
+import httpx
+import pytest
+
+from tests.mock import (
+    MockTransport,
+    chat_completion,
+    chat_completion_chunks,
+    json_response,
+    request_json,
+    sse_response,
+)
+from tests.utils import with_custom_class
+
+_HOSTS = ["east", "west", "north"]
+
+
+@pytest.fixture(scope="module")
+def lc():
+    with with_custom_class() as module:
+        yield module
+
+
+class Upstream:
+    """Mock deployments in several regions."""
+
+    def __init__(self):
+        self.failing = set()
+        self.delays = {}
+        self.released = asyncio.Event()
+        self.released.set()
+
+    async def handler(self, request):
+        await asyncio.sleep(self.delays.get(request.url.host, 0))
+        await self.released.wait()
+        return self.respond(request)
+
+    def respond(self, request):
+        if request.url.host in self.failing:
+            return httpx.Response(500, json={"error": {"message": "down"}})
+        if request_json(request).get("stream"):
+            return sse_response(chat_completion_chunks(["a", "b"]))
+        return json_response(chat_completion())
+
+
+def _create_pool(lc, upstream, hosts=_HOSTS, **kwargs):
+    transport = MockTransport(upstream.handler)
+    sync_transport = MockTransport(upstream.respond)
+    # Both clients record the requests in the same list.
+    sync_transport.requests = transport.requests
+    pool = lc.PooledAzureChatOpenAI(
+        targets=[{"azure_endpoint": f"https://{host}"} for host in hosts],
+        api_key="dummy-key",
+        api_version="dummy-version",
+        azure_deployment="dummy-deployment",
+        http_client=httpx.Client(transport=sync_transport),
+        http_async_client=httpx.AsyncClient(transport=transport),
+        max_retries=0,
+        **kwargs,
+    )
+    return pool, transport
+
+
+def _hosts(transport):
+    return [request.url.host for request in transport.requests]
+
+
+def _state(pool, host):
+    (state,) = (
+        state
+        for target, state in pool.load_balancer.snapshot().items()
+        if target[0] == f"https://{host}"
+    )
+    return state
+
+
+@pytest.mark.asyncio
+async def test_least_outstanding_spreads_requests(lc):
+    upstream = Upstream()
+    upstream.released.clear()
+    pool, transport = _create_pool(lc, upstream)
+
+    tasks = [asyncio.ensure_future(pool.ainvoke(f"q{i}")) for i in range(6)]
+    for _ in range(100):
+        await asyncio.sleep(0)
+    upstream.released.set()
+    await asyncio.gather(*tasks)
+
+    assert Counter(_hosts(transport)) == {host: 2 for host in _HOSTS}
+    assert all(_state(pool, host)["outstanding"] == 0 for host in _HOSTS)
+
+
+@pytest.mark.asyncio
+async def test_ewma_prefers_faster_deployment(lc):
+    upstream = Upstream()
+    upstream.delays = {"west": 0.02, "north": 0.02}
+    pool, transport = _create_pool(
+        lc, upstream, load_balancer=lc.LoadBalancer(strategy="ewma")
+    )
+
+    for i in range(10):
+        await pool.ainvoke(f"q{i}")
+
+    # Every deployment is measured first.
+    assert set(_hosts(transport)[:3]) == set(_HOSTS)
+    assert _hosts(transport)[3:] == ["east"] * 7
+
+
+def test_conversation_affinity(lc):
+    from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+    upstream = Upstream()
+    pool, transport = _create_pool(lc, upstream, conversation_affinity=True)
+
+    conversation = [SystemMessage("system"), HumanMessage("first question")]
+    for i in range(5):
+        conversation.append(pool.invoke(conversation))
+        conversation.append(HumanMessage(f"question {i}"))
+    assert len(set(_hosts(transport))) == 1
+
+    for i in range(30):
+        pool.invoke([SystemMessage("system"), HumanMessage(f"topic {i}")])
+    assert set(_hosts(transport)) == set(_HOSTS)
+
+    transport.requests.clear()
+    keyed = pool.with_options(affinity_key="conversation-1")
+    for i in range(5):
+        keyed.invoke([AIMessage(f"turn {i}")])
+    assert len(set(_hosts(transport))) == 1
+
+
+@pytest.mark.asyncio
+async def test_failing_deployment_ejected_and_probed(lc):
+    upstream = Upstream()
+    upstream.failing = {"west"}
+    pool, transport = _create_pool(
+        lc,
+        upstream,
+        hosts=["east", "west"],
+        load_balancer=lc.LoadBalancer(failure_threshold=1, ejection_time=0.05),
+    )
+
+    results = await asyncio.gather(
+        pool.ainvoke("q1"), pool.ainvoke("q2"), return_exceptions=True
+    )
+    assert sum(isinstance(r, Exception) for r in results) == 1
+    assert _state(pool, "west")["ejected"]
+
+    transport.requests.clear()
+    for i in range(5):
+        await pool.ainvoke(f"q{i}")
+    assert _hosts(transport) == ["east"] * 5
+
+    upstream.failing.clear()
+    await asyncio.sleep(0.06)
+    await asyncio.gather(pool.ainvoke("q1"), pool.ainvoke("q2"))
+
+    assert "west" in _hosts(transport)
+    assert not _state(pool, "west")["ejected"]
+
+
+def test_probe_resolved_only_by_its_request(lc):
+    import openai
+
+    balancer = lc.LoadBalancer(failure_threshold=1, ejection_time=0.01)
+    targets = ["east", "west"]
+
+    def pick():
+        return balancer.pick(targets, affinity_key="a")
+
+    straggler = pick()
+    target = targets[straggler.__enter__().index]
+    with pytest.raises(openai.APIConnectionError):
+        with pick():
+            raise openai.APIConnectionError(request=httpx.Request("POST", "/"))
+    assert balancer.snapshot()[target]["ejected"]
+
+    time.sleep(0.02)
+    probe = pick()
+    assert targets[probe.__enter__().index] == target
+    # The request sent before the ejection doesn't end the probe.
+    straggler.__exit__(None, None, None)
+    assert balancer.snapshot()[target]["ejected"]
+    with pick() as other:
+        assert targets[other.index] != target
+
+    probe.__exit__(None, None, None)
+    assert not balancer.snapshot()[target]["ejected"]
+
+
+@pytest.mark.asyncio
+async def test_stream_tracked(lc):
+    upstream = Upstream()
+    pool, _ = _create_pool(lc, upstream, hosts=["east"])
+
+    assert [chunk.content async for chunk in pool.astream("q")] == ["a", "b"]
+    assert [chunk.content for chunk in pool.stream("q")] == ["a", "b"]
+
+    state = _state(pool, "east")
+    assert state["outstanding"] == 0
+    assert state["latency"] is not None
+
+
+def test_derived_pool_shares_targets(lc):
+    upstream = Upstream()
+    pool, transport = _create_pool(lc, upstream)
+    pool.invoke("q")
+
+    derived = pool.with_options(temperature=0.1)
+    derived.invoke("q")
+
+    assert request_json(transport.requests[-1])["temperature"] == 0.1
+    assert derived.load_balancer is pool.load_balancer
+    assert all(
+        derived_llm.root_async_client is llm.root_async_client
+        for derived_llm, llm in zip(
+            derived._get_target_llms(), pool._get_target_llms()
+        )
+    )
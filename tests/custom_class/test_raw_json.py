@@ -0,0 +1,192 @@
+import httpx
+import pytest
+from openai import APIError
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from tests.mock import (
+    chat_completion,
+    chat_completion_chunks,
+    create_azure_chat,
+    json_response,
+    sse_response,
+)
+from tests.utils import with_custom_class
+
+
+def _response() -> dict:
+    response = chat_completion(statistics={"a": "b"})
+    response["choices"][0]["message"]["custom_content"] = {"attachments": []}
+    return response
+
+
+@pytest.mark.asyncio
+async def test_raw_json_response(monkeypatch):
+    def _model_dump(self, *args, **kwargs):
+        raise AssertionError("The openai model must not be used")
+
+    monkeypatch.setattr(ChatCompletion, "model_dump", _model_dump)
+
+    with with_custom_class() as lc:
+        chat, _ = create_azure_chat(
+            lc,
+            lambda _: json_response(_response(), headers={"x-test": "1"}),
+            raw_json_responses=True,
+            include_response_headers=True,
+        )
+        message = await chat.ainvoke("question")
+
+    assert message.content == "answer"
+    assert message.usage_metadata == {
+        "input_tokens": 1,
+        "output_tokens": 2,
+        "total_tokens": 3,
+    }
+    assert message.response_metadata["statistics"] == {"a": "b"}
+    assert message.response_metadata["headers"]["x-test"] == "1"
+    assert message.response_metadata["finish_reason"] == "stop"
+    assert message.additional_kwargs == {"custom_content": {"attachments": []}}
+
+
+def test_raw_json_response_sync():
+    with with_custom_class() as lc:
+        raw_chat, _ = create_azure_chat(
+            lc, lambda _: json_response(_response()), raw_json_responses=True
+        )
+        chat, _ = create_azure_chat(lc, lambda _: json_response(_response()))
+
+        raw_message = raw_chat.invoke("question")
+        message = chat.invoke("question")
+
+    assert raw_message.content == message.content
+    assert raw_message.additional_kwargs["custom_content"] == {
+        "attachments": []
+    }
+    assert raw_message.usage_metadata == message.usage_metadata
+    for key in ["statistics", "model_name", "finish_reason"]:
+        assert (
+            raw_message.response_metadata[key] == message.response_metadata[key]
+        )
+
+
+def _chunks() -> list:
+    chunks = chat_completion_chunks(["Hello", ", ", "world"])
+    chunks[0]["choices"][0]["delta"]["custom_content"] = {"attachments": []}
+    chunks[-1]["statistics"] = {"a": "b"}
+    return chunks
+
+
+@pytest.mark.asyncio
+async def test_raw_sse_stream(monkeypatch):
+    def _model_dump(self, *args, **kwargs):
+        raise AssertionError("The openai model must not be used")
+
+    monkeypatch.setattr(ChatCompletionChunk, "model_dump", _model_dump)
+
+    with with_custom_class() as lc:
+        chat, _ = create_azure_chat(
+            lc,
+            lambda _: sse_response(_chunks(), headers={"x-test": "1"}),
+            raw_json_responses=True,
+            include_response_headers=True,
+        )
+        chunks = [chunk async for chunk in chat.astream("question")]
+
+    assert [chunk.content for chunk in chunks] == ["Hello", ", ", "world"]
+    assert chunks[0].additional_kwargs == {
+        "custom_content": {"attachments": []}
+    }
+    assert chunks[0].response_metadata["headers"]["x-test"] == "1"
+    assert chunks[-1].response_metadata["statistics"] == {"a": "b"}
+    assert chunks[-1].response_metadata["finish_reason"] == "stop"
+
+
+def test_raw_sse_stream_sync():
+    with with_custom_class() as lc:
+        raw_chat, _ = create_azure_chat(
+            lc, lambda _: sse_response(_chunks()), raw_json_responses=True
+        )
+        chat, _ = create_azure_chat(lc, lambda _: sse_response(_chunks()))
+
+        raw_chunks = list(raw_chat.stream("question"))
+        chunks = list(chat.stream("question"))
+
+    def _fields(chunk):
+        return chunk.content, chunk.additional_kwargs, chunk.response_metadata
+
+    assert list(map(_fields, raw_chunks)) == list(map(_fields, chunks))
+
+
+@pytest.mark.asyncio
+async def test_raw_sse_stream_error():
+    body = b'data: {"choices": []}\n\ndata: {"error": {"message": "boom"}}\n\n'
+
+    with with_custom_class() as lc:
+        chat, _ = create_azure_chat(
+            lc,
+            lambda _: httpx.Response(200, content=body),
+            raw_json_responses=True,
+        )
+        with pytest.raises(APIError, match="boom"):
+            async for _ in chat.astream("question"):
+                pass
+
+
+def test_sse_decoder():
+    from aidial_integration_langchain.langchain_openai.chat_models.raw import (
+        SSEDecoder,
+    )
+
+    decoder = SSEDecoder()
+    body = (
+        b": comment\r\n"
+        b'data: {\r\ndata: "a": 1}\r\n\r\n'
+        b"event: error\ndata:{}\n\n"
+        b"data: [DONE]\n\n"
+    )
+
+    events = []
+    for idx in range(len(body)):
+        events.extend(decoder.feed(body[idx : idx + 1]))
+
+    assert events == [
+        (None, b'{\n"a": 1}'),
+        (b"error", b"{}"),
+        (None, b"[DONE]"),
+    ]
+
+
+def test_sse_decoder_carriage_returns():
+    from aidial_integration_langchain.langchain_openai.chat_models.raw import (
+        SSEDecoder,
+    )
+
+    decoder = SSEDecoder()
+    body = b"data: a\r\rdata: b\r\n\r\ndata: c\n\n"
+
+    events = []
+    for idx in range(len(body)):
+        events.extend(decoder.feed(body[idx : idx + 1]))
+
+    assert events == [(None, b"a"), (None, b"b"), (None, b"c")]
+    assert SSEDecoder().feed(body) == events
+
+
+def test_raw_sse_named_events():
+    from aidial_integration_langchain.langchain_openai.chat_models.raw import (
+        iter_sse_json,
+    )
+
+    request = httpx.Request("POST", "https://dummy-url")
+    body = (
+        b'event: ping\ndata: {"id": 1}\n\n'
+        b'data: {"choices": []}\n\n'
+        b'event: error\ndata: {"error": {"message": "boom"}}\n\n'
+    )
+
+    chunks = iter_sse_json(request, [body])
+
+    # Wrapped with the event name as the openai SDK does
+    assert next(chunks) == {"data": {"id": 1}, "event": "ping"}
+    assert next(chunks) == {"choices": []}
+    with pytest.raises(APIError, match="boom"):
+        next(chunks)
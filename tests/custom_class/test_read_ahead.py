@@ -0,0 +1,135 @@
+import asyncio
+
+import httpx
+import pytest
+
+from tests.mock import chat_completion_chunks, create_azure_chat_with, sse_body
+from tests.utils import wait_until, with_custom_class
+
+_TOKENS = [f"t{i}" for i in range(10)]
+_DONE = b"data: [DONE]\n\n"
+
+
+@pytest.fixture(scope="module")
+def lc():
+    with with_custom_class() as module:
+        yield module
+
+
+class Upstream:
+    """Mock deployment streaming the tokens one by one."""
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.sent = 0
+
+    def handler(self, request):
+        return httpx.Response(
+            200,
+            content=self._body(),
+            headers={"Content-Type": "text/event-stream"},
+        )
+
+    async def _body(self):
+        for chunk in chat_completion_chunks(_TOKENS):
+            await asyncio.sleep(self.delay)
+            self.sent += 1
+            yield sse_body([chunk])[: -len(_DONE)]
+        if self.fail:
+            yield b'data: {"error": {"message": "broken"}}\n\n'
+        yield _DONE
+
+
+@pytest.mark.asyncio
+async def test_chunks_passed_in_order(lc):
+    chat, read_ahead, _ = create_azure_chat_with(
+        lc, Upstream().handler, "read_ahead", lc.ReadAhead()
+    )
+
+    chunks = [chunk.content async for chunk in chat.astream("q")]
+
+    assert chunks == _TOKENS
+    snapshot = read_ahead.snapshot()
+    assert snapshot["streams"] == 1
+    assert snapshot["chunks"] == len(_TOKENS)
+
+
+@pytest.mark.asyncio
+async def test_upstream_read_ahead_of_slow_consumer(lc):
+    upstream = Upstream()
+    chat, read_ahead, _ = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "read_ahead",
+        lc.ReadAhead(high_water=4, low_water=1),
+    )
+
+    stream = chat.astream("q")
+    await stream.__anext__()
+    # The producer pauses at the high water mark.
+    await wait_until(lambda: read_ahead.producer_stalls == 1)
+    assert upstream.sent == 5
+    assert read_ahead.snapshot()["max_buffered"] == 4
+
+    for _ in range(2):
+        await stream.__anext__()
+    # Gives the producer the time to resume, which it mustn't.
+    await asyncio.sleep(0.01)
+    # Still above the low water mark
+    assert upstream.sent == 5
+
+    await stream.__anext__()
+    await wait_until(lambda: upstream.sent > 5)
+
+    assert [chunk.content async for chunk in stream] == _TOKENS[4:]
+
+
+@pytest.mark.asyncio
+async def test_consumer_stalls_on_slow_upstream(lc):
+    chat, read_ahead, _ = create_azure_chat_with(
+        lc, Upstream(delay=0.005).handler, "read_ahead", lc.ReadAhead()
+    )
+
+    async for _ in chat.astream("q"):
+        pass
+
+    snapshot = read_ahead.snapshot()
+    assert snapshot["consumer_stalls"] >= len(_TOKENS) - 1
+    assert snapshot["consumer_stall_time"] > 0
+    assert snapshot["producer_stalls"] == 0
+
+
+@pytest.mark.asyncio
+async def test_error_raised_after_buffered_chunks(lc):
+    chat, _, _ = create_azure_chat_with(
+        lc, Upstream(fail=True).handler, "read_ahead", lc.ReadAhead()
+    )
+
+    chunks = []
+    with pytest.raises(Exception, match="broken"):
+        async for chunk in chat.astream("q"):
+            chunks.append(chunk.content)
+    assert chunks == _TOKENS
+
+
+@pytest.mark.asyncio
+async def test_early_close_stops_reading(lc):
+    upstream = Upstream(delay=0.01)
+    chat, _, _ = create_azure_chat_with(
+        lc, upstream.handler, "read_ahead", lc.ReadAhead()
+    )
+
+    stream = chat.astream("q")
+    await stream.__anext__()
+    await stream.aclose()
+    sent = upstream.sent
+    await asyncio.sleep(0.05)
+
+    assert sent < len(_TOKENS)
+    assert upstream.sent == sent
+
+
+def test_water_marks_validated(lc):
+    with pytest.raises(ValueError):
+        lc.ReadAhead(high_water=4, low_water=4)
@@ -0,0 +1,132 @@
+import pytest
+
+from tests.mock import (
+    chat_completion,
+    create_azure_chat,
+    json_response,
+    request_json,
+)
+from tests.utils import with_custom_class
+
+
+@pytest.fixture(scope="module")
+def lc():
+    with with_custom_class() as module:
+        yield module
+
+
+def _original_default_params(chat):
+    from langchain_openai.chat_models.base import BaseChatOpenAI
+
+    default_params = BaseChatOpenAI._default_params.fget
+    assert default_params is not None
+    return default_params(chat)
+
+
+def _original_ls_params(chat, stop, **kwargs):
+    from langchain_openai.chat_models.base import BaseChatOpenAI
+
+    # The custom AzureChatOpenAI doesn't inherit the original one,
+    # so its override is repeated here.
+    params = BaseChatOpenAI._get_ls_params(chat, stop, **kwargs)
+    params["ls_provider"] = "azure"
+    if chat.model_name:
+        if chat.model_version and chat.model_version not in chat.model_name:
+            params["ls_model_name"] = (
+                chat.model_name + "-" + chat.model_version.lstrip("-")
+            )
+        else:
+            params["ls_model_name"] = chat.model_name
+    elif chat.deployment_name:
+        params["ls_model_name"] = chat.deployment_name
+    return params
+
+
+@pytest.mark.parametrize(
+    "params, stop, kwargs",
+    [
+        ({}, None, {}),
+        ({"stop": ["a"], "max_tokens": 10}, ["b"], {}),
+        ({"model": "gpt-4", "model_version": "0613"}, ["b"], {"n": 1}),
+        (
+            {"extra_body": {"x": 1}, "model_kwargs": {"top_k": 3}},
+            None,
+            {"temperature": 0.1, "max_tokens": 5, "tools": []},
+        ),
+    ],
+)
+def test_same_as_original(lc, params, stop, kwargs):
+    from langchain_openai.chat_models.base import (
+        BaseChatOpenAI as OriginalBaseChatOpenAI,
+    )
+
+    chat, _ = create_azure_chat(lc, lambda _: json_response({}), **params)
+
+    assert chat._default_params == _original_default_params(chat)
+    assert chat._get_invocation_params(
+        stop=stop, **kwargs
+    ) == OriginalBaseChatOpenAI._get_invocation_params(chat, stop, **kwargs)
+    assert chat._get_ls_params(stop=stop, **kwargs) == _original_ls_params(
+        chat, stop, **kwargs
+    )
+    assert chat._identifying_params == {
+        "azure_deployment": chat.deployment_name,
+        "model_name": chat.model_name,
+        **_original_default_params(chat),
+    }
+
+
+def test_assignment_recompiles(lc):
+    chat, transport = create_azure_chat(
+        lc, lambda _: json_response(chat_completion())
+    )
+    chat.invoke("question")
+    chat.temperature = 0.1
+    chat.invoke("question")
+
+    assert request_json(transport.requests[0])["temperature"] == 0.7
+    assert request_json(transport.requests[1])["temperature"] == 0.1
+    assert chat._identifying_params["temperature"] == 0.1
+
+
+def test_in_place_change_recompiles(lc):
+    chat, transport = create_azure_chat(
+        lc,
+        lambda _: json_response(chat_completion()),
+        model_kwargs={"user": "a"},
+        extra_body={"x": 1},
+    )
+    chat.invoke("question")
+    chat.model_kwargs["user"] = "b"
+    assert chat.extra_body is not None
+    chat.extra_body["x"] = 2
+    chat.invoke("question")
+
+    assert request_json(transport.requests[0])["user"] == "a"
+    assert request_json(transport.requests[0])["x"] == 1
+    assert request_json(transport.requests[1])["user"] == "b"
+    assert request_json(transport.requests[1])["x"] == 2
+    assert chat._identifying_params["user"] == "b"
+
+
+def test_copy_recompiles(lc):
+    chat, transport = create_azure_chat(
+        lc, lambda _: json_response(chat_completion())
+    )
+    chat.invoke("question")
+    chat.model_copy(update={"temperature": 0.2}).invoke("question")
+    chat.with_options(temperature=0.3).invoke("question")
+    chat.invoke("question")
+
+    temperatures = [request_json(r)["temperature"] for r in transport.requests]
+    assert temperatures == [0.7, 0.2, 0.3, 0.7]
+
+
+def test_compiled_params_not_exposed(lc):
+    chat, _ = create_azure_chat(lc, lambda _: json_response({}))
+    chat._default_params["temperature"] = 0.5
+    chat._identifying_params["temperature"] = 0.5
+    chat._get_invocation_params()["temperature"] = 0.5
+
+    assert chat._get_request_payload("question")["temperature"] == 0.7
+    assert chat._identifying_params["temperature"] == 0.7
@@ -0,0 +1,309 @@
+import os
+import time
+
+import pytest
+
+from tests.mock import (
+    chat_completion,
+    chat_completion_chunks,
+    create_azure_chat,
+    json_response,
+    request_json,
+    sse_response,
+)
+from tests.utils import with_custom_class
+
+
+@pytest.fixture(scope="module")
+def lc():
+    with with_custom_class() as module:
+        yield module
+
+
+def _response():
+    return chat_completion(
+        choices=[
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {
+                    "role": "assistant",
+                    "content": "answer",
+                    "custom_content": {"attachments": [{"url": "a.png"}]},
+                },
+            }
+        ],
+        statistics={"usage_per_model": []},
+    )
+
+
+def _chunks():
+    chunks = chat_completion_chunks(
+        ["a", "b"],
+        usage={"prompt_tokens": 1, "completion_tokens": 2, "total_tokens": 3},
+        statistics={"a": "b"},
+    )
+    chunks[0]["choices"][0]["delta"]["custom_content"] = {"state": 1}
+    return chunks
+
+
+def _messages(state=1):
+    from langchain_core.messages import HumanMessage
+
+    return [
+        HumanMessage(
+            content="question",
+            additional_kwargs={"custom_content": {"state": state}},
+        )
+    ]
+
+
+@pytest.mark.parametrize("raw_json_responses", [False, True])
+def test_blocking_replay(lc, raw_json_responses):
+    chat, transport = create_azure_chat(
+        lc,
+        lambda _: json_response(_response()),
+        raw_json_responses=raw_json_responses,
+        response_cache=lc.InMemoryResponseCache(),
+    )
+
+    expected, actual = (chat.invoke(_messages()) for _ in range(2))
+
+    assert len(transport.requests) == 1
+    assert chat.response_cache.hits == 1
+    assert actual.content == "answer"
+    assert actual.additional_kwargs == expected.additional_kwargs
+    assert actual.usage_metadata == expected.usage_metadata
+    assert actual.response_metadata == {
+        **expected.response_metadata,
+        "cache_hit": True,
+    }
+    assert actual.response_metadata["statistics"] == {"usage_per_model": []}
+
+
+def test_key_includes_dial_extras(lc):
+    chat, transport = create_azure_chat(
+        lc,
+        lambda _: json_response(_response()),
+        response_cache=lc.InMemoryResponseCache(),
+    )
+
+    chat.invoke(_messages(1))
+    chat.invoke(_messages(2))
+    chat.invoke(_messages(1), extra_body={"custom_fields": {"a": 1}})
+    chat.invoke(_messages(1), extra_body={"custom_fields": {"a": 2}})
+    chat.with_options(temperature=0.5).invoke(_messages(1))
+    chat.invoke(_messages(1), extra_body={"custom_fields": {"a": 2}})
+
+    assert len(transport.requests) == 5
+
+
+def test_key_includes_deployment(lc):
+    cache = lc.InMemoryResponseCache()
+    handler = lambda _: json_response(_response())  # noqa: E731
+    chat, transport = create_azure_chat(lc, handler, response_cache=cache)
+    other, other_transport = create_azure_chat(
+        lc, handler, response_cache=cache, azure_deployment="other"
+    )
+
+    chat.invoke(_messages())
+    other.invoke(_messages())
+
+    assert len(transport.requests) == len(other_transport.requests) == 1
+
+
+@pytest.mark.parametrize(
+    "caller",
+    [
+        {"api_key": "other-key"},
+        {"api_key": None, "azure_ad_token": "token"},
+        {"default_headers": {"X-Tenant": "other"}},
+        {"default_query": {"tenant": "other"}},
+    ],
+)
+def test_key_includes_caller(lc, caller):
+    cache = lc.InMemoryResponseCache()
+    handler = lambda _: json_response(_response())  # noqa: E731
+    chat, transport = create_azure_chat(lc, handler, response_cache=cache)
+    other, other_transport = create_azure_chat(
+        lc, handler, response_cache=cache, **caller
+    )
+
+    chat.invoke(_messages())
+    other.invoke(_messages())
+    chat.with_options(**caller).invoke(_messages())
+
+    assert len(transport.requests) == len(other_transport.requests) == 1
+    assert cache.hits == 1
+
+
+def test_key_includes_token_provider(lc):
+    def provider():
+        return "token"
+
+    def other_provider():
+        return "other-token"
+
+    cache = lc.InMemoryResponseCache()
+    handler = lambda _: json_response(_response())  # noqa: E731
+    chat, transport = create_azure_chat(
+        lc,
+        handler,
+        response_cache=cache,
+        api_key=None,
+        azure_ad_token_provider=provider,
+    )
+
+    chat.invoke(_messages())
+    chat.invoke(_messages())
+    chat.with_options(azure_ad_token_provider=other_provider).invoke(
+        _messages()
+    )
+
+    assert len(transport.requests) == 2
+    assert cache.hits == 1
+    assert transport.requests[0].headers["Authorization"] == "Bearer token"
+
+
+@pytest.mark.parametrize("raw_json_responses", [False, True])
+def test_stream_replay(lc, raw_json_responses):
+    chat, transport = create_azure_chat(
+        lc,
+        lambda _: sse_response(_chunks(), headers={"x-id": "1"}),
+        raw_json_responses=raw_json_responses,
+        include_response_headers=True,
+        response_cache=lc.InMemoryResponseCache(),
+    )
+
+    expected, actual = (list(chat.stream(_messages())) for _ in range(2))
+
+    assert len(transport.requests) == 1
+    assert [c.content for c in actual] == [c.content for c in expected]
+    assert actual[0].additional_kwargs == {"custom_content": {"state": 1}}
+    assert actual[-1].usage_metadata == expected[-1].usage_metadata
+    assert actual[-1].response_metadata["statistics"] == {"a": "b"}
+    assert actual[0].response_metadata["headers"]["x-id"] == "1"
+    assert actual[0].response_metadata["cache_hit"] is True
+    assert "cache_hit" not in expected[0].response_metadata
+
+
+def test_blocking_and_stream_cached_separately(lc):
+    chat, transport = create_azure_chat(
+        lc,
+        lambda request: (
+            sse_response(_chunks())
+            if request_json(request).get("stream")
+            else json_response(_response())
+        ),
+        response_cache=lc.InMemoryResponseCache(),
+    )
+
+    chat.invoke(_messages())
+    list(chat.stream(_messages()))
+    chat.invoke(_messages())
+    list(chat.stream(_messages()))
+
+    assert len(transport.requests) == 2
+
+
+def test_incomplete_stream_not_cached(lc):
+    chat, transport = create_azure_chat(
+        lc,
+        lambda _: sse_response(_chunks()),
+        response_cache=lc.InMemoryResponseCache(),
+    )
+
+    for _ in chat.stream(_messages()):
+        break
+    list(chat.stream(_messages()))
+    list(chat.stream(_messages()))
+
+    assert len(transport.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_async_replay(lc, tmp_path):
+    chat, transport = create_azure_chat(
+        lc,
+        lambda request: (
+            sse_response(_chunks())
+            if request_json(request).get("stream")
+            else json_response(_response())
+        ),
+        response_cache=lc.DiskResponseCache(tmp_path),
+    )
+
+    expected = await chat.ainvoke(_messages())
+    actual = await chat.ainvoke(_messages())
+    expected_chunks = [c async for c in chat.astream(_messages())]
+    actual_chunks = [c async for c in chat.astream(_messages())]
+
+    assert len(transport.requests) == 2
+    assert actual.content == expected.content
+    assert actual.additional_kwargs == expected.additional_kwargs
+    assert actual.response_metadata["cache_hit"] is True
+    assert [c.content for c in actual_chunks] == [
+        c.content for c in expected_chunks
+    ]
+    assert actual_chunks[0].response_metadata["cache_hit"] is True
+
+
+def test_disk_cache_shared_by_instances(lc, tmp_path):
+    handler = lambda _: json_response(_response())  # noqa: E731
+    chat, _ = create_azure_chat(
+        lc, handler, response_cache=lc.DiskResponseCache(tmp_path)
+    )
+    chat.invoke(_messages())
+
+    other, other_transport = create_azure_chat(
+        lc, handler, response_cache=lc.DiskResponseCache(tmp_path)
+    )
+    message = other.invoke(_messages())
+
+    assert len(other_transport.requests) == 0
+    assert message.additional_kwargs["custom_content"] == {
+        "attachments": [{"url": "a.png"}]
+    }
+
+
+def test_custom_cache_implements_storage(lc):
+    class PartialCache(lc.ResponseCache):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        PartialCache()
+
+
+def test_memory_ttl(lc):
+    cache = lc.InMemoryResponseCache(ttl=0.1)
+
+    cache.set("key", b"value")
+    assert cache.get("key") == b"value"
+    time.sleep(0.15)
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+
+def test_disk_ttl(lc, tmp_path):
+    cache = lc.DiskResponseCache(tmp_path, ttl=10)
+
+    cache.set("key", b"value")
+    assert cache.get("key") == b"value"
+    expired = time.time() - 11
+    os.utime(tmp_path / "key.json", (expired, expired))
+    assert cache.get("key") is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_lru_eviction(lc):
+    cache = lc.InMemoryResponseCache(maxsize=2)
+
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    cache.get("a")
+    cache.set("c", b"3")
+
+    assert len(cache) == 2
+    assert cache.get("a") == b"1"
+    assert cache.get("b") is None
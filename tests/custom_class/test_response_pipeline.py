@@ -0,0 +1,31 @@
+import pytest
+from openai.types.chat import ChatCompletion
+
+from tests.mock import chat_completion, create_azure_chat, json_response
+from tests.utils import with_custom_class
+
+
+@pytest.mark.asyncio
+async def test_single_model_dump(monkeypatch):
+    dump_count = 0
+    model_dump = ChatCompletion.model_dump
+
+    def _model_dump(self, *args, **kwargs):
+        nonlocal dump_count
+        dump_count += 1
+        return model_dump(self, *args, **kwargs)
+
+    monkeypatch.setattr(ChatCompletion, "model_dump", _model_dump)
+
+    response = chat_completion(statistics={"a": "b"})
+    response["choices"][0]["message"]["custom_content"] = {"attachments": []}
+
+    with with_custom_class() as lc:
+        chat, _ = create_azure_chat(lc, lambda _: json_response(response))
+        message = await chat.ainvoke("question")
+
+    assert dump_count == 1
+    assert message.content == "answer"
+    assert message.response_metadata["statistics"] == {"a": "b"}
+    assert message.additional_kwargs["custom_content"] == {"attachments": []}
+    assert message.additional_kwargs["refusal"] is None
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from tests.mock import (
+    chat_completion,
+    chat_completion_chunks,
+    create_azure_chat_with,
+    json_response,
+    request_json,
+    sse_response,
+)
+from tests.utils import wait_until, with_custom_class
+
+
+@pytest.fixture(scope="module")
+def lc():
+    with with_custom_class() as module:
+        yield module
+
+
+class Upstream:
+    """Mock deployment recording the order of the requests."""
+
+    def __init__(self):
+        self.order = []
+        self.released = asyncio.Event()
+
+    async def handler(self, request):
+        body = request_json(request)
+        self.order.append(body["messages"][0]["content"])
+        await self.released.wait()
+        if body.get("stream"):
+            return sse_response(chat_completion_chunks(["a", "b"]))
+        return json_response(chat_completion())
+
+
+def _queue(scheduler):
+    (queue,) = scheduler._queues.values()
+    return queue
+
+
+async def _submit(chat, scheduler, calls):
+    """Send the calls one by one while the first one blocks the deployment."""
+    tasks = []
+    for llm, prompt in calls:
+        tasks.append(asyncio.ensure_future(llm.ainvoke(prompt)))
+        await wait_until(
+            lambda: sum(
+                state["in_flight"] + state["queue_depth"]
+                for state in scheduler.snapshot().values()
+            )
+            == len(tasks)
+        )
+    return tasks
+
+
+@pytest.mark.asyncio
+async def test_higher_priority_sent_first(lc):
+    upstream = Upstream()
+    chat, scheduler, _ = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "request_scheduler",
+        lc.RequestScheduler(max_concurrency=1),
+    )
+    batch = chat.with_options(request_priority=lc.RequestPriority.BATCH)
+    interactive = chat.with_options(
+        request_priority=lc.RequestPriority.INTERACTIVE
+    )
+
+    tasks = await _submit(
+        chat,
+        scheduler,
+        [(batch, "b1"), (batch, "b2"), (chat, "n1"), (interactive, "i1")],
+    )
+    upstream.released.set()
+    await asyncio.gather(*tasks)
+
+    assert upstream.order == ["b1", "i1", "n1", "b2"]
+
+
+@pytest.mark.asyncio
+async def test_tenants_share_by_weights(lc):
+    upstream = Upstream()
+    chat, scheduler, _ = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "request_scheduler",
+        lc.RequestScheduler(max_concurrency=1, tenant_weights={"a": 2}),
+    )
+    tenant_a = chat.with_options(request_tenant="a")
+    tenant_b = chat.with_options(request_tenant="b")
+
+    tasks = await _submit(
+        chat,
+        scheduler,
+        [(tenant_b, "b0")]
+        + [(tenant_b, f"b{i}") for i in range(1, 4)]
+        + [(tenant_a, f"a{i}") for i in range(1, 5)],
+    )
+    upstream.released.set()
+    await asyncio.gather(*tasks)
+
+    # The tenant "a" gets twice the share despite coming last.
+    assert upstream.order == ["b0", "a1", "b1", "a2", "a3", "b2", "a4", "b3"]
+
+
+@pytest.mark.asyncio
+async def test_expired_request_dropped(lc):
+    upstream = Upstream()
+    chat, scheduler, _ = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "request_scheduler",
+        lc.RequestScheduler(max_concurrency=1),
+    )
+    first = asyncio.ensure_future(chat.ainvoke("first"))
+    await wait_until(lambda: upstream.order == ["first"])
+
+    with pytest.raises(lc.DeadlineExceededError):
+        await chat.with_options(request_deadline=0.01).ainvoke("late")
+    upstream.released.set()
+    await first
+
+    assert upstream.order == ["first"]
+    assert _queue(scheduler).snapshot() == {
+        "in_flight": 0,
+        "queue_depth": 0,
+        "expired": 1,
+    }
+    assert (await chat.ainvoke("next")).content == "answer"
+
+
+@pytest.mark.asyncio
+async def test_expired_on_release_counted_once(lc):
+    queue = lc.FairQueue(max_concurrency=1)
+    await queue.acquire()
+    waiter = asyncio.ensure_future(
+        queue.acquire(deadline=time.monotonic() + 0.01)
+    )
+    await wait_until(lambda: queue.queue_depth == 1)
+    # Blocks the loop, so the deadline passes before the timeout fires.
+    time.sleep(0.02)
+    queue.release()
+
+    with pytest.raises(lc.DeadlineExceededError):
+        await waiter
+    assert queue.snapshot() == {
+        "in_flight": 0,
+        "queue_depth": 0,
+        "expired": 1,
+    }
+
+
+def test_request_options_not_serialized(lc):
+    from langchain_core.load import dumps
+
+    chat, _, _ = create_azure_chat_with(
+        lc, Upstream().handler, "request_scheduler", lc.RequestScheduler()
+    )
+    chat = chat.with_options(
+        request_priority=lc.RequestPriority.BATCH,
+        request_tenant="tenant",
+        request_deadline=5.0,
+    )
+
+    kwargs = json.loads(dumps(chat))["kwargs"]
+    assert not {"request_priority", "request_tenant", "request_deadline"} & set(
+        kwargs
+    )
+
+
+@pytest.mark.asyncio
+async def test_queue_wait_reported(lc):
+    upstream = Upstream()
+    upstream.released.set()
+    chat, _, _ = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "request_scheduler",
+        lc.RequestScheduler(max_concurrency=1),
+    )
+
+    first, second = await asyncio.gather(chat.ainvoke("q1"), chat.ainvoke("q2"))
+
+    assert first.response_metadata["queue_wait"] == 0
+    assert second.response_metadata["queue_wait"] > 0
+
+
+@pytest.mark.asyncio
+async def test_stream_holds_place(lc):
+    upstream = Upstream()
+    upstream.released.set()
+    chat, scheduler, _ = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "request_scheduler",
+        lc.RequestScheduler(max_concurrency=1),
+    )
+
+    stream = chat.astream("s")
+    first_chunk = await stream.__anext__()
+    second = asyncio.ensure_future(chat.ainvoke("q"))
+    await wait_until(lambda: _queue(scheduler).queue_depth == 1)
+    assert [chunk.content async for chunk in stream] == ["b"]
+
+    assert "queue_wait" in first_chunk.response_metadata
+    assert (await second).content == "answer"
+    assert _queue(scheduler).in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_queue(lc):
+    upstream = Upstream()
+    chat, scheduler, _ = create_azure_chat_with(
+        lc,
+        upstream.handler,
+        "request_scheduler",
+        lc.RequestScheduler(max_concurrency=1),
+    )
+
+    first, second = await _submit(chat, scheduler, [(chat, "q1"), (chat, "q2")])
+    second.cancel()
+    await asyncio.gather(second, return_exceptions=True)
+    assert _queue(scheduler).queue_depth == 0
+    upstream.released.set()
+    await first
+
+    assert upstream.order == ["q1"]
+    assert _queue(scheduler).in_flight == 0
+
+
+def test_invalid_parameters(lc):
+    with pytest.raises(ValueError):
+        lc.RequestScheduler(max_concurrency=0)
+    with pytest.raises(ValueError):
+        lc.RequestScheduler(tenant_weights={"a": 0})
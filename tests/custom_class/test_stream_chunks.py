@@ -0,0 +1,47 @@
+import pytest
+
+from tests.utils import with_custom_class
+
+_DELTAS = [
+    {"content": "token"},
+    {"role": "assistant", "content": "token", "id": "chatcmpl-1"},
+    {"content": None, "function_call": None, "tool_calls": None},
+    {"content": "token", "custom_content": {"attachments": []}},
+    {"role": "user", "content": "token"},
+    {"role": "system", "content": "token"},
+]
+
+
+@pytest.fixture(scope="module")
+def lc():
+    with with_custom_class():
+        from langchain_core import messages
+
+        from aidial_integration_langchain.langchain_openai.chat_models import (
+            base,
+        )
+
+        yield messages, base
+
+
+@pytest.mark.parametrize("delta", _DELTAS)
+@pytest.mark.parametrize(
+    "default_class",
+    ["AIMessageChunk", "HumanMessageChunk", "SystemMessageChunk"],
+)
+def test_content_delta_fast_path(lc, delta, default_class):
+    messages, base = lc
+    cls = getattr(messages, default_class)
+
+    chunk = base._convert_delta_to_message_chunk(delta, cls)
+    expected = base._convert_any_delta_to_message_chunk(delta, cls)
+    if "custom_content" in delta:
+        expected.additional_kwargs["custom_content"] = delta["custom_content"]
+
+    assert type(chunk) is type(expected)
+    assert chunk == expected
+
+    # The chunks must not share mutable state
+    chunk.additional_kwargs["key"] = "value"
+    chunk.response_metadata["key"] = "value"
+    assert base._convert_delta_to_message_chunk(delta, cls) == expected
@@ -0,0 +1,266 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from tests.mock import (
+    chat_completion_chunks,
+    create_azure_chat,
+    sse_body,
+    sse_response,
+)
+from tests.utils import wait_until, with_custom_class
+
+_TOKENS = [f"t{i} " for i in range(10)]
+_DONE = b"data: [DONE]\n\n"
+
+
+@pytest.fixture(scope="module")
+def lc():
+    with with_custom_class() as module:
+        yield module
+
+
+class Upstream:
+    """Mock deployment streaming the chunks one by one."""
+
+    def __init__(self, chunks=None, delay=0.0):
+        self.chunks = chunks or chat_completion_chunks(_TOKENS)
+        self.delay = delay
+        self.sent = 0
+
+    def handler(self, request):
+        return httpx.Response(
+            200,
+            content=self._body(),
+            headers={"Content-Type": "text/event-stream"},
+        )
+
+    async def _body(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(self.delay)
+            self.sent += 1
+            yield sse_body([chunk])[: -len(_DONE)]
+        yield _DONE
+
+
+def _chunk(delta, **fields):
+    return {
+        "id": "chatcmpl-123",
+        "created": 0,
+        "model": "test-model",
+        "object": "chat.completion.chunk",
+        "choices": [{"index": 0, "delta": delta, **fields}],
+    }
+
+
+def _tool_call_delta(index, args, name=None):
+    tool_call = {"index": index, "function": {"arguments": args}}
+    if name is not None:
+        tool_call.update(id=f"call_{index}", type="function")
+        tool_call["function"]["name"] = name
+    return {"tool_calls": [tool_call]}
+
+
+@pytest.mark.asyncio
+async def test_stopped_on_text(lc):
+    upstream = Upstream(delay=0.005)
+    controller = lc.StreamController(lc.stop_on_text("t3"))
+    chat, _ = create_azure_chat(lc, upstream.handler)
+
+    stream = chat.with_options(stream_controller=controller).astream("q")
+    chunks = [chunk.content async for chunk in stream]
+    await asyncio.sleep(0.03)
+
+    assert chunks == _TOKENS[:4]
+    # The rest of the stream isn't read.
+    assert upstream.sent == 4
+    assert controller.snapshot() == {
+        "stopped": 1,
+        "stop_reason": "stop_on_text",
+        "consumed_chunks": 4,
+        "unconsumed_chunks": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_cancelled(lc):
+    upstream = Upstream(delay=0.005)
+    controller = lc.StreamController()
+    chat, _ = create_azure_chat(lc, upstream.handler)
+
+    chunks = []
+    async for chunk in chat.with_options(stream_controller=controller).astream(
+        "q"
+    ):
+        chunks.append(chunk.content)
+        if len(chunks) == 2:
+            controller.cancel()
+
+    assert chunks == _TOKENS[:2]
+    assert upstream.sent == 2
+    assert controller.stop_reason == "cancelled"
+
+
+@pytest.mark.asyncio
+async def test_reset(lc):
+    controller = lc.StreamController()
+    chat, _ = create_azure_chat(lc, Upstream().handler)
+    chat = chat.with_options(stream_controller=controller)
+
+    controller.cancel()
+    assert [chunk.content async for chunk in chat.astream("q")] == _TOKENS[:1]
+
+    controller.reset()
+    assert not controller.cancelled
+    assert [chunk.content async for chunk in chat.astream("q")] == _TOKENS
+    assert controller.stopped == 1
+
+
+@pytest.mark.asyncio
+async def test_stopped_on_content_filter(lc):
+    chunks = [
+        _chunk({"role": "assistant", "content": "Hello"}),
+        _chunk({}, finish_reason="content_filter"),
+        # The chunks following the finished choice, e.g. the annotations
+        *(_chunk({}, content_filter_results={}) for _ in range(5)),
+    ]
+    upstream = Upstream(chunks)
+    controller = lc.StreamController(lc.stop_on_finish_reason("content_filter"))
+    chat, _ = create_azure_chat(lc, upstream.handler)
+
+    generated = [
+        chunk
+        async for chunk in chat.with_options(
+            stream_controller=controller
+        ).astream("q")
+    ]
+
+    assert [chunk.content for chunk in generated] == ["Hello", ""]
+    assert upstream.sent == 2
+    assert generated[-1].response_metadata["finish_reason"] == "content_filter"
+    assert controller.stopped == 1
+    assert controller.stop_reason == "stop_on_finish_reason"
+
+
+@pytest.mark.asyncio
+async def test_stopped_on_complete_tool_call(lc):
+    chunks = [
+        _chunk({"role": "assistant", "content": None}),
+        _chunk(_tool_call_delta(0, "", name="search")),
+        _chunk(_tool_call_delta(0, '{"query": ')),
+        _chunk(_tool_call_delta(0, '"weather"}')),
+        _chunk(_tool_call_delta(1, "", name="lookup")),
+        _chunk(_tool_call_delta(1, '{"id": 1}')),
+        _chunk({}, finish_reason="tool_calls"),
+    ]
+    upstream = Upstream(chunks)
+    controller = lc.StreamController(lc.stop_on_tool_call())
+    chat, _ = create_azure_chat(lc, upstream.handler)
+
+    message = None
+    async for chunk in chat.with_options(stream_controller=controller).astream(
+        "q"
+    ):
+        message = chunk if message is None else message + chunk
+
+    assert message is not None
+    assert message.tool_calls == [
+        {
+            "name": "search",
+            "args": {"query": "weather"},
+            "id": "call_0",
+            "type": "tool_call",
+        }
+    ]
+    assert controller.stop_reason == "stop_on_tool_call"
+    assert json.loads(message.tool_call_chunks[0]["args"])
+
+
+@pytest.mark.asyncio
+async def test_unconsumed_chunks_recorded(lc):
+    upstream = Upstream()
+    controller = lc.StreamController(lc.stop_on_text("t1"))
+    read_ahead = lc.ReadAhead(high_water=4, low_water=1)
+    chat, _ = create_azure_chat(lc, upstream.handler, read_ahead=read_ahead)
+
+    stream = chat.with_options(stream_controller=controller).astream("q")
+    first = await stream.__anext__()
+    # Let the producer read ahead.
+    await wait_until(lambda: read_ahead.producer_stalls == 1)
+    chunks = [first.content] + [chunk.content async for chunk in stream]
+
+    assert chunks == _TOKENS[:2]
+    assert controller.consumed_chunks == 2
+    assert controller.unconsumed_chunks == 3
+
+
+def test_sync_stream_stopped(lc):
+    controller = lc.StreamController(lc.stop_on_text("t2"))
+    chat, _ = create_azure_chat(
+        lc, lambda request: sse_response(chat_completion_chunks(_TOKENS))
+    )
+
+    chunks = [
+        chunk.content
+        for chunk in chat.with_options(stream_controller=controller).stream("q")
+    ]
+
+    assert chunks == _TOKENS[:3]
+    assert controller.stopped == 1
+
+
+@pytest.mark.asyncio
+async def test_complete_stream_not_stopped(lc):
+    controller = lc.StreamController(lc.stop_on_text("missing"))
+    chat, _ = create_azure_chat(
+        lc, Upstream().handler, stream_controller=controller
+    )
+
+    chunks = [chunk.content async for chunk in chat.astream("q")]
+
+    assert chunks == _TOKENS
+    assert controller.snapshot() == {
+        "stopped": 0,
+        "stop_reason": None,
+        "consumed_chunks": len(_TOKENS),
+        "unconsumed_chunks": 0,
+    }
+
+
+def test_stop_text_split_between_chunks(lc):
+    # Each chunk is a single character of "t0 t1 t2 ...".
+    text = "".join(_TOKENS)
+    controller = lc.StreamController(lc.stop_on_text("zz", "t4 t5"))
+    chat, _ = create_azure_chat(
+        lc, lambda request: sse_response(chat_completion_chunks(list(text)))
+    )
+
+    chunks = [
+        chunk.content
+        for chunk in chat.with_options(stream_controller=controller).stream("q")
+    ]
+
+    assert "".join(chunks) == text[: text.index("t4 t5") + 5]
+    assert controller.stop_reason == "stop_on_text"
+
+
+@pytest.mark.asyncio
+async def test_custom_predicate_gets_generation_so_far(lc):
+    generations = []
+
+    def long_enough(generation):
+        generations.append(generation.text)
+        return len(generation.text) >= 9
+
+    controller = lc.StreamController(lc.stop_on_text("missing"), long_enough)
+    chat, _ = create_azure_chat(
+        lc, Upstream().handler, stream_controller=controller
+    )
+
+    chunks = [chunk.content async for chunk in chat.astream("q")]
+
+    assert chunks == _TOKENS[:3]
+    assert generations == ["t0 ", "t0 t1 ", "t0 t1 t2 "]
+    assert controller.stop_reason == "long_enough"
@@ -0,0 +1,177 @@
+import asyncio
+
+import httpx
+import pytest
+
+from tests.mock import (
+    chat_completion_chunks,
+    create_azure_chat,
+    sse_body,
+    sse_response,
+)
+from tests.utils import with_custom_class
+
+_TOKENS = [f"t{i} " for i in range(5)]
+_DONE = b"data: [DONE]\n\n"
+
+
+@pytest.fixture(scope="module")
+def lc():
+    with with_custom_class() as module:
+        yield module
+
+
+def _delayed_handler(first_delay, delay):
+    async def _body():
+        for i, chunk in enumerate(chat_completion_chunks(_TOKENS)):
+            await asyncio.sleep(first_delay if i == 0 else delay)
+            yield sse_body([chunk])[: -len(_DONE)]
+        yield _DONE
+
+    def handler(request):
+        return httpx.Response(
+            200,
+            content=_body(),
+            headers={"Content-Type": "text/event-stream"},
+        )
+
+    return handler
+
+
+def _handler(request):
+    return sse_response(chat_completion_chunks(_TOKENS))
+
+
+def _recording_sink(lc):
+    class RecordingSink(lc.StreamMetricsSink):
+        def __init__(self):
+            self.records = []
+
+        def record(self, metrics):
+            self.records.append(metrics)
+
+    return RecordingSink()
+
+
+@pytest.mark.asyncio
+async def test_metrics_attached_to_final_chunk(lc):
+    sink = _recording_sink(lc)
+    chat, _ = create_azure_chat(
+        lc, _delayed_handler(0.05, 0.01), stream_metrics=sink
+    )
+
+    chunks = [chunk async for chunk in chat.astream("q")]
+
+    assert [chunk.content for chunk in chunks] == _TOKENS + [""]
+    metrics = chunks[-1].response_metadata["stream_metrics"]
+    assert sink.records == [metrics]
+    assert metrics["chunks"] == len(_TOKENS)
+    assert (
+        metrics["request_build"]
+        <= metrics["first_byte"]
+        <= metrics["first_token"]
+        <= metrics["total"]
+    )
+    assert metrics["first_token"] >= 0.05
+    assert 0.005 <= metrics["inter_chunk_p50"] <= metrics["inter_chunk_max"]
+    assert metrics["inter_chunk_p90"] <= metrics["inter_chunk_max"]
+
+
+def test_final_chunk_of_other_message_class(lc):
+    chunks = chat_completion_chunks(_TOKENS)
+    chunks[0]["choices"][0]["delta"]["role"] = "user"
+    chat, _ = create_azure_chat(
+        lc,
+        lambda _: sse_response(chunks),
+        stream_metrics=_recording_sink(lc),
+    )
+
+    streamed = list(chat.stream("q"))
+
+    assert {chunk.type for chunk in streamed[:-1]} == {"HumanMessageChunk"}
+    assert streamed[-1].type == "AIMessageChunk"
+    assert "stream_metrics" in streamed[-1].response_metadata
+    # Merges with the other chunks
+    merged = streamed[0]
+    for chunk in streamed[1:]:
+        merged += chunk
+    assert merged.content == "".join(_TOKENS)
+
+
+@pytest.mark.asyncio
+async def test_metrics_in_aggregated_response(lc):
+    chat, _ = create_azure_chat(
+        lc, _handler, stream_metrics=lc.StreamMetricsSink(), streaming=True
+    )
+
+    response = await chat.ainvoke("q")
+
+    assert response.content == "".join(_TOKENS)
+    assert response.response_metadata["stream_metrics"]["chunks"] == len(
+        _TOKENS
+    )
+
+
+def test_sync_stream_measured(lc):
+    sink = _recording_sink(lc)
+    chat, _ = create_azure_chat(lc, _handler, stream_metrics=sink)
+
+    chunks = list(chat.stream("q"))
+
+    assert chunks[-1].response_metadata["stream_metrics"] == sink.records[0]
+    assert sink.records[0]["chunks"] == len(_TOKENS)
+
+
+@pytest.mark.asyncio
+async def test_not_measured_without_sink(lc):
+    chat, _ = create_azure_chat(lc, _handler)
+
+    chunks = [chunk async for chunk in chat.astream("q")]
+
+    assert [chunk.content for chunk in chunks] == _TOKENS
+    assert all("stream_metrics" not in c.response_metadata for c in chunks)
+
+
+@pytest.mark.asyncio
+async def test_first_token_skips_empty_chunks(lc):
+    chunks = chat_completion_chunks(_TOKENS)
+    # The role-only chunk arrives long before the content.
+    chunks[0]["choices"][0]["delta"]["content"] = ""
+
+    async def _body():
+        for i, chunk in enumerate(chunks):
+            await asyncio.sleep(0.05 if i == 1 else 0)
+            yield sse_body([chunk])[: -len(_DONE)]
+        yield _DONE
+
+    sink = _recording_sink(lc)
+    chat, _ = create_azure_chat(
+        lc,
+        lambda request: httpx.Response(
+            200,
+            content=_body(),
+            headers={"Content-Type": "text/event-stream"},
+        ),
+        stream_metrics=sink,
+    )
+
+    async for _ in chat.astream("q"):
+        pass
+
+    metrics = sink.records[0]
+    assert metrics["first_token"] - metrics["first_byte"] >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_in_memory_snapshot(lc):
+    metrics = lc.InMemoryStreamMetrics(window=2)
+    chat, _ = create_azure_chat(lc, _handler, stream_metrics=metrics)
+
+    for _ in range(3):
+        async for _ in chat.astream("q"):
+            pass
+
+    snapshot = metrics.snapshot()
+    assert snapshot["streams"] == 3
+    assert set(snapshot["first_token"]) == {"p50", "p90", "p99"}
+    assert snapshot["first_token"]["p50"] <= snapshot["total"]["p99"]
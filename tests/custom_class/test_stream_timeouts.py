@@ -0,0 +1,217 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from tests.mock import chat_completion_chunks, create_azure_chat_with, sse_body
+from tests.utils import with_custom_class
+
+_TOKENS = [f"t{i}" for i in range(5)]
+_DONE = b"data: [DONE]\n\n"
+
+
+@pytest.fixture(scope="module")
+def lc():
+    with with_custom_class() as module:
+        yield module
+
+
+def _chunk_bodies():
+    return [
+        sse_body([chunk])[: -len(_DONE)]
+        for chunk in chat_completion_chunks(_TOKENS)
+    ]
+
+
+def _stream_handler(delays, headers_delay=0.0):
+    """Streams the chunks after the given delays."""
+
+    async def _body():
+        for body, delay in zip(_chunk_bodies(), delays):
+            await asyncio.sleep(delay)
+            yield body
+        yield _DONE
+
+    async def handler(request):
+        await asyncio.sleep(headers_delay)
+        return httpx.Response(
+            200,
+            content=_body(),
+            headers={"Content-Type": "text/event-stream"},
+        )
+
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_first_token_timeout(lc):
+    chat, timeouts, _ = create_azure_chat_with(
+        lc,
+        _stream_handler([1.0] + [0] * 4),
+        "stream_timeouts",
+        lc.StreamTimeouts(first_token=0.05),
+    )
+
+    started = time.monotonic()
+    with pytest.raises(lc.FirstTokenTimeoutError) as e:
+        async for _ in chat.astream("q"):
+            pass
+
+    assert time.monotonic() - started < 0.5
+    assert e.value.timeout == 0.05
+    assert timeouts.snapshot() == {
+        "connect": 0,
+        "first_token": 1,
+        "inter_token": 0,
+        "total": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_first_token_timeout_waiting_for_headers(lc):
+    chat, _, _ = create_azure_chat_with(
+        lc,
+        _stream_handler([0] * 5, headers_delay=1.0),
+        "stream_timeouts",
+        lc.StreamTimeouts(first_token=0.05),
+    )
+
+    started = time.monotonic()
+    with pytest.raises(lc.FirstTokenTimeoutError):
+        async for _ in chat.astream("q"):
+            pass
+
+    assert time.monotonic() - started < 0.5
+
+
+@pytest.mark.asyncio
+async def test_inter_token_timeout(lc):
+    chat, timeouts, _ = create_azure_chat_with(
+        lc,
+        _stream_handler([0, 0, 1.0, 0, 0]),
+        "stream_timeouts",
+        lc.StreamTimeouts(first_token=1, inter_token=0.05),
+    )
+
+    chunks = []
+    with pytest.raises(lc.InterTokenTimeoutError):
+        async for chunk in chat.astream("q"):
+            chunks.append(chunk.content)
+
+    assert chunks == _TOKENS[:2]
+    assert timeouts.snapshot()["inter_token"] == 1
+
+
+@pytest.mark.asyncio
+async def test_consumer_time_not_counted(lc):
+    chat, _, _ = create_azure_chat_with(
+        lc,
+        _stream_handler([0] * 5),
+        "stream_timeouts",
+        lc.StreamTimeouts(inter_token=0.05),
+    )
+
+    chunks = []
+    async for chunk in chat.astream("q"):
+        await asyncio.sleep(0.1)
+        chunks.append(chunk.content)
+
+    assert chunks == _TOKENS
+
+
+@pytest.mark.asyncio
+async def test_total_timeout(lc):
+    chat, _, _ = create_azure_chat_with(
+        lc,
+        _stream_handler([0.04] * 5),
+        "stream_timeouts",
+        lc.StreamTimeouts(inter_token=0.1, total=0.1),
+    )
+
+    chunks = []
+    with pytest.raises(lc.TotalTimeoutError):
+        async for chunk in chat.astream("q"):
+            chunks.append(chunk.content)
+
+    assert 0 < len(chunks) < len(_TOKENS)
+
+
+@pytest.mark.asyncio
+async def test_connect_timeout(lc):
+    def handler(request):
+        raise httpx.ConnectTimeout("timed out", request=request)
+
+    chat, timeouts, transport = create_azure_chat_with(
+        lc, handler, "stream_timeouts", lc.StreamTimeouts(connect=0.5)
+    )
+
+    with pytest.raises(lc.ConnectTimeoutError):
+        async for _ in chat.astream("q"):
+            pass
+    with pytest.raises(lc.ConnectTimeoutError):
+        for _ in chat.stream("q"):
+            pass
+
+    assert transport.requests[0].extensions["timeout"]["connect"] == 0.5
+    assert timeouts.snapshot()["connect"] == 2
+
+
+def test_sync_inter_token_timeout(lc):
+    def _body():
+        for body, delay in zip(_chunk_bodies(), [0, 0.1, 0, 0, 0]):
+            time.sleep(delay)
+            yield body
+        yield _DONE
+
+    chat, _, transport = create_azure_chat_with(
+        lc,
+        lambda request: httpx.Response(
+            200, content=_body(), headers={"Content-Type": "text/event-stream"}
+        ),
+        "stream_timeouts",
+        lc.StreamTimeouts(first_token=1, inter_token=0.05),
+    )
+
+    chunks = []
+    with pytest.raises(lc.InterTokenTimeoutError):
+        for chunk in chat.stream("q"):
+            chunks.append(chunk.content)
+
+    assert chunks == _TOKENS[:1]
+    # The read timeout of the connection enforces the larger of the two.
+    assert transport.requests[0].extensions["timeout"]["read"] == 1
+
+
+def test_timeouts_counted_as_circuit_failures(lc):
+    from aidial_integration_langchain.langchain_openai.chat_models.circuit_breaker import (
+        is_circuit_failure,
+    )
+
+    assert is_circuit_failure(lc.InterTokenTimeoutError(1.0))
+    assert isinstance(lc.TotalTimeoutError(1.0), TimeoutError)
+
+
+def test_timeouts_validated(lc):
+    with pytest.raises(ValueError):
+        lc.StreamTimeouts(first_token=0)
+
+
+@pytest.mark.asyncio
+async def test_expired_timer_raises_after_swallowed_cancellation(lc):
+    from aidial_integration_langchain.langchain_openai.chat_models.stream_timeouts import (
+        _Timer,
+    )
+
+    loop = asyncio.get_running_loop()
+    with pytest.raises(lc.InterTokenTimeoutError):
+        with _Timer(loop.time() + 0.01, lambda: lc.InterTokenTimeoutError(1)):
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                pass
+
+    # The cancellation by the deadline isn't left pending.
+    await asyncio.sleep(0.01)
+    task = asyncio.current_task()
+    assert getattr(task, "cancelling", lambda: 0)() == 0
@@ -0,0 +1,205 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from tests.mock import (
+    chat_completion,
+    chat_completion_chunks,
+    create_azure_chat_with,
+    json_response,
+    sse_response,
+)
+from tests.utils import with_custom_class
+
+_USAGE = {"prompt_tokens": 1, "completion_tokens": 2, "total_tokens": 3}
+
+
+@pytest.fixture(scope="module")
+def lc():
+    with with_custom_class() as module:
+        yield module
+
+
+# Refilled slowly enough not to hide the reconciliation
+_BUDGET = {"tokens_per_minute": 1000, "completion_tokens": 500}
+
+
+def _tokens(budget):
+    (state,) = budget.snapshot().values()
+    return state["tokens"]
+
+
+def test_bucket_waits_for_refill(lc):
+    bucket = lc.TokenBucket(tokens_per_minute=60)
+
+    assert bucket.try_take(50) == 0
+    assert bucket.try_take(20) == pytest.approx(10, abs=0.1)
+    # A request larger than the bucket waits for the full bucket.
+    assert bucket.try_take(1000) == pytest.approx(50, abs=0.1)
+
+
+def test_request_limit(lc):
+    bucket = lc.TokenBucket(tokens_per_minute=1000, requests_per_minute=2)
+
+    assert bucket.try_take(1) == 0
+    assert bucket.try_take(1) == 0
+    assert bucket.try_take(1) == pytest.approx(30, abs=0.1)
+
+
+@pytest.mark.asyncio
+async def test_atake_waits(lc):
+    bucket = lc.TokenBucket(tokens_per_minute=6000)
+    bucket.take(6000)
+
+    start = time.monotonic()
+    await bucket.atake(5)
+
+    assert time.monotonic() - start >= 0.04
+
+
+@pytest.mark.asyncio
+async def test_waiters_served_in_order(lc):
+    bucket = lc.TokenBucket(tokens_per_minute=60_000)
+    bucket.take(60_000)
+    order = []
+
+    async def _take(name, tokens):
+        await bucket.atake(tokens)
+        order.append(name)
+
+    first = asyncio.create_task(_take("large", 50))
+    await asyncio.sleep(0)
+    # Refilled for the small request first, but it doesn't jump the queue.
+    second = asyncio.create_task(_take("small", 1))
+    await asyncio.sleep(0)
+    assert bucket.waiting == 2
+    assert bucket.try_take(1) > 0
+    await asyncio.gather(first, second)
+
+    assert order == ["large", "small"]
+    assert bucket.waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_passes_turn(lc):
+    bucket = lc.TokenBucket(tokens_per_minute=60_000)
+    bucket.take(60_000)
+    first = asyncio.create_task(bucket.atake(60_000))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(bucket.atake(20))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    start = time.monotonic()
+    await second
+
+    assert time.monotonic() - start < 0.5
+    assert bucket.waiting == 0
+
+
+def test_sync_waiter_woken_by_refund(lc):
+    bucket = lc.TokenBucket(tokens_per_minute=60)
+    bucket.take(60)
+    thread = threading.Thread(target=bucket.take, args=(30,))
+    thread.start()
+    while not bucket.waiting:
+        time.sleep(0.001)
+
+    bucket.give_back(30)
+    thread.join(1)
+
+    assert not thread.is_alive()
+    assert bucket.tokens == pytest.approx(0, abs=0.1)
+
+
+def test_estimate_tokens(lc):
+    budget = lc.TokenBudget(tokens_per_minute=10_000, completion_tokens=100)
+    messages = [{"role": "user", "content": "x" * 40}]
+
+    assert budget.estimate_tokens({"messages": messages}) == 114
+    assert (
+        budget.estimate_tokens({"messages": messages, "max_tokens": 10, "n": 2})
+        == 34
+    )
+
+
+def test_reconciled_with_usage(lc):
+    chat, budget, _ = create_azure_chat_with(
+        lc,
+        lambda _: json_response(chat_completion()),
+        "token_budget",
+        lc.TokenBudget(**_BUDGET),
+    )
+
+    chat.invoke("question")
+
+    # The unused completion tokens are given back.
+    assert _tokens(budget) > 990
+
+
+@pytest.mark.asyncio
+async def test_resynced_from_headers(lc):
+    chat, budget, _ = create_azure_chat_with(
+        lc,
+        lambda _: json_response(
+            chat_completion(),
+            headers={
+                "x-ratelimit-remaining-tokens": "100",
+                "x-ratelimit-remaining-requests": "10",
+            },
+        ),
+        "token_budget",
+        lc.TokenBudget(**_BUDGET),
+    )
+
+    await chat.ainvoke("question")
+
+    # Lowered to the remaining tokens, then given back the unused ones
+    assert 590 < _tokens(budget) < 620
+
+
+@pytest.mark.asyncio
+async def test_rejected_request_refunded(lc):
+    chat, budget, _ = create_azure_chat_with(
+        lc,
+        lambda _: httpx.Response(429, json={"error": {"message": "limit"}}),
+        "token_budget",
+        lc.TokenBudget(**_BUDGET),
+    )
+
+    with pytest.raises(Exception):
+        await chat.ainvoke("question")
+
+    assert _tokens(budget) > 999
+
+
+@pytest.mark.parametrize("raw_json_responses", [False, True])
+def test_stream_reconciled_with_usage(lc, raw_json_responses):
+    chat, budget, _ = create_azure_chat_with(
+        lc,
+        lambda _: sse_response(chat_completion_chunks(["a"], usage=_USAGE)),
+        "token_budget",
+        lc.TokenBudget(**_BUDGET),
+        raw_json_responses=raw_json_responses,
+    )
+
+    assert "".join(chunk.content for chunk in chat.stream("question")) == "a"
+    # The unused completion tokens are given back.
+    assert _tokens(budget) > 990
+
+
+@pytest.mark.asyncio
+async def test_astream_reconciled_with_usage(lc):
+    chat, budget, _ = create_azure_chat_with(
+        lc,
+        lambda _: sse_response(chat_completion_chunks(["a"], usage=_USAGE)),
+        "token_budget",
+        lc.TokenBudget(**_BUDGET),
+    )
+
+    assert [chunk.content async for chunk in chat.astream("question")][0] == "a"
+    # The unused completion tokens are given back.
+    assert _tokens(budget) > 990
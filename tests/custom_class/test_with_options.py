@@ -0,0 +1,90 @@
+import pytest
+from pydantic import ValidationError
+
+from tests.mock import (
+    chat_completion,
+    create_azure_chat,
+    json_response,
+    request_json,
+)
+from tests.utils import with_custom_class
+
+
+@pytest.fixture(scope="module")
+def lc():
+    with with_custom_class() as module:
+        yield module
+
+
+def test_overrides(lc):
+    chat, _ = create_azure_chat(lc, lambda _: json_response(chat_completion()))
+    derived = chat.with_options(
+        temperature="0.3", stop_sequences=["x"], model_kwargs={"a": 1}
+    )
+
+    assert derived.temperature == 0.3
+    assert derived.stop == ["x"]
+    assert derived.model_kwargs == {"a": 1}
+    assert chat.temperature == 0.7
+    assert chat.stop is None
+    assert chat.model_kwargs == {}
+
+
+def test_derived_request(lc):
+    chat, transport = create_azure_chat(
+        lc, lambda _: json_response(chat_completion())
+    )
+    derived = chat.with_options(temperature=0.1, extra_body={"a": "b"})
+
+    assert derived.invoke("question").content == "answer"
+    request = request_json(transport.requests[-1])
+    assert request["temperature"] == 0.1
+    assert request["a"] == "b"
+
+
+def test_shares_clients(lc):
+    chat = lc.AzureChatOpenAI(
+        api_key="dummy-key",
+        api_version="dummy-version",
+        azure_endpoint="https://dummy-url",
+        azure_deployment="dummy-deployment",
+        share_connection_pool=False,
+    )
+    # created before the parent's clients are
+    derived = chat.with_options(temperature=0.1)
+
+    assert derived.client is chat.client
+    assert derived.root_async_client is chat.root_async_client
+    assert chat.with_options(temperature=0.2).client is chat.client
+
+
+def test_client_fields_reconstruct(lc):
+    chat = lc.AzureChatOpenAI(
+        api_key="dummy-key",
+        api_version="dummy-version",
+        azure_endpoint="https://dummy-url",
+        azure_deployment="dummy-deployment",
+        share_connection_pool=False,
+        temperature=0.5,
+    )
+    derived = chat.with_options(api_key="other-key")
+
+    assert derived.root_client is not chat.root_client
+    assert derived.root_client.api_key == "other-key"
+    assert derived.temperature == 0.5
+
+
+@pytest.mark.parametrize(
+    "overrides, error",
+    [
+        ({"unknown": 1}, ValueError),
+        ({"temperature": "hot"}, ValidationError),
+        ({"n": 0}, ValueError),
+        ({"n": 2, "streaming": True}, ValueError),
+        ({"model_kwargs": {"temperature": 1}}, ValueError),
+    ],
+)
+def test_invalid_overrides(lc, overrides, error):
+    chat, _ = create_azure_chat(lc, lambda _: json_response(chat_completion()))
+    with pytest.raises(error):
+        chat.with_options(**overrides)
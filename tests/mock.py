@@ -0,0 +1,133 @@
+import json
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+import httpx
+
+Handler = Callable[
+    [httpx.Request], Union[httpx.Response, Awaitable[httpx.Response]]
+]
+
+_F = TypeVar("_F")
+
+
+def chat_completion(content: str = "answer", **extra: Any) -> dict:
+    return {
+        "id": "chatcmpl-123",
+        "created": 1677652288,
+        "model": "test-model",
+        "object": "chat.completion",
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }
+        ],
+        "usage": {
+            "prompt_tokens": 1,
+            "completion_tokens": 2,
+            "total_tokens": 3,
+        },
+        **extra,
+    }
+
+
+def chat_completion_chunks(tokens: List[str], **extra: Any) -> List[dict]:
+    def _chunk(delta: dict, **fields: Any) -> dict:
+        return {
+            "id": "chatcmpl-123",
+            "created": 1677652288,
+            "model": "test-model",
+            "object": "chat.completion.chunk",
+            "choices": [{"index": 0, "delta": delta, **fields}],
+        }
+
+    chunks = [
+        _chunk({"role": "assistant", "content": tokens[0]}),
+        *(_chunk({"content": token}) for token in tokens[1:]),
+    ]
+    chunks[-1]["choices"][0]["finish_reason"] = "stop"
+    chunks[-1].update(extra)
+    return chunks
+
+
+def sse_body(chunks: List[dict]) -> bytes:
+    return b"".join(
+        f"data: {json.dumps(chunk)}\n\n".encode("utf-8") for chunk in chunks
+    ) + (b"data: [DONE]\n\n")
+
+
+def json_response(body: dict, **kwargs: Any) -> httpx.Response:
+    return httpx.Response(status_code=200, json=body, **kwargs)
+
+
+def sse_response(
+    chunks: List[dict], headers: Optional[dict] = None
+) -> httpx.Response:
+    return httpx.Response(
+        status_code=200,
+        content=sse_body(chunks),
+        headers={"Content-Type": "text/event-stream", **(headers or {})},
+    )
+
+
+def request_json(request: httpx.Request) -> dict:
+    return json.loads(request.content.decode())
+
+
+class MockTransport(httpx.MockTransport):
+    """Mock transport which records the received requests."""
+
+    requests: List[httpx.Request]
+
+    def __init__(self, handler: Handler):
+        self.requests = []
+
+        def _handler(request: httpx.Request) -> Any:
+            self.requests.append(request)
+            return handler(request)
+
+        super().__init__(_handler)
+
+
+def create_azure_chat(module: Any, handler: Handler, **kwargs: Any):
+    """Creates the AzureChatOpenAI from the given module served by the handler.
+
+    Returns the chat model and the transport recording the requests.
+    """
+    transport = MockTransport(handler)
+    kwargs = {
+        "api_key": "dummy-key",
+        "api_version": "dummy-version",
+        "azure_endpoint": "https://dummy-url",
+        "azure_deployment": "dummy-deployment",
+        "http_client": httpx.Client(transport=transport),
+        "http_async_client": httpx.AsyncClient(transport=transport),
+        "max_retries": 0,
+        **kwargs,
+    }
+    return module.AzureChatOpenAI(**kwargs), transport
+
+
+def create_azure_chat_with(
+    module: Any, handler: Handler, field: str, feature: _F, **kwargs: Any
+) -> Tuple[Any, _F, MockTransport]:
+    """Creates the AzureChatOpenAI served by the handler
+    with the feature object (e.g. `CircuitBreaker`) set to the field.
+
+    Returns the chat model, the feature object and the transport
+    recording the requests.
+    """
+    chat, transport = create_azure_chat(
+        module, handler, **{field: feature, **kwargs}
+    )
+    return chat, feature, transport
@@ -1,9 +1,10 @@
+import asyncio
 import importlib
 import sys
 from contextlib import contextmanager
 from enum import Enum
 from importlib.metadata import version
-from typing import Optional, Tuple
+from typing import Callable, Optional, Tuple
 
 from packaging.version import Version
 
@@ -79,6 +80,33 @@ def with_langchain(is_azure: bool, is_custom_class: bool, monkey_patch: bool):
     unload_langchain()
 
 
+@contextmanager
+def with_custom_class():
+    """Yields the freshly imported package with the custom classes."""
+    unload_langchain()
+    yield importlib.import_module(
+        "aidial_integration_langchain.langchain_openai"
+    )
+    unload_langchain()
+
+
+async def wait_until(condition: Callable[[], bool], timeout: float = 5) -> None:
+    """Wait until the condition holds, failing after the timeout.
+
+    The condition is polled, since the states it checks
+    (e.g. the queue depth of a limiter) don't signal their changes.
+    """
+
+    async def _poll():
+        while not condition():
+            await asyncio.sleep(0.001)
+
+    try:
+        await asyncio.wait_for(_poll(), timeout)
+    except asyncio.TimeoutError:
+        raise AssertionError("The condition isn't met") from None
+
+
 class PatchType(int, Enum):
     MONKEY_PATCH = 0
     CUSTOM_CLASS = 1